@@ -2,8 +2,8 @@ import pandas as pd
 import numpy as np
 import xgboost as xgb
 import lightgbm as lgb
-from mootdx.reader import Reader
 from mootdx.quotes import Quotes
+from core import tdx_reader
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
@@ -96,12 +96,11 @@ def get_local_data(symbol, days=CONFIG['data_days']):
     获取本地日线数据（只用daily_data做特征工程，避免多列close冲突）
     """
     try:
-        reader = Reader.factory(market='std', tdxdir=CONFIG['tdx_path'])
-        # 获取日线数据
-        daily_data = reader.daily(symbol=symbol)
+        # 只读.day文件末尾的days条记录
+        daily_data = tdx_reader.read_day(symbol, CONFIG['tdx_path'], tail=days)
         if daily_data is None or len(daily_data) < days:
             return None
-        return daily_data.tail(days)
+        return daily_data
     except Exception as e:
         logger.error(f"获取{symbol}数据失败: {str(e)}")
         return None
@@ -8,11 +8,31 @@ from sklearn.preprocessing import StandardScaler
 import matplotlib.pyplot as plt
 import seaborn as sns
 import baostock as bs
+from core.daily_bar_parquet import read_bars
+from core.trade_calendar import get_calendar
 import matplotlib
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
 # ================== 1. 数据获取与预处理 ==================
+def covers_range(dates, start_date, end_date):
+    """
+    本地日线是否覆盖[start_date, end_date]：最早一条不晚于区间内第一个交易日，最晚一条不早于end_date之前最近的交易日
+    （当天收盘前可能还没有当天的数据）。没有交易日历时按工作日估算。
+    :param dates: 日期Series
+    """
+    first, last = pd.Timestamp(dates.min()).normalize(), pd.Timestamp(dates.max()).normalize()
+    calendar = get_calendar()
+    if calendar is not None:
+        trade_days = calendar.between(start_date, end_date)
+        expected_first = pd.Timestamp(trade_days[0]) if len(trade_days) else pd.Timestamp(start_date)
+        previous = calendar.previous(end_date)
+        expected_last = pd.Timestamp(previous) if previous is not None else pd.Timestamp(end_date)
+    else:
+        expected_first = pd.Timestamp(start_date) + pd.offsets.BDay(0)
+        expected_last = pd.Timestamp(end_date) - pd.offsets.BDay(1)
+    return first <= expected_first and last >= expected_last
+
 def fetch_stock_data(stock_code, years=3):
     """
     获取股票历史数据（支持A股/美股）
@@ -71,6 +91,26 @@ def fetch_stock_data(stock_code, years=3):
         # A股，转为baostock格式
         code = stock_code.replace('.SS', '').replace('.SZ', '')
         baostock_code = add_prefix(code)
+        # 优先读本地Parquet日线镜像（前复权，与下面baostock的adjustflag一致），
+        # 镜像没有数据或没有覆盖整个区间（只同步了最近几个月、或还没同步到最近的交易日）时联网获取
+        local = read_bars(codes=[code], start_date=start_date, end_date=end_date)
+        if not local.empty and not covers_range(local['date'], start_date, end_date):
+            print(f"本地Parquet镜像中{stock_code}的数据为{local['date'].min()}至{local['date'].max()}，"
+                  f"未覆盖{start_date}至{end_date}，改用baostock")
+        elif not local.empty:
+            local['date'] = pd.to_datetime(local['date'])
+            local = local.rename(columns={
+                'open': 'Open',
+                'high': 'High',
+                'low': 'Low',
+                'close': 'Close',
+                'volume': 'Volume',
+                'amount': 'Amount',
+                'date': 'Date',
+            }).set_index('Date')
+            local['Stock'] = baostock_code
+            print(f"从本地Parquet镜像读取{stock_code}近{years}年数据，共{len(local)}条")
+            return local
         try:
             data = get_a_hist_k_data(baostock_code, start_date, end_date)
             print(f"成功用baostock获取{stock_code}近{years}年数据，共{len(data)}条")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import aiomysql
+import core.database as mdb
+
+# core.database 的异步版本，基于aiomysql，供asyncio实时任务使用。
+# 连接参数沿用core.database的配置，每个目标数据库一个连接池；连接池绑定在创建它的事件循环上。
+async_pool_minsize = 1
+async_pool_maxsize = 10
+
+_pools = {}
+_pools_lock = None
+
+
+async def get_pool(to_db=None):
+    global _pools_lock
+    db_name = to_db or mdb.MYSQL_CONN_DBAPI['database']
+    pool = _pools.get(db_name)
+    if pool is not None:
+        return pool
+    if _pools_lock is None:
+        _pools_lock = asyncio.Lock()
+    async with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = await aiomysql.create_pool(host=mdb.db_host, port=mdb.db_port, user=mdb.db_user,
+                                              password=mdb.db_password, db=db_name, charset=mdb.db_charset,
+                                              autocommit=True, minsize=async_pool_minsize,
+                                              maxsize=async_pool_maxsize, pool_recycle=mdb.db_pool_recycle)
+            _pools[db_name] = pool
+    return pool
+
+
+async def close_pools():
+    global _pools_lock
+    pools = list(_pools.values())
+    _pools.clear()
+    _pools_lock = None
+    for pool in pools:
+        pool.close()
+        await pool.wait_closed()
+
+
+# 增删改数据
+async def execute_sql(sql, params=(), to_db=None):
+    pool = await get_pool(to_db)
+    async with pool.acquire() as conn:
+        async with conn.cursor() as db:
+            try:
+                await db.execute(sql, params)
+            except Exception as e:
+                logging.error(f"async_database.execute_sql处理异常：{sql}{e}")
+    mdb._invalidate_for_ddl(sql, to_db)
+
+
+# 查询数据
+async def execute_sql_fetch(sql, params=(), to_db=None):
+    pool = await get_pool(to_db)
+    async with pool.acquire() as conn:
+        async with conn.cursor() as db:
+            try:
+                await db.execute(sql, params)
+                return await db.fetchall()
+            except Exception as e:
+                logging.error(f"async_database.execute_sql_fetch处理异常：{sql}{e}")
+    return None
+
+
+# 计算数量
+async def execute_sql_count(sql, params=(), to_db=None):
+    result = await execute_sql_fetch(sql, params, to_db)
+    if result is not None and len(result) == 1:
+        return int(result[0][0])
+    return 0
+
+
+async def bulk_insert_db_from_df(data, table_name, to_db=None, batch_size=None):
+    """
+    与core.database.bulk_insert_db_from_df的BULK_UPSERT方式相同：多行INSERT ... ON DUPLICATE KEY UPDATE，
+    所有批次在一个事务中提交。
+    :return: 写入的行数
+    """
+    if data is None or len(data.index) == 0:
+        return 0
+    batch_size = batch_size or mdb.bulk_batch_size
+    cols = data.columns.tolist()
+    sql = mdb._insert_sql(table_name, cols)
+    rows = mdb._df_rows(data, cols)
+    pool = await get_pool(to_db)
+    async with pool.acquire() as conn:
+        try:
+            await conn.begin()
+            async with conn.cursor() as db:
+                for i in range(0, len(rows), batch_size):
+                    await db.executemany(sql, rows[i:i + batch_size])
+            await conn.commit()
+        except Exception as e:
+            await conn.rollback()
+            logging.error(f"async_database.bulk_insert_db_from_df处理异常：{table_name}表{e}")
+            return 0
+    return len(rows)
+
+
+# 不等待write()返回的Future时，失败在这里记录，同时取走异常，避免“exception was never retrieved”
+def _log_write_failure(future, sql):
+    if future.cancelled():
+        return
+    e = future.exception()
+    if e is not None:
+        logging.error(f"async_database.AsyncWriter.write处理异常：{sql}{e}")
+
+
+class AsyncWriter:
+    """
+    流水线写入：write()只把语句放入队列并立即返回一个Future，不等待数据库往返；
+    后台任务在一个连接上把队列中的语句按批执行，每批一个事务，提交后再完成对应的Future。
+    await commit() 等待此前写入的所有语句提交完成；上次commit之后有批次回滚时，抛出其中第一个异常。
+
+        writer = AsyncWriter()
+        writer.write("REPLACE INTO t (a, b) VALUES (%s, %s)", (1, 2))
+        await writer.commit()
+        await writer.close()
+    """
+
+    def __init__(self, to_db=None, batch_size=500, flush_interval=0.2):
+        self.to_db = to_db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.committed = 0
+        self.failed = 0
+        self._error = None
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def write(self, sql, params=()):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        if sql is not None:
+            future.add_done_callback(lambda f: _log_write_failure(f, sql))
+        self._queue.put_nowait((sql, params, future))
+        return future
+
+    async def commit(self):
+        # 队列中的最后一条语句提交后，之前的也都已提交
+        if self._queue.empty() and self._task is None:
+            return
+        try:
+            await self.write(None)
+        finally:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    async def close(self):
+        if self._task is None:
+            return
+        try:
+            await self.commit()
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1][0] is not None:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            statements = [(sql, params) for sql, params, _ in batch if sql is not None]
+            error = None
+            if statements:
+                try:
+                    pool = await get_pool(self.to_db)
+                    async with pool.acquire() as conn:
+                        try:
+                            await conn.begin()
+                            async with conn.cursor() as db:
+                                for sql, params in statements:
+                                    await db.execute(sql, params)
+                            await conn.commit()
+                        except Exception:
+                            await conn.rollback()
+                            raise
+                    self.committed += len(statements)
+                except Exception as e:
+                    self.failed += len(statements)
+                    logging.error(f"async_database.AsyncWriter处理异常：{e}")
+                    error = e
+                    if self._error is None:
+                        self._error = e
+            for _, _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
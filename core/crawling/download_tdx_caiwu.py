@@ -1,64 +1,169 @@
 import os
-import requests
+import json
+import shutil
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from tqdm import tqdm
+from core import http_client
+from core.fundamentals import ingest_financial_files
 
-# -------------------------------
-# 下载文件函数（稳定单行进度）
-# -------------------------------
-def download_file(url, dest_path):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
-        'Referer': 'https://www.tdx.com.cn/',
-        'Accept': '*/*',
-        'Connection': 'keep-alive'
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Referer': 'https://www.tdx.com.cn/',
+    'Accept': '*/*'
+}
+# 记录每个url上次下载完成时服务器返回的ETag/Last-Modified/大小，用于判断文件是否变化
+STATE_FILE = '.download_state.json'
+# 记录每个解压出的文件对应的zip成员CRC，CRC不变的成员不再解压
+MANIFEST_FILE = '.crc_manifest.json'
+CHUNK_SIZE = 1024 * 100  # 100KB 块提升性能
+
+_state_lock = threading.Lock()
+
+
+def _load_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _remote_meta(response):
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'size': int(response.headers.get('Content-Length', 0)),
     }
 
+
+def _unchanged(saved, remote):
+    if not saved:
+        return False
+    if remote['etag'] or remote['last_modified']:
+        return saved.get('etag') == remote['etag'] and saved.get('last_modified') == remote['last_modified'] \
+            and saved.get('size') == remote['size']
+    # 服务器不给校验信息时只能比较大小
+    return remote['size'] > 0 and saved.get('size') == remote['size']
+
+
+# -------------------------------
+# 下载文件函数（断点续传，文件未变化时跳过）
+# -------------------------------
+def download_file(url, dest_path, position=0):
+    """
+    :return: True表示下载了新文件，False表示文件未变化或下载失败
+    """
+    state_path = os.path.join(os.path.dirname(dest_path) or '.', STATE_FILE)
+    part_path = dest_path + '.part'
     try:
-        with requests.get(url, headers=headers, stream=True, timeout=10) as response:
+        head = http_client.request('HEAD', url, headers=HEADERS, allow_redirects=True, retries=2)
+        head.raise_for_status()
+        remote = _remote_meta(head)
+        with _state_lock:
+            saved = _load_json(state_path).get(url)
+        if os.path.exists(dest_path) and os.path.getsize(dest_path) == remote['size'] and _unchanged(saved, remote):
+            print(f"⏭️ 文件未变化，跳过下载：{dest_path}")
+            return False
+
+        headers = dict(HEADERS)
+        offset = 0
+        # .part是同一版本文件下载到一半留下的，用Range从断点继续；If-Range保证服务器文件变化时返回完整文件
+        partial = (saved or {}).get('partial')
+        if os.path.exists(part_path) and partial and head.headers.get('Accept-Ranges') == 'bytes':
+            validator = remote['etag'] or remote['last_modified']
+            if validator and validator == (partial.get('etag') or partial.get('last_modified')):
+                offset = os.path.getsize(part_path)
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = validator
+        with _state_lock:
+            state = _load_json(state_path)
+            state.setdefault(url, {})['partial'] = remote
+            _save_json(state_path, state)
+
+        with http_client.get(url, headers=headers, stream=True, timeout=10) as response:
             response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 1024 * 100  # 100KB 块提升性能
+            if response.status_code != 206:
+                offset = 0
+            total_size = remote['size'] or offset + int(response.headers.get('content-length', 0))
 
             with tqdm(
                 total=total_size,
+                initial=offset,
                 unit='B',
                 unit_scale=True,
                 desc=f"下载中: {os.path.basename(dest_path)}",
+                position=position,
                 leave=True
             ) as progress_bar:
 
-                with open(dest_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=block_size):
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
                         if chunk:
                             f.write(chunk)
                             progress_bar.update(len(chunk))
 
+        if remote['size'] and os.path.getsize(part_path) != remote['size']:
+            print(f"❌ 下载不完整：{dest_path}，下次运行时继续")
+            return False
+        os.replace(part_path, dest_path)
+        with _state_lock:
+            state = _load_json(state_path)
+            state[url] = remote
+            _save_json(state_path, state)
         print(f"✅ 下载完成：{dest_path}")
+        return True
 
     except requests.exceptions.HTTPError as e:
         print(f"❌ HTTP 错误：{e}")
     except requests.exceptions.RequestException as e:
-        print(f"❌ 请求异常：{e}")
+        print(f"❌ 请求异常：{e}，已下载部分保留，下次运行时继续")
+    return False
+
 
 # -------------------------------
-# 解压 zip 文件并覆盖到目标目录
+# 解压 zip 文件到目标目录，只解压CRC变化的成员
 # -------------------------------
 def unzip_file(zip_path, extract_to):
     try:
+        os.makedirs(extract_to, exist_ok=True)
+        manifest_path = os.path.join(extract_to, MANIFEST_FILE)
+        manifest = _load_json(manifest_path)
+        extracted = skipped = 0
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            os.makedirs(extract_to, exist_ok=True)
-            for member in zip_ref.namelist():
-                target_path = os.path.join(extract_to, member)
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                target_path = os.path.join(extract_to, info.filename)
+                if manifest.get(info.filename) == info.CRC and os.path.exists(target_path) \
+                        and os.path.getsize(target_path) == info.file_size:
+                    skipped += 1
+                    continue
                 os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                with open(target_path, 'wb') as outfile:
-                    outfile.write(zip_ref.read(member))
-            print(f"✅ 解压完成：{zip_path} → {extract_to}")
+                # 分块写到同目录的临时文件，写完后原子替换，读方不会读到写了一半的文件
+                tmp_path = target_path + '.tmp'
+                with zip_ref.open(info) as source, open(tmp_path, 'wb') as outfile:
+                    shutil.copyfileobj(source, outfile, CHUNK_SIZE)
+                os.replace(tmp_path, target_path)
+                manifest[info.filename] = info.CRC
+                extracted += 1
+        _save_json(manifest_path, manifest)
+        print(f"✅ 解压完成：{zip_path} → {extract_to}，更新{extracted}个文件，{skipped}个未变化")
     except zipfile.BadZipFile:
         print(f"❌ 文件损坏或不是有效的 ZIP：{zip_path}")
 
+
 # -------------------------------
-# 主程序入口（顺序下载）
+# 主程序入口（并发下载）
 # -------------------------------
 def main():
     urls = [
@@ -70,11 +175,17 @@ def main():
     os.makedirs(temp_download_dir, exist_ok=True)
     extract_path = r"/mnt/c/new_tdx/vipdoc/cw"
 
-    for url in urls:
-        filename = os.path.basename(url)
-        zip_path = os.path.join(temp_download_dir, filename)
-        download_file(url, zip_path)
-        unzip_file(zip_path, extract_path)
+    zip_paths = [os.path.join(temp_download_dir, os.path.basename(url)) for url in urls]
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        list(executor.map(download_file, urls, zip_paths, range(len(urls))))
+
+    # 压缩包未重新下载时也检查一遍，补齐上次中断或被删除的文件；CRC未变的成员直接跳过
+    for zip_path in zip_paths:
+        if os.path.exists(zip_path):
+            unzip_file(zip_path, extract_path)
+
+    # 只解析新增或更新过的gpcw*.dat，写入本地财务数据存储
+    ingest_financial_files(extract_path)
 
     print("🎉 所有文件下载并解压完成。")
 
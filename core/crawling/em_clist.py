@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Desc: 东方财富 clist 列表接口的分页并发抓取
+先取第一页得到总数和服务器实际返回的每页条数，其余页在有界线程池中并发抓取，按页码顺序拼接。
+请求经由core.http_client发出，复用同一host的长连接并由其负责重试。
+"""
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core import http_client
+
+# 服务器会把过大的pz截断，实际每页条数以第一页返回的条数为准
+clist_page_size = 100
+clist_max_workers = 8
+clist_timeout = 10
+clist_retries = 2
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _fetch_page(url: str, params: dict, page: int, timeout: float) -> tuple:
+    page_params = dict(params, pn=page)
+    start = time.perf_counter()
+    try:
+        r = http_client.get(url, params=page_params, timeout=timeout, retries=clist_retries)
+        r.raise_for_status()
+        data = r.json()["data"]
+        return data, time.perf_counter() - start
+    except Exception as e:
+        logging.error(f"em_clist._fetch_page处理异常：{params.get('fs')} 第{page}页{e}")
+        raise
+
+
+def fetch_clist(url: str, params: dict, page_size: int = None, max_workers: int = None,
+                timeout: float = None) -> list:
+    """
+    抓取 clist 接口的全部分页
+    :param url: clist 接口地址
+    :type url: str
+    :param params: 请求参数，pn/pz 由本函数设置
+    :type params: dict
+    :param page_size: 每页条数，默认 clist_page_size
+    :type page_size: int
+    :param max_workers: 并发线程数，默认 clist_max_workers
+    :type max_workers: int
+    :param timeout: 单页超时秒数，默认 clist_timeout
+    :type timeout: float
+    :return: 按页码顺序拼接的 diff 列表，无数据时为空列表
+    :rtype: list
+    """
+    page_size = page_size or clist_page_size
+    max_workers = max_workers or clist_max_workers
+    timeout = timeout or clist_timeout
+    params = dict(params, pz=page_size, np="1")
+    start = time.perf_counter()
+    first, first_seconds = _fetch_page(url, params, 1, timeout)
+    if not first or not first["diff"]:
+        return []
+    pages = [first["diff"]]
+    page_seconds = [first_seconds]
+    per_page = len(first["diff"])
+    page_count = math.ceil(first["total"] / per_page)
+    if page_count > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, page_count - 1)) as executor:
+            results = executor.map(lambda page: _fetch_page(url, params, page, timeout), range(2, page_count + 1))
+            for data, seconds in results:
+                pages.append(data["diff"] if data and data["diff"] else [])
+                page_seconds.append(seconds)
+    rows = [row for page in pages for row in page]
+    stats = {
+        "pages": page_count,
+        "rows": len(rows),
+        "page_size": per_page,
+        "total_seconds": round(time.perf_counter() - start, 3),
+        "first_page_seconds": round(first_seconds, 3),
+        "max_page_seconds": round(max(page_seconds), 3),
+        "avg_page_seconds": round(sum(page_seconds) / len(page_seconds), 3),
+    }
+    with _stats_lock:
+        _stats[params.get("fs")] = stats
+    logging.info(f"em_clist.fetch_clist：{params.get('fs')} {stats}")
+    return rows
+
+
+def clist_stats() -> dict:
+    """
+    最近一次抓取各列表的耗时统计，按 fs 参数区分
+    :return: {fs: {pages, rows, page_size, total_seconds, first_page_seconds, max_page_seconds, avg_page_seconds}}
+    :rtype: dict
+    """
+    with _stats_lock:
+        return {fs: dict(stats) for fs, stats in _stats.items()}
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Desc: 东方财富 kline/trends 接口返回数据的解码
+接口把每根K线编码成一个逗号拼接的字符串，如 "2024-01-02,9.39,9.21,9.42,9.21,1158366,1075742252.45,2.24,-1.92,-0.18,0.60"。
+这里把全部行拼成一段文本，交给pandas的C解析器一次性解析成带类型的列：时间列为datetime64，成交量为int64，其余为float64，
+不再先生成object类型的DataFrame再逐列pd.to_numeric。JSON用orjson解析，没有安装时退回标准库json。
+"""
+import io
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+KLINE_COLUMNS = ["开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
+TRENDS_COLUMNS = ["开盘", "收盘", "最高", "最低", "成交量", "成交额", "最新价"]
+INT_COLUMNS = ("成交量",)
+
+
+def loads(response) -> dict:
+    """
+    解析接口返回的JSON
+    :param response: requests.Response
+    """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return json.loads(response.content)
+
+
+def decode(rows: list, time_column: str, columns: list, time_unit: str = "D") -> pd.DataFrame:
+    """
+    把逗号拼接的行解码为带类型的DataFrame
+    :param rows: data.klines 或 data.trends
+    :param time_column: 第一列（时间）的列名，如"日期"、"时间"
+    :param columns: 其余各列的列名
+    :param time_unit: 时间列的精度，日线为"D"，分钟线为"m"
+    :return: 时间列为datetime64，成交量为int64，其余为float64
+    """
+    names = [time_column] + list(columns)
+    if not rows:
+        return pd.DataFrame({name: pd.Series(dtype="float64") for name in names})
+    dtype = {name: "int64" if name in INT_COLUMNS else "float64" for name in columns}
+    dtype[time_column] = str
+    text = "\n".join(rows)
+    try:
+        df = pd.read_csv(io.StringIO(text), header=None, names=names, dtype=dtype, na_values=["-"],
+                         keep_default_na=False, engine="c")
+    except ValueError:
+        # 个别行的成交量为"-"等非整数值时，整数列退回float64
+        dtype.update({name: "float64" for name in INT_COLUMNS if name in dtype})
+        df = pd.read_csv(io.StringIO(text), header=None, names=names, dtype=dtype, na_values=["-"],
+                         keep_default_na=False, engine="c")
+    df[time_column] = df[time_column].to_numpy().astype(f"datetime64[{time_unit}]")
+    return df
+
+
+def format_time(values, time_unit: str = "D") -> np.ndarray:
+    """
+    datetime64列格式化为原接口函数返回的字符串：日线为"YYYY-MM-DD"，分钟线为"YYYY-MM-DD HH:MM:SS"
+    """
+    values = np.asarray(values)
+    if time_unit == "D":
+        return np.datetime_as_string(values.astype("datetime64[D]"), unit="D")
+    text = np.datetime_as_string(values.astype("datetime64[s]"), unit="s")
+    return np.char.replace(text, "T", " ")
+
+
+def slice_time(df: pd.DataFrame, time_column: str, start, end) -> pd.DataFrame:
+    """
+    按时间区间[start, end]筛选行，start/end可以是部分日期字符串，与DatetimeIndex切片的语义相同
+    """
+    index = pd.DatetimeIndex(df[time_column])
+    return df.set_axis(index)[start:end].reset_index(drop=True)
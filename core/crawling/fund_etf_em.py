@@ -5,10 +5,11 @@ Date: 2023/1/4 12:18
 Desc: 东方财富-ETF 行情
 https://quote.eastmoney.com/sh513500.html
 """
-from functools import lru_cache
-import math
 import pandas as pd
-import requests
+from core import http_client
+from core.crawling import em_kline
+from core.crawling.em_clist import fetch_clist
+from core.crawling.security_id_map import SecurityIdMap
 
 
 def fund_etf_spot_em() -> pd.DataFrame:
@@ -19,11 +20,7 @@ def fund_etf_spot_em() -> pd.DataFrame:
     :rtype: pandas.DataFrame
     """
     url = "http://88.push2.eastmoney.com/api/qt/clist/get"
-    page_size = 50
-    page_current = 1
     params = {
-        "pn": page_current,
-        "pz": page_size,
         "po": "1",
         "np": "1",
         "ut": "bd1d9ddb04089700cf9c27f6f7426281",
@@ -35,24 +32,10 @@ def fund_etf_spot_em() -> pd.DataFrame:
         "fields": "f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f115,f152",
         "_": "1672806290972",
     }
-    r = requests.get(url, params=params)
-    data_json = r.json()
-
-    data = data_json["data"]["diff"]
+    data = fetch_clist(url, params)
     if not data:
         return pd.DataFrame()
 
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r = requests.get(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df = pd.DataFrame(data)
     temp_df.rename(
         columns={
@@ -106,10 +89,9 @@ def fund_etf_spot_em() -> pd.DataFrame:
     return temp_df
 
 
-@lru_cache()
-def _fund_etf_code_id_map_em() -> dict:
+def _fund_etf_code_id_map_em_remote() -> dict:
     """
-    东方财富-ETF 代码和市场标识映射
+    东方财富-ETF 代码和市场标识映射，从接口抓取
     https://quote.eastmoney.com/center/gridlist.html#fund_etf
     :return: ETF 代码和市场标识映射
     :rtype: pandas.DataFrame
@@ -129,12 +111,34 @@ def _fund_etf_code_id_map_em() -> dict:
         "fields": "f12,f13",
         "_": "1672806290972",
     }
-    r = requests.get(url, params=params)
+    r = http_client.get(url, params=params)
     data_json = r.json()
     temp_df = pd.DataFrame(data_json["data"]["diff"])
     temp_dict = dict(zip(temp_df["f12"], temp_df["f13"]))
     return temp_dict
 
+
+_fund_etf_code_id_map = SecurityIdMap("fund_etf_code_id_map_em", _fund_etf_code_id_map_em_remote)
+
+
+def _fund_etf_code_id_map_em() -> dict:
+    """
+    东方财富-ETF 代码和市场标识映射，读本地缓存，每天开盘前第一次使用时刷新
+    :return: ETF 代码和市场标识映射
+    :rtype: dict
+    """
+    return _fund_etf_code_id_map.get()
+
+
+def refresh_fund_etf_code_id_map_em() -> dict:
+    """
+    强制从接口刷新 ETF 代码和市场标识映射缓存
+    :return: ETF 代码和市场标识映射
+    :rtype: dict
+    """
+    return _fund_etf_code_id_map.refresh()
+
+
 def fund_etf_hist_em(
     symbol: str = "159707",
     period: str = "daily",
@@ -173,37 +177,12 @@ def fund_etf_hist_em(
         "end": end_date,
         "_": "1623766962675",
     }
-    r = requests.get(url, params=params)
-    data_json = r.json()
+    r = http_client.get(url, params=params)
+    data_json = em_kline.loads(r)
     if not (data_json["data"] and data_json["data"]["klines"]):
         return pd.DataFrame()
-    temp_df = pd.DataFrame([item.split(",") for item in data_json["data"]["klines"]])
-    temp_df.columns = [
-        "日期",
-        "开盘",
-        "收盘",
-        "最高",
-        "最低",
-        "成交量",
-        "成交额",
-        "振幅",
-        "涨跌幅",
-        "涨跌额",
-        "换手率",
-    ]
-    temp_df.index = pd.to_datetime(temp_df["日期"])
-    temp_df.reset_index(inplace=True, drop=True)
-
-    temp_df["开盘"] = pd.to_numeric(temp_df["开盘"])
-    temp_df["收盘"] = pd.to_numeric(temp_df["收盘"])
-    temp_df["最高"] = pd.to_numeric(temp_df["最高"])
-    temp_df["最低"] = pd.to_numeric(temp_df["最低"])
-    temp_df["成交量"] = pd.to_numeric(temp_df["成交量"])
-    temp_df["成交额"] = pd.to_numeric(temp_df["成交额"])
-    temp_df["振幅"] = pd.to_numeric(temp_df["振幅"])
-    temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"])
-    temp_df["涨跌额"] = pd.to_numeric(temp_df["涨跌额"])
-    temp_df["换手率"] = pd.to_numeric(temp_df["换手率"])
+    temp_df = em_kline.decode(data_json["data"]["klines"], "日期", em_kline.KLINE_COLUMNS)
+    temp_df["日期"] = em_kline.format_time(temp_df["日期"])
     return temp_df
 
 
@@ -247,32 +226,11 @@ def fund_etf_hist_min_em(
             "secid": f"{code_id_dict[symbol]}.{symbol}",
             "_": "1623766962675",
         }
-        r = requests.get(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(
-            [item.split(",") for item in data_json["data"]["trends"]]
-        )
-        temp_df.columns = [
-            "时间",
-            "开盘",
-            "收盘",
-            "最高",
-            "最低",
-            "成交量",
-            "成交额",
-            "最新价",
-        ]
-        temp_df.index = pd.to_datetime(temp_df["时间"])
-        temp_df = temp_df[start_date:end_date]
-        temp_df.reset_index(drop=True, inplace=True)
-        temp_df["开盘"] = pd.to_numeric(temp_df["开盘"])
-        temp_df["收盘"] = pd.to_numeric(temp_df["收盘"])
-        temp_df["最高"] = pd.to_numeric(temp_df["最高"])
-        temp_df["最低"] = pd.to_numeric(temp_df["最低"])
-        temp_df["成交量"] = pd.to_numeric(temp_df["成交量"])
-        temp_df["成交额"] = pd.to_numeric(temp_df["成交额"])
-        temp_df["最新价"] = pd.to_numeric(temp_df["最新价"])
-        temp_df["时间"] = pd.to_datetime(temp_df["时间"]).astype(str)
+        r = http_client.get(url, params=params)
+        data_json = em_kline.loads(r)
+        temp_df = em_kline.decode(data_json["data"]["trends"], "时间", em_kline.TRENDS_COLUMNS, "m")
+        temp_df = em_kline.slice_time(temp_df, "时间", start_date, end_date)
+        temp_df["时间"] = em_kline.format_time(temp_df["时间"], "m")
         return temp_df
     else:
         url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
@@ -287,38 +245,11 @@ def fund_etf_hist_min_em(
             "end": "20500000",
             "_": "1630930917857",
         }
-        r = requests.get(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(
-            [item.split(",") for item in data_json["data"]["klines"]]
-        )
-        temp_df.columns = [
-            "时间",
-            "开盘",
-            "收盘",
-            "最高",
-            "最低",
-            "成交量",
-            "成交额",
-            "振幅",
-            "涨跌幅",
-            "涨跌额",
-            "换手率",
-        ]
-        temp_df.index = pd.to_datetime(temp_df["时间"])
-        temp_df = temp_df[start_date:end_date]
-        temp_df.reset_index(drop=True, inplace=True)
-        temp_df["开盘"] = pd.to_numeric(temp_df["开盘"])
-        temp_df["收盘"] = pd.to_numeric(temp_df["收盘"])
-        temp_df["最高"] = pd.to_numeric(temp_df["最高"])
-        temp_df["最低"] = pd.to_numeric(temp_df["最低"])
-        temp_df["成交量"] = pd.to_numeric(temp_df["成交量"])
-        temp_df["成交额"] = pd.to_numeric(temp_df["成交额"])
-        temp_df["振幅"] = pd.to_numeric(temp_df["振幅"])
-        temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"])
-        temp_df["涨跌额"] = pd.to_numeric(temp_df["涨跌额"])
-        temp_df["换手率"] = pd.to_numeric(temp_df["换手率"])
-        temp_df["时间"] = pd.to_datetime(temp_df["时间"]).astype(str)
+        r = http_client.get(url, params=params)
+        data_json = em_kline.loads(r)
+        temp_df = em_kline.decode(data_json["data"]["klines"], "时间", em_kline.KLINE_COLUMNS, "m")
+        temp_df = em_kline.slice_time(temp_df, "时间", start_date, end_date)
+        temp_df["时间"] = em_kline.format_time(temp_df["时间"], "m")
         temp_df = temp_df[
             [
                 "时间",
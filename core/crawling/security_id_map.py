@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Desc: 证券代码 -> 东方财富市场标识 映射的本地持久化缓存
+映射保存为 data/cache/<name>.json，新进程启动时直接读文件；每天 refresh_time 之后第一次使用时从接口重新抓取，
+写临时文件后原子替换，读方不会读到写了一半的文件。抓取失败时继续使用旧映射。
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'cache')
+# 开盘集合竞价之前刷新，当天新上市的代码已经出现在列表中
+DEFAULT_REFRESH_TIME = datetime.time(9, 0)
+# 刷新失败后，已有旧映射时至少间隔这么多秒再重试
+RETRY_INTERVAL = 300
+
+
+class SecurityIdMap:
+
+    def __init__(self, name: str, loader, refresh_time: datetime.time = DEFAULT_REFRESH_TIME):
+        """
+        :param name: 缓存文件名（不含扩展名）
+        :param loader: 无参函数，从接口抓取完整映射，返回 dict
+        :param refresh_time: 每天的刷新时间点，缓存更新时间早于最近一个刷新时间点即视为过期
+        """
+        self.name = name
+        self.loader = loader
+        self.refresh_time = refresh_time
+        self.path = os.path.join(CACHE_DIR, f'{name}.json')
+        self._data = None
+        self._updated_at = None
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh_boundary(self, now: datetime.datetime) -> datetime.datetime:
+        boundary = datetime.datetime.combine(now.date(), self.refresh_time)
+        if now < boundary:
+            boundary -= datetime.timedelta(days=1)
+        return boundary
+
+    def _is_stale(self) -> bool:
+        return self._updated_at is None or self._updated_at < self._refresh_boundary(datetime.datetime.now())
+
+    def _load_file(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                cached = json.load(f)
+            self._data = cached['data']
+            self._updated_at = datetime.datetime.fromisoformat(cached['updated_at'])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"security_id_map._load_file处理异常：{self.path}{e}")
+
+    def _write_file(self, data: dict, updated_at: datetime.datetime):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(CACHE_DIR, f'.{self.name}.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': updated_at.isoformat(timespec='seconds'), 'data': data}, f)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self) -> dict:
+        """
+        强制从接口重新抓取映射并替换缓存文件
+        :return: 最新的映射；抓取失败或结果为空时返回原有映射
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> dict:
+        start = time.perf_counter()
+        self._last_attempt = time.monotonic()
+        try:
+            data = self.loader()
+        except Exception as e:
+            logging.error(f"security_id_map.refresh处理异常：{self.name}{e}")
+            data = None
+        if not data:
+            # 接口异常时沿用旧映射，但不更新时间，下次使用时再尝试刷新
+            return self._data if self._data is not None else dict()
+        data = {str(code): int(market_id) for code, market_id in data.items()}
+        updated_at = datetime.datetime.now()
+        try:
+            self._write_file(data, updated_at)
+        except Exception as e:
+            logging.error(f"security_id_map._write_file处理异常：{self.path}{e}")
+        # 整体替换引用，正在使用旧字典的调用方不受影响
+        self._data = data
+        self._updated_at = updated_at
+        logging.info(f"security_id_map.refresh：{self.name} {len(data)}个代码，"
+                     f"耗时{round(time.perf_counter() - start, 3)}秒")
+        return data
+
+    def get(self) -> dict:
+        """
+        :return: 代码 -> 市场标识 的映射，调用方不要修改返回的字典
+        """
+        data = self._data
+        if data is not None and not self._is_stale():
+            return data
+        with self._lock:
+            if self._data is None:
+                self._load_file()
+            # 其他进程可能已经刷新了文件
+            if self._data is not None and self._is_stale() and os.path.exists(self.path):
+                self._load_file()
+            if self._data is None or \
+                    (self._is_stale() and time.monotonic() - self._last_attempt >= RETRY_INTERVAL):
+                return self._refresh()
+            return self._data
+
+    def status(self) -> dict:
+        return {'name': self.name, 'path': self.path, 'codes': len(self._data or ()),
+                'updated_at': self._updated_at, 'stale': self._is_stale()}
@@ -4,38 +4,50 @@ import core.tablestructure as tbs
 import core.database as mdb
 from datetime import datetime
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import core.trade_time as trade_time
 import numpy as np
 from core.utils import get_recent_trade_range
+from core.daily_bar import save_daily_bar, DAILY_BAR_TABLE
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# 代码映射表在stock_hist库
+hist_db = mdb.Database("stock_hist")
 
+HIST_K_FIELDS = "date,code,open,high,low,close,volume,amount,adjustflag"
+# baostock的登录状态是进程级的全局变量，所以按进程并发：每个工作进程登录一次，之后复用同一会话查询。
+baostock_workers = 8
+# 每个任务包含的股票数，任务越小结果越早流回主进程写库
+baostock_chunk_size = 50
+
+
+# baostock“用户未登录”的错误码，会话过期或被服务端踢下线时返回
+BAOSTOCK_NOT_LOGGED_IN = '10001001'
+
+
+# 在已登录的会话上查询一个股票的历史K线，返回(DataFrame, 错误码)。adjustflag：复权类型，默认不复权：3；1：后复权；2：前复权。
+def _query_hist_k_data(baostock_code, start_date, end_date):
+    rs = bs.query_history_k_data_plus(
+        baostock_code, HIST_K_FIELDS,
+        start_date=start_date, end_date=end_date,
+        frequency="d", adjustflag="2")
+    result_list = []
+    while (rs.error_code == '0') & rs.next():
+        result_list.append(rs.get_row_data())
+    if rs.error_code != '0':
+        logging.error(f"stock_hist_baostock._query_hist_k_data处理异常：{baostock_code} {rs.error_code}{rs.error_msg}")
+    return pd.DataFrame(result_list, columns=rs.fields or HIST_K_FIELDS.split(',')), rs.error_code
 
 
 # 获取一个股票从start_date到end_date的历史数据
-def get_a_hist_k_data(baostock_code, start_date, end_date):  # adjustflag：复权类型，默认不复权：3；1：后复权；2：前复权。
+def get_a_hist_k_data(baostock_code, start_date, end_date):
     # 登陆系统
     lg = bs.login()
     # 显示登陆返回信息
     print(lg.error_code)
     print(lg.error_msg)
     # 查询历史K线数据
-    rs = bs.query_history_k_data_plus(
-        baostock_code,
-        "date,code,open,high,low,close,volume,amount,adjustflag",
-        start_date=start_date, end_date=end_date,
-        frequency="d", adjustflag="2")  
-    print(rs.error_code)
-    print(rs.error_msg)
-    # 获取具体的信息
-    result_list = []
-    while (rs.error_code == '0') & rs.next():
-        result_list.append(rs.get_row_data())
-    result = pd.DataFrame(result_list, columns=rs.fields)
+    result, _ = _query_hist_k_data(baostock_code, start_date, end_date)
     print(f"{baostock_code} 从{start_date}到{end_date}的历史数据:")
     print(result)
     # 登出系统
@@ -43,42 +55,115 @@ def get_a_hist_k_data(baostock_code, start_date, end_date):  # adjustflag：复
     return result
 
 
-# 获取所有股票从start_date到end_date的历史数据，并保存到数据库
-def get_all_hist_k_data_and_save(start_date_str, end_date_str):
+def _worker_login():
+    lg = bs.login()
+    if lg.error_code != '0':
+        logging.error(f"stock_hist_baostock._worker_login处理异常：{lg.error_code}{lg.error_msg}")
+
+
+# 工作进程中执行：在本进程的会话上依次查询一组股票，会话失效（如超时被踢）时重新登录一次再查。
+# 返回(有数据的DataFrame列表, 查询成功的代码列表（含无数据的停牌股）, 股票数)
+def _fetch_hist_chunk(codes, start_date, end_date):
+    frames = []
+    queried = []
+    for baostock_code in codes:
+        try:
+            hist_df, error_code = _query_hist_k_data(baostock_code, start_date, end_date)
+            if error_code == BAOSTOCK_NOT_LOGGED_IN:
+                _worker_login()
+                hist_df, error_code = _query_hist_k_data(baostock_code, start_date, end_date)
+            if error_code != '0':
+                continue
+            queried.append(baostock_code)
+            if not hist_df.empty:
+                frames.append(hist_df)
+        except Exception as e:
+            logging.error(f"stock_hist_baostock._fetch_hist_chunk处理异常：{baostock_code}{e}")
+    return frames, queried, len(codes)
+
+
+def fetch_hist_k_data_and_save(baostock_codes, start_date_str, end_date_str, batch_size=200, workers=None,
+                               on_saved=None):
+    """
+    抓取一组股票从start_date到end_date的历史数据，并保存到日线长表daily_bar。
+    代码列表按baostock_chunk_size分片交给进程池，哪个分片先完成就先收回主进程，每累计batch_size只股票写一次库。
+    主键(date, code)冲突时直接覆盖，不再需要先删除区间内的老数据。
+    :param baostock_codes: baostock格式的代码列表，如sh.600000
+    :param on_saved: 每批写库成功后的回调 on_saved(frames, queried)，queried为本批查询成功的代码（含无数据的）
+    :return: 查询成功的股票数
+    """
+    if not baostock_codes:
+        return 0
+    chunks = [baostock_codes[i:i + baostock_chunk_size] for i in range(0, len(baostock_codes), baostock_chunk_size)]
+    workers = min(workers or baostock_workers, len(chunks))
+    print(f"共{len(baostock_codes)}只股票，{workers}个进程抓取{start_date_str}到{end_date_str}的历史数据")
+
+    start = time.perf_counter()
+    done = succeeded = 0
+    pending, pending_queried = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_login) as executor:
+        futures = [executor.submit(_fetch_hist_chunk, chunk, start_date_str, end_date_str) for chunk in chunks]
+        for future in as_completed(futures):
+            try:
+                frames, queried, count = future.result()
+            except Exception as e:
+                logging.error(f"stock_hist_baostock.fetch_hist_k_data_and_save处理异常：{e}")
+                continue
+            pending.extend(frames)
+            pending_queried.extend(queried)
+            done += count
+            succeeded += len(queried)
+            if len(pending_queried) >= batch_size:
+                _save_hist_batch(pending, pending_queried, on_saved)
+                pending, pending_queried = [], []
+            elapsed = time.perf_counter() - start
+            print(f"已抓取{done}/{len(baostock_codes)}只股票，{round(done / elapsed, 1)}只/秒")
+    if pending_queried:
+        _save_hist_batch(pending, pending_queried, on_saved)
+    elapsed = time.perf_counter() - start
+    print(f"历史数据抓取完成：{done}只股票，失败{done - succeeded}只，耗时{round(elapsed, 1)}秒，"
+          f"{round(done / elapsed, 1) if elapsed else done}只/秒")
+    return succeeded
+
+
+# 获取所有股票从start_date到end_date的历史数据，并保存到日线长表daily_bar
+def get_all_hist_k_data_and_save(start_date_str, end_date_str, batch_size=200, workers=None):
     try:
         table_name = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
         sql = f"SELECT name, code, baostock_mapped_code FROM `{table_name}`"
-        rows = mdb.executeSqlFetch(sql)
-        if rows:
-            print(f"{table_name}表内容：")
-            for row in rows:
-                name, code, baostock_mapped_code = row
-                print(row)
-                # 获取30日历史数据
-                hist_df = get_a_hist_k_data(baostock_mapped_code, start_date_str, end_date_str)
-                if hist_df is not None and not hist_df.empty:
-                    # 去重，确保date和code都相同只保留一行
-                    hist_df = hist_df.drop_duplicates(subset=['date', 'code'], keep='last').reset_index(drop=True)
-                    hist_table_name = code  # 直接用原始code作为表名
-                    # 删除老数据（区间内）
-                    if mdb.checkTableIsExist(hist_table_name):
-                        del_sql = f"DELETE FROM `{hist_table_name}` WHERE `date` > '{start_date_str}' AND `date` <= '{end_date_str}'"
-                        mdb.executeSql(del_sql)
-                        cols_type = None
-                    else:
-                        cols_type = None  # 字段类型自动推断
-                    # 插入新数据，唯一键date,code
-                    try:
-                        mdb.insert_db_from_df(hist_df, hist_table_name, cols_type, False, "`date`,`code`")
-                        print(f"历史数据已保存到表 {hist_table_name}")
-                    except Exception as e:
-                        logging.error(f"保存历史数据到表 {hist_table_name} 失败: {e}")
-        else:
+        rows = hist_db.executeSqlFetch(sql)
+        if not rows:
             print(f"{table_name}表无数据。")
+            return
+        fetch_hist_k_data_and_save([row[2] for row in rows], start_date_str, end_date_str, batch_size, workers)
     except Exception as e:
         logging.error(f"read_baostock_code_map_table处理异常：{e}")
 
 
+def _save_hist_batch(frames, queried, on_saved=None):
+    try:
+        count = save_daily_bar(pd.concat(frames, ignore_index=True)) if frames else 0
+        print(f"历史数据已保存到表 {DAILY_BAR_TABLE}，{len(frames)}只股票共{count}行")
+        if frames and count == 0:
+            # bulk_insert_db_from_df失败时返回0，不能推进同步水位
+            return
+        if on_saved is not None:
+            on_saved(frames, queried)
+    except Exception as e:
+        logging.error(f"保存历史数据到表 {DAILY_BAR_TABLE} 失败: {e}")
+
+
+# 东财代码转换为baostock代码
+def to_baostock_code(code):
+    code = str(code).zfill(6)
+    if code.startswith(('6', '9')):
+        return 'sh.' + code
+    elif code.startswith(('0', '3', '2')):
+        return 'sz.' + code
+    else:
+        return code  # 若无法识别则原样返回
+
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+Desc: 问财（pywencai）查询的统一入口
+查询结果按 (query, sort_key, sort_order, loop, date) 缓存到 data/cache/wencai/<date>/，每条一个pickle文件：
+date早于今天的结果不会再变化，永不过期；当天的结果只缓存today_ttl秒。
+以下结果即使date早于今天也只缓存today_ttl秒：空结果（多半是问财临时失败，不写入磁盘），
+以及带“最新价”“最新涨跌幅”等LIVE_COLUMN_PREFIX开头列的结果（这些列是查询时刻的行情，不随date固定）。
+同时在途的相同查询只请求一次；对问财的请求最多wencai_max_concurrency个并发，相邻两次请求至少间隔wencai_min_interval秒。
+get_many一次提交多条查询，命中缓存的直接返回，未命中的并行请求。
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import pandas as pd
+import pywencai
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'cache',
+                         'wencai')
+today_ttl = 300
+LIVE_COLUMN_PREFIX = '最新'
+wencai_max_concurrency = 2
+wencai_min_interval = 1.0
+# 进程内保留的最近使用的结果条数，避免重复读盘
+MEMORY_ENTRIES = 256
+
+_semaphore = threading.BoundedSemaphore(wencai_max_concurrency)
+_spacing_lock = threading.Lock()
+_last_request = 0.0
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'errors': 0, 'coalesced': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _to_date(date):
+    if date is None:
+        return datetime.date.today()
+    return pd.Timestamp(date).date()
+
+
+def _cache_key(query, sort_key, sort_order, loop, date):
+    raw = json.dumps([query, sort_key, sort_order, loop, str(date)], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _cache_path(key, date):
+    return os.path.join(CACHE_DIR, str(date), f'{key}.pkl')
+
+
+def _is_immutable(data):
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        return False
+    return not any(str(col).startswith(LIVE_COLUMN_PREFIX) for col in data.columns)
+
+
+def _is_fresh(entry, date):
+    fetched_at = entry['fetched_at']
+    if date < datetime.date.today() and fetched_at.date() > date and _is_immutable(entry['data']):
+        # 收盘之后抓到的历史日期结果
+        return True
+    return (datetime.datetime.now() - fetched_at).total_seconds() < today_ttl
+
+
+def _remember(key, entry):
+    with _memory_lock:
+        _memory[key] = entry
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _lookup(key, date):
+    with _memory_lock:
+        entry = _memory.get(key)
+    if entry is None:
+        try:
+            with open(_cache_path(key, date), 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"wencai_gateway._lookup处理异常：{key}{e}")
+            return None
+        _remember(key, entry)
+    if not _is_fresh(entry, date):
+        return None
+    return entry['data']
+
+
+def _store(key, date, entry):
+    _remember(key, entry)
+    path = _cache_path(key, date)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.error(f"wencai_gateway._store处理异常：{path}{e}")
+
+
+def _wait_spacing():
+    global _last_request
+    with _spacing_lock:
+        wait = _last_request + wencai_min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request = time.monotonic()
+
+
+def _fetch(query, sort_key, sort_order, loop, kwargs):
+    with _semaphore:
+        _wait_spacing()
+        params = {'query': query, 'loop': loop, **kwargs}
+        if sort_key is not None:
+            params['sort_key'] = sort_key
+        if sort_order is not None:
+            params['sort_order'] = sort_order
+        return pywencai.get(**params)
+
+
+def _copy(data):
+    return data.copy() if isinstance(data, pd.DataFrame) else data
+
+
+def get(query, date=None, sort_key=None, sort_order=None, loop=False, **kwargs):
+    """
+    带缓存的pywencai.get。
+    :param query: 问句
+    :param date: 问句对应的交易日，决定缓存有效期；None表示今天
+    :return: DataFrame（调用方可以随意修改，不影响缓存）；查询失败时返回None
+    """
+    date = _to_date(date)
+    key = _cache_key(query, sort_key, sort_order, loop, date)
+    data = _lookup(key, date)
+    if data is not None:
+        _count('hits')
+        return _copy(data)
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _inflight[key] = future
+    if not owner:
+        _count('coalesced')
+        return _copy(future.result())
+
+    _count('misses')
+    data = None
+    try:
+        data = _fetch(query, sort_key, sort_order, loop, kwargs)
+        if isinstance(data, pd.DataFrame):
+            data = data.reset_index(drop=True)
+            entry = {'fetched_at': datetime.datetime.now(), 'data': data}
+            if data.empty:
+                # 空结果只在内存中保留today_ttl秒，合并短时间内的重复查询
+                _remember(key, entry)
+            else:
+                _store(key, date, entry)
+    except Exception as e:
+        _count('errors')
+        logging.error(f"wencai_gateway.get处理异常：{query}{e}")
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        future.set_result(data)
+    return _copy(data)
+
+
+def get_many(queries, max_workers=None):
+    """
+    批量查询，命中缓存的直接返回，未命中的并行请求（仍受并发数和请求间隔限制）。
+    :param queries: 每项为get的参数字典，如 {'query': '20250101涨停，非ST', 'date': '20250101'}
+    :return: 与queries顺序一致的结果列表
+    """
+    results = [None] * len(queries)
+    missing = []
+    for i, params in enumerate(queries):
+        date = _to_date(params.get('date'))
+        key = _cache_key(params['query'], params.get('sort_key'), params.get('sort_order'), params.get('loop', False),
+                         date)
+        data = _lookup(key, date)
+        if data is None:
+            missing.append(i)
+        else:
+            _count('hits')
+            results[i] = _copy(data)
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers or wencai_max_concurrency) as executor:
+            for i, data in zip(missing, executor.map(lambda i: get(**queries[i]), missing)):
+                results[i] = data
+    return results
+
+
+def wencai_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+if __name__ == "__main__":
+    today = datetime.date.today()
+    dates = [today - datetime.timedelta(days=i) for i in range(5)]
+    frames = get_many([{'query': f"{d:%Y%m%d}涨停，非ST", 'date': d, 'sort_key': '成交金额', 'sort_order': 'desc'}
+                       for d in dates])
+    print([None if df is None else len(df) for df in frames], wencai_stats())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import logging
+import datetime
+import pandas as pd
+import core.tablestructure as tbs
+import core.database as mdb
+
+# 日线长表所在的数据库与表名
+DAILY_BAR_DB = "stock_hist"
+DAILY_BAR_TABLE = tbs.TABLE_CN_DAILY_BAR['name']
+DAILY_BAR_COLUMNS = list(tbs.TABLE_CN_DAILY_BAR['columns'])
+# 按年分区的起始年份，更早的数据全部落在第一个分区
+PARTITION_START_YEAR = 1990
+
+_FULL_TABLE_NAME = f"`{DAILY_BAR_DB}`.`{DAILY_BAR_TABLE}`"
+_table_ready = False
+_partition_year = None
+
+
+def _partition_clause(start_year, end_year):
+    parts = [f"PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')"
+             for year in range(start_year, end_year + 1)]
+    parts.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ",\n        ".join(parts)
+
+
+# 创建日线长表：主键(date, code)为聚簇索引，另建(code, date)二级索引供单只股票查询；按年RANGE分区。
+def create_daily_bar_table():
+    global _table_ready
+    end_year = datetime.date.today().year + 1
+    sql = f'''
+    CREATE TABLE IF NOT EXISTS {_FULL_TABLE_NAME} (
+        `code` VARCHAR(6) NOT NULL,
+        `date` DATE NOT NULL,
+        `open` FLOAT,
+        `high` FLOAT,
+        `low` FLOAT,
+        `close` FLOAT,
+        `volume` BIGINT,
+        `amount` DOUBLE,
+        `adjustflag` SMALLINT,
+        PRIMARY KEY (`date`, `code`),
+        KEY `IX_code_date` (`code`, `date`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    PARTITION BY RANGE COLUMNS(`date`) (
+        PARTITION p_old VALUES LESS THAN ('{PARTITION_START_YEAR}-01-01'),
+        {_partition_clause(PARTITION_START_YEAR, end_year)}
+    );
+    '''
+    mdb.executeSql(f"CREATE DATABASE IF NOT EXISTS `{DAILY_BAR_DB}` DEFAULT CHARSET utf8mb4")
+    mdb.executeSql(sql, to_db=DAILY_BAR_DB)
+    if mdb.backend_of(DAILY_BAR_DB) != mdb.BACKEND_MYSQL:
+        # 嵌入式库没有内联KEY和分区，单独建(code, date)索引
+        mdb.executeSql(f"CREATE INDEX IF NOT EXISTS `IX_code_date` ON `{DAILY_BAR_TABLE}` (`code`, `date`)",
+                       to_db=DAILY_BAR_DB)
+    # executeSql只记录错误不抛出，确认表已存在才标记完成，建表失败时下次写入再重试
+    _table_ready = mdb.table_exists(DAILY_BAR_TABLE, to_db=DAILY_BAR_DB)
+    if not _table_ready:
+        logging.error(f"daily_bar.create_daily_bar_table处理异常：{_FULL_TABLE_NAME}表创建失败")
+        return
+    # 表早已存在时CREATE TABLE IF NOT EXISTS不会补分区，这里补齐到明年
+    ensure_year_partitions()
+
+
+# 跨年后把pmax拆出新一年的分区，避免新数据全部堆在pmax中。
+def add_year_partition(year):
+    if mdb.backend_of(DAILY_BAR_DB) != mdb.BACKEND_MYSQL:
+        return
+    sql = f'''
+    ALTER TABLE {_FULL_TABLE_NAME} REORGANIZE PARTITION pmax INTO (
+        PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01'),
+        PARTITION pmax VALUES LESS THAN (MAXVALUE)
+    )
+    '''
+    mdb.executeSql(sql, to_db=DAILY_BAR_DB)
+
+
+# 补齐最后一个按年分区之后、直到明年的分区。进程启动建表时和跨年后第一次写入时各执行一次。
+def ensure_year_partitions():
+    global _partition_year
+    if mdb.backend_of(DAILY_BAR_DB) != mdb.BACKEND_MYSQL:
+        return
+    this_year = datetime.date.today().year
+    rows = mdb.executeSqlFetch("SELECT partition_name FROM information_schema.partitions "
+                               "WHERE table_schema = %s AND table_name = %s",
+                               [DAILY_BAR_DB, DAILY_BAR_TABLE], to_db=DAILY_BAR_DB)
+    years = [int(name[1:]) for (name,) in rows or () if name and re.fullmatch(r'p\d{4}', name)]
+    if not years:
+        # 查询失败或表没有按年分区
+        return
+    for year in range(max(years) + 1, this_year + 2):
+        add_year_partition(year)
+    _partition_year = this_year
+
+
+def _ensure_table():
+    if not _table_ready:
+        create_daily_bar_table()
+    elif _partition_year is not None and _partition_year != datetime.date.today().year:
+        ensure_year_partitions()
+
+
+# baostock返回的数据全部是字符串，code形如sh.600000，这里统一转换为日线长表的格式。
+def normalize_baostock_frame(data):
+    if data is None or data.empty:
+        return pd.DataFrame(columns=DAILY_BAR_COLUMNS)
+    df = data.copy()
+    df['code'] = df['code'].astype(str).str.split('.').str[-1].str.zfill(6)
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
+    for col in ('open', 'high', 'low', 'close', 'amount'):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce').round().astype('Int64')
+    if 'adjustflag' in df.columns:
+        df['adjustflag'] = pd.to_numeric(df['adjustflag'], errors='coerce').astype('Int64')
+    else:
+        df['adjustflag'] = pd.NA
+    df = df.dropna(subset=['date'])
+    df = df.drop_duplicates(subset=['date', 'code'], keep='last')
+    return df[DAILY_BAR_COLUMNS]
+
+
+# 写入日线长表，主键冲突时覆盖旧值，因此重跑同一区间不需要先删除。
+def save_daily_bar(data):
+    df = normalize_baostock_frame(data)
+    if df.empty:
+        return 0
+    _ensure_table()
+    return mdb.bulk_insert_db_from_df(df, DAILY_BAR_TABLE, mdb.BULK_UPSERT, to_db=DAILY_BAR_DB)
+
+
+def read_daily_bar(start_date, end_date, columns=None, codes=None, left_open=False):
+    """
+    一次索引范围扫描读取全市场(或指定股票)在日期区间内的日线数据。
+    :param start_date: 开始日期（date或'YYYY-MM-DD'）
+    :param end_date: 结束日期，包含
+    :param columns: 需要的列，默认全部；code和date总会返回
+    :param codes: 股票代码列表，None表示全市场
+    :param left_open: 为True时区间为(start_date, end_date]，与get_recent_trade_range的用法一致
+    :return: 按code、date升序排列的DataFrame
+    """
+    if columns is None:
+        columns = DAILY_BAR_COLUMNS
+    columns = ['code', 'date'] + [c for c in columns if c not in ('code', 'date')]
+    cols = ', '.join(f'`{c}`' for c in columns)
+    op = '>' if left_open else '>='
+    sql = f"SELECT {cols} FROM {_FULL_TABLE_NAME} WHERE `date` {op} %s AND `date` <= %s"
+    params = [str(start_date), str(end_date)]
+    if codes is not None:
+        codes = [str(c).zfill(6) for c in codes]
+        if not codes:
+            return pd.DataFrame(columns=columns)
+        sql += f" AND `code` IN ({', '.join(['%s'] * len(codes))})"
+        params.extend(codes)
+    rows = mdb.executeSqlFetch(sql, params, to_db=DAILY_BAR_DB)
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame(list(rows), columns=columns)
+    return df.sort_values(['code', 'date']).reset_index(drop=True)
+
+
+# 把stock_hist库中旧的按股票代码分表的数据迁移到日线长表。
+# 每张表只执行一条服务器端的INSERT ... SELECT，数据不经过客户端。
+def migrate_per_code_tables(drop_old=False):
+    _ensure_table()
+    code_tables = [t for t in mdb.list_tables(DAILY_BAR_DB) if re.fullmatch(r'\d{6}', t)]
+    if not code_tables:
+        print(f"{DAILY_BAR_DB}库中没有需要迁移的表")
+        return 0
+    updates = ', '.join(f'`{c}` = VALUES(`{c}`)' for c in DAILY_BAR_COLUMNS if c not in ('date', 'code'))
+    migrated = 0
+    for i, table_name in enumerate(code_tables, 1):
+        # 旧表由to_sql自动建表，字段基本都是TEXT，空字符串需转为NULL
+        sql = f'''
+        INSERT INTO {_FULL_TABLE_NAME} (`code`, `date`, `open`, `high`, `low`, `close`, `volume`, `amount`, `adjustflag`)
+        SELECT '{table_name}', `date`, NULLIF(`open`, ''), NULLIF(`high`, ''), NULLIF(`low`, ''), NULLIF(`close`, ''),
+               NULLIF(`volume`, ''), NULLIF(`amount`, ''), NULLIF(`adjustflag`, '')
+        FROM `{DAILY_BAR_DB}`.`{table_name}`
+        WHERE `date` IS NOT NULL AND `date` <> ''
+        ON DUPLICATE KEY UPDATE {updates}
+        '''
+        try:
+            with mdb.get_connection() as conn:
+                with conn.cursor() as db:
+                    db.execute(sql)
+                    if drop_old:
+                        db.execute(f"DROP TABLE `{DAILY_BAR_DB}`.`{table_name}`")
+            if drop_old:
+                mdb.invalidate_metadata(DAILY_BAR_DB, table_name)
+            migrated += 1
+        except Exception as e:
+            logging.error(f"daily_bar.migrate_per_code_tables处理异常：{table_name}表{e}")
+        if i % 500 == 0:
+            print(f"已迁移 {i}/{len(code_tables)} 张表")
+    print(f"迁移完成，共 {migrated}/{len(code_tables)} 张表")
+    return migrated
+
+
+if __name__ == "__main__":
+    migrate_per_code_tables(drop_old=False)
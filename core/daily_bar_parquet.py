@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from core.daily_bar import read_daily_bar
+
+# 日线行情的本地Parquet镜像，按 year=YYYY/month=MM 分区，每个月一个文件。
+# 数据只追加、按日增长，分析类任务直接读本地文件，不再经过MySQL。
+PARQUET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'parquet', 'daily_bar')
+
+SCHEMA = pa.schema([
+    ('code', pa.string()),
+    ('date', pa.date32()),
+    ('open', pa.float32()),
+    ('high', pa.float32()),
+    ('low', pa.float32()),
+    ('close', pa.float32()),
+    ('volume', pa.int64()),
+    ('amount', pa.float64()),
+    ('adjustflag', pa.int16()),
+])
+PARTITION_SCHEMA = pa.schema([('year', pa.int16()), ('month', pa.int8())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+# 读取时显式给出数据集的schema，目录中还没有文件时也能按列名过滤，返回空表
+DATASET_SCHEMA = pa.unify_schemas([SCHEMA, PARTITION_SCHEMA])
+
+
+def _month_file(year, month):
+    return os.path.join(PARQUET_DIR, f'year={year}', f'month={month}', 'part-0.parquet')
+
+
+def _to_table(df):
+    df = df[[f.name for f in SCHEMA]].copy()
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    for col in ('open', 'high', 'low', 'close'):
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype('float64')
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce').astype('Int64')
+    df['adjustflag'] = pd.to_numeric(df['adjustflag'], errors='coerce').astype('Int16')
+    df = df.sort_values(['date', 'code']).reset_index(drop=True)
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+# 合并写入一个月的分区：与已有文件按(code, date)去重，新数据覆盖旧数据，写临时文件后原子替换。
+def _write_month(year, month, df):
+    path = _month_file(year, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        old = pq.read_table(path, schema=SCHEMA).to_pandas()
+        df = pd.concat([old, df], ignore_index=True)
+        df['date'] = pd.to_datetime(df['date']).dt.date
+        df = df.drop_duplicates(subset=['code', 'date'], keep='last')
+    # 以.开头的临时文件会被pyarrow.dataset忽略，读方不会读到写了一半的文件
+    tmp_path = os.path.join(os.path.dirname(path), '.part-0.parquet.tmp')
+    pq.write_table(_to_table(df), tmp_path, compression='zstd', row_group_size=128 * 1024)
+    os.replace(tmp_path, path)
+    return len(df)
+
+
+def sync_daily_bar_parquet(start_date, end_date):
+    """
+    把MySQL日线长表中[start_date, end_date]的数据增量同步到Parquet镜像，只重写涉及到的月份分区。
+    :return: 同步的行数
+    """
+    bars = read_daily_bar(start_date, end_date)
+    if bars.empty:
+        print(f"{start_date}到{end_date}无日线数据需要同步到Parquet")
+        return 0
+    dates = pd.to_datetime(bars['date'])
+    count = 0
+    for (year, month), df in bars.groupby([dates.dt.year, dates.dt.month]):
+        try:
+            _write_month(int(year), int(month), df)
+            count += len(df)
+        except Exception as e:
+            logging.error(f"daily_bar_parquet.sync_daily_bar_parquet处理异常：{year}-{month}{e}")
+    print(f"已同步{count}行日线数据到Parquet镜像 {PARQUET_DIR}")
+    return count
+
+
+# 按月从MySQL全量重建镜像，每次只在内存中保留一个月的数据。
+def rebuild_daily_bar_parquet(start_date, end_date=None):
+    start = pd.Timestamp(start_date).replace(day=1)
+    end = pd.Timestamp(end_date or datetime.date.today())
+    count = 0
+    while start <= end:
+        month_end = start + pd.offsets.MonthEnd(0)
+        count += sync_daily_bar_parquet(start.date(), min(month_end, end).date())
+        start = month_end + pd.Timedelta(days=1)
+    return count
+
+
+def read_bars(codes=None, start_date=None, end_date=None, columns=None):
+    """
+    从Parquet镜像读取日线数据，按分区裁剪月份、按谓词下推过滤日期和代码，只读需要的列。
+    :param codes: 股票代码列表，None表示全市场
+    :param start_date: 开始日期，包含
+    :param end_date: 结束日期，包含
+    :param columns: 需要的列，默认全部；code和date总会返回
+    :return: 按code、date升序排列的DataFrame
+    """
+    if columns is None:
+        columns = SCHEMA.names
+    columns = ['code', 'date'] + [c for c in columns if c not in ('code', 'date')]
+    if not os.path.isdir(PARQUET_DIR):
+        return pd.DataFrame(columns=columns)
+    dataset = ds.dataset(PARQUET_DIR, format='parquet', partitioning=PARTITIONING, schema=DATASET_SCHEMA)
+    expr = None
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        expr = _and(expr, (ds.field('year') > start.year) |
+                    ((ds.field('year') == start.year) & (ds.field('month') >= start.month)))
+        expr = _and(expr, ds.field('date') >= pa.scalar(start.date(), pa.date32()))
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        expr = _and(expr, (ds.field('year') < end.year) |
+                    ((ds.field('year') == end.year) & (ds.field('month') <= end.month)))
+        expr = _and(expr, ds.field('date') <= pa.scalar(end.date(), pa.date32()))
+    if codes is not None:
+        expr = _and(expr, ds.field('code').isin([str(c).zfill(6) for c in codes]))
+    df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+    return df.sort_values(['code', 'date']).reset_index(drop=True)
+
+
+def _and(expr, other):
+    return other if expr is None else expr & other
+
+
+if __name__ == "__main__":
+    rebuild_daily_bar_parquet('2024-01-01')
+    print(read_bars(codes=['600036'], start_date='2025-01-01', columns=['close']))
@@ -3,10 +3,19 @@
 
 import logging
 import os
-import pymysql
-from sqlalchemy import create_engine
-from sqlalchemy.types import NVARCHAR
-from sqlalchemy import inspect
+import re
+import time
+import sqlite3
+import datetime
+import tempfile
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import create_engine, event, MetaData, Table, Column, Index
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.types import NVARCHAR, VARCHAR
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.dialects import postgresql, sqlite
 
 db_host = "localhost"  # 数据库服务主机
 db_user = "root"  # 数据库访问用户
@@ -27,25 +36,658 @@ MYSQL_CONN_TORNDB = {'host': f'{db_host}:{str(db_port)}', 'user': db_user, 'pass
                      'database': db_database, 'charset': db_charset, 'max_idle_time': 3600, 'connect_timeout': 1000}
 
 
+# 连接池配置：每个目标数据库一个engine，常驻pool_size个连接，峰值时最多再临时创建max_overflow个。
+# rtime_trading_job 中每个定时任务各占一个线程，常驻连接数不小于并发任务数即可。
+db_pool_size = 5
+db_max_overflow = 10
+db_pool_timeout = 30  # 连接池耗尽时等待空闲连接的秒数
+db_pool_recycle = 3600  # 连接最长使用秒数，避免被MySQL的wait_timeout断开
+
+# 存储后端：默认全部使用MySQL，也可以按数据库切换到进程内的嵌入式数据库，不需要启动MySQL服务。
+#   BACKEND_DUCKDB  DuckDB列式文件，适合日线这类宽表扫描、窗口max/min、按日期分组等分析查询
+#   BACKEND_SQLITE  SQLite文件，适合代码映射、实时统计等小表
+# 嵌入式数据库每个库一个文件，放在db_embedded_dir下；例如单机压测时：
+#   DB_BACKEND=sqlite，并设置 db_backend_by_database = {'stock_hist': BACKEND_DUCKDB}
+# DuckDB文件同一时间只能被一个进程以读写方式打开。
+BACKEND_MYSQL = 'mysql'
+BACKEND_DUCKDB = 'duckdb'
+BACKEND_SQLITE = 'sqlite'
+db_backend = os.environ.get('DB_BACKEND', BACKEND_MYSQL)
+db_backend_by_database = {}
+db_embedded_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'db')
+
+_engines = {}
+_pool_counters = {}
+_engines_lock = threading.Lock()
+_counters_lock = threading.Lock()
+
+
+def backend_of(to_db=None):
+    return db_backend_by_database.get(to_db or MYSQL_CONN_DBAPI['database'], db_backend)
+
+
+def set_backend(backend, to_db=None):
+    """
+    切换存储后端。
+    :param backend: BACKEND_MYSQL / BACKEND_DUCKDB / BACKEND_SQLITE
+    :param to_db: 数据库名；为None时修改默认后端
+    """
+    global db_backend
+    if backend not in (BACKEND_MYSQL, BACKEND_DUCKDB, BACKEND_SQLITE):
+        raise ValueError(f"不支持的存储后端：{backend}")
+    if to_db is None:
+        db_backend = backend
+    else:
+        db_backend_by_database[to_db] = backend
+    _created_tables.clear()
+    with _metadata_lock:
+        _metadata.clear()
+        _metadata_loaded.clear()
+        _stale_tables.clear()
+        _missing_tables.clear()
+
+
+def _embedded_path(backend, db_name):
+    os.makedirs(db_embedded_dir, exist_ok=True)
+    return os.path.join(db_embedded_dir, f'{db_name}.{backend}')
+
+
+def _conn_url(to_db=None):
+    backend = backend_of(to_db)
+    if backend != BACKEND_MYSQL:
+        return f"{backend}:///{_embedded_path(backend, to_db or MYSQL_CONN_DBAPI['database'])}"
+    if to_db is None:
+        return MYSQL_CONN_URL
+    return "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
+        db_user, db_password, db_host, db_port, to_db, db_charset)
+
+
+# 按连接串缓存engine，进程内所有线程共享同一个连接池。
+def _get_engine(url):
+    _engine = _engines.get(url)
+    if _engine is not None:
+        return _engine
+    with _engines_lock:
+        _engine = _engines.get(url)
+        if _engine is None and not url.startswith('mysql'):
+            # 嵌入式后端只给pandas.to_sql等需要SQLAlchemy engine的地方使用，duckdb需要安装duckdb_engine
+            _engine = create_engine(url)
+            _engines[url] = _engine
+        elif _engine is None:
+            _engine = create_engine(url, poolclass=QueuePool, pool_size=db_pool_size,
+                                    max_overflow=db_max_overflow, pool_timeout=db_pool_timeout,
+                                    pool_recycle=db_pool_recycle, pool_pre_ping=True,
+                                    connect_args={'local_infile': True})
+            counters = {'connects': 0, 'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0}
+
+            def _on_connect(dbapi_conn, conn_record):
+                with _counters_lock:
+                    counters['connects'] += 1
+
+            event.listen(_engine, 'connect', _on_connect)
+            _pool_counters[url] = counters
+            _engines[url] = _engine
+    return _engine
+
+
 # 通过数据库链接 engine
 def engine():
-    return create_engine(MYSQL_CONN_URL)
+    return _get_engine(_conn_url())
 
 
 def engine_to_db(to_db):
-    _engine = create_engine(MYSQL_CONN_URL.replace(f'/{db_database}?', f'/{to_db}?'))
-    return _engine
+    return _get_engine(_conn_url(to_db))
 
 
 # DB Api -数据库连接对象connection
-def get_connection():
+# 从连接池借出连接，with块正常结束时提交、异常时回滚，最后归还连接池。
+@contextmanager
+def get_connection(to_db=None):
+    db_name = to_db or MYSQL_CONN_DBAPI['database']
+    if backend_of(db_name) == BACKEND_MYSQL:
+        conn = _checkout(_conn_url(db_name))
+    else:
+        conn = _EmbeddedConnection(backend_of(db_name), db_name)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _checkout(url):
+    _engine = _get_engine(url)
+    pool = _engine.pool
+    counters = _pool_counters[url]
+    # 借出前连接池已无空闲连接且不能再新建，说明本次需要排队等待
+    exhausted = pool.checkedin() == 0 and pool.overflow() >= db_max_overflow
+    start = time.perf_counter()
+    try:
+        conn = _engine.raw_connection()
+    except Exception as e:
+        logging.error(f"database.get_connection处理异常：{_engine.url}{e}")
+        raise
+    with _counters_lock:
+        counters['checkouts'] += 1
+        if exhausted:
+            counters['waits'] += 1
+            counters['wait_seconds'] += time.perf_counter() - start
+    return conn
+
+
+# 嵌入式后端执行的语句由MySQL方言转换：去掉本库的库名限定、建表语句末尾的ENGINE/分区子句和内联KEY，
+# REPLACE INTO 改为 INSERT OR REPLACE INTO，反引号改为双引号，%s占位符改为?。CREATE DATABASE直接忽略。
+_CREATE_DATABASE_RE = re.compile(r'^\s*CREATE\s+(?:DATABASE|SCHEMA)\b', re.I)
+_MYSQL_TABLE_OPTIONS_RE = re.compile(r'\)\s*(?:ENGINE\s*=|DEFAULT\s+CHARSET|PARTITION\s+BY).*$', re.I | re.S)
+_INLINE_KEY_RE = re.compile(r',\s*(?:UNIQUE\s+)?KEY\s+`?\w+`?\s*\([^)]*\)', re.I)
+_REPLACE_INTO_RE = re.compile(r'^\s*REPLACE\s+INTO\b', re.I)
+_DML_RE = re.compile(r'^\s*(?:INSERT|UPDATE|DELETE)\b', re.I)
+
+_duckdb_databases = {}
+_duckdb_lock = threading.Lock()
+
+
+# SQLite没有日期类型，DATE、DATETIME列按声明类型转换为datetime.date、datetime.datetime，与MySQL、DuckDB返回的类型一致；
+# 无法解析的值原样返回字符串
+def _convert_sqlite_date(value):
+    text = value.decode()
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+def _convert_sqlite_datetime(value):
+    text = value.decode()
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+sqlite3.register_converter('DATE', _convert_sqlite_date)
+sqlite3.register_converter('DATETIME', _convert_sqlite_datetime)
+
+
+def _embedded_sql(sql, db_name):
+    if _CREATE_DATABASE_RE.match(sql):
+        return None
+    sql = sql.replace(f'`{db_name}`.', '')
+    sql = _MYSQL_TABLE_OPTIONS_RE.sub(')', sql)
+    sql = _INLINE_KEY_RE.sub('', sql)
+    sql = _REPLACE_INTO_RE.sub('INSERT OR REPLACE INTO', sql)
+    return sql.replace('`', '"').replace('%s', '?').replace('%%', '%')
+
+
+class _EmbeddedCursor:
+    """
+    rowcount与pymysql的含义一致：INSERT/UPDATE/DELETE为影响的行数，SELECT为-1。
+    SQLite的UPDATE按匹配行数计（与带CLIENT.FOUND_ROWS的pymysql相同），INSERT OR REPLACE覆盖的行计1次（MySQL计2次）。
+    DuckDB的cursor.rowcount总是-1，execute时从语句返回的Count行读取；executemany只返回最后一条的Count，按参数行数计。
+    """
+
+    def __init__(self, cursor, db_name, backend):
+        self._cursor = cursor
+        self._db_name = db_name
+        self._backend = backend
+        self._executed = False
+        self._rowcount = None
+
+    def execute(self, sql, params=()):
+        sql = _embedded_sql(sql, self._db_name)
+        self._executed = sql is not None
+        self._rowcount = None if self._executed else 0
+        if self._executed:
+            self._cursor.execute(sql, list(params or ()))
+            if self._backend == BACKEND_DUCKDB and _DML_RE.match(sql):
+                row = self._cursor.fetchone()
+                self._rowcount = int(row[0]) if row else 0
+                self._executed = False
+        return self.rowcount
+
+    def executemany(self, sql, rows):
+        sql = _embedded_sql(sql, self._db_name)
+        self._executed = sql is not None
+        self._rowcount = None if self._executed and rows else 0
+        if self._rowcount is None:
+            self._cursor.executemany(sql, [list(r) for r in rows])
+            if self._backend == BACKEND_DUCKDB and _DML_RE.match(sql):
+                self._rowcount = len(rows)
+                self._executed = False
+        return self.rowcount
+
+    def fetchall(self):
+        return self._cursor.fetchall() if self._executed else []
+
+    def fetchone(self):
+        return self._cursor.fetchone() if self._executed else None
+
+    @property
+    def rowcount(self):
+        if self._rowcount is not None:
+            return self._rowcount
+        return getattr(self._cursor, 'rowcount', -1)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _EmbeddedConnection:
+    """
+    嵌入式数据库的连接，接口与pymysql连接一致（cursor/commit/rollback/close），整个连接在一个事务中。
+    SQLite每次借出新建连接；DuckDB每个库在进程内只打开一次，每次借出一个独立的cursor。
+    """
+
+    def __init__(self, backend, db_name):
+        self.backend = backend
+        self.db_name = db_name
+        path = _embedded_path(backend, db_name)
+        if backend == BACKEND_SQLITE:
+            self._conn = sqlite3.connect(path, timeout=db_pool_timeout, detect_types=sqlite3.PARSE_DECLTYPES)
+        else:
+            import duckdb
+            with _duckdb_lock:
+                database = _duckdb_databases.get(path)
+                if database is None:
+                    database = duckdb.connect(path)
+                    _duckdb_databases[path] = database
+            self._conn = database.cursor()
+            self._conn.begin()
+
+    def cursor(self):
+        cursor = self._conn if self.backend == BACKEND_DUCKDB else self._conn.cursor()
+        return _EmbeddedCursor(cursor, self.db_name, self.backend)
+
+    # DuckDB直接按列读取DataFrame写入，不逐行绑定参数
+    def insert_frame(self, table_name, data, cols):
+        self._conn.register('_insert_frame', data[cols])
+        try:
+            col_str = ', '.join(f'"{c}"' for c in cols)
+            self._conn.execute(f'INSERT OR REPLACE INTO "{table_name}" ({col_str}) SELECT {col_str} FROM _insert_frame')
+        finally:
+            self._conn.unregister('_insert_frame')
+
+    def commit(self):
+        self._conn.commit()
+        if self.backend == BACKEND_DUCKDB:
+            self._conn.begin()
+
+    def rollback(self):
+        self._conn.rollback()
+        if self.backend == BACKEND_DUCKDB:
+            self._conn.begin()
+
+    def close(self):
+        if self.backend == BACKEND_DUCKDB:
+            self._conn.rollback()
+        self._conn.close()
+
+
+def pool_status(to_db=None):
+    """
+    连接池统计，用于确定pool_size和max_overflow。
+    :param to_db: 数据库名，默认当前数据库
+    :return: dict，checked_out为当前借出的连接数，overflow为超出pool_size临时创建的连接数，
+             waits/wait_seconds为连接池耗尽时的排队次数和累计等待秒数，connects为实际建立的物理连接数
+    """
+    db_name = to_db or MYSQL_CONN_DBAPI['database']
+    if backend_of(db_name) != BACKEND_MYSQL:
+        return {'database': db_name, 'backend': backend_of(db_name)}
+    url = _conn_url(db_name)
+    _engine = _get_engine(url)
+    pool = _engine.pool
+    counters = _pool_counters[url]
+    return {
+        'database': _engine.url.database,
+        'pool_size': pool.size(),
+        'max_overflow': db_max_overflow,
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'connects': counters['connects'],
+        'checkouts': counters['checkouts'],
+        'waits': counters['waits'],
+        'wait_seconds': round(counters['wait_seconds'], 3),
+    }
+
+
+# 表结构元数据缓存：每个数据库第一次用到时从information_schema一次性加载全部表的字段、主键和索引，
+# 之后的表是否存在、主键查询都直接从内存返回。通过本模块执行的DDL会使对应的缓存失效。
+# 不经过本模块建的表（DataFrame.to_sql、其他进程）：缓存中没有的表最多每metadata_miss_ttl秒重新查一次，
+# 整库缓存超过metadata_ttl秒重新加载。
+# _metadata_lock只保护缓存字典，查询information_schema时不持有；同一个库的加载由该库自己的锁串行。
+metadata_ttl = 3600
+metadata_miss_ttl = 30
+
+_metadata = {}
+_metadata_loaded = {}
+_stale_tables = {}
+_missing_tables = {}
+_metadata_generation = {}
+_metadata_lock = threading.Lock()
+_load_locks = {}
+_metadata_counters = {'loads': 0, 'load_queries': 0, 'avoided_queries': 0, 'invalidations': 0}
+
+_DDL_RE = re.compile(r'^\s*(CREATE|ALTER|DROP|RENAME)\b', re.I)
+_DDL_DATABASE_RE = re.compile(r'^\s*(?:CREATE|ALTER|DROP)\s+(?:DATABASE|SCHEMA)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?'
+                              r'[`"]?(\w+)[`"]?', re.I)
+# 表名，可以带库名限定：`库`.`表`
+_DDL_NAME = r'[`"]?(\w+)[`"]?(?:\s*\.\s*[`"]?(\w+)[`"]?)?'
+_DDL_NAME_RE = re.compile(r'^\s*' + _DDL_NAME + r'\s*$')
+_DDL_TABLE_RE = re.compile(r'^\s*(CREATE|ALTER|DROP)\s+(?:TEMPORARY\s+|IGNORE\s+)?TABLE\s+'
+                           r'(?:IF\s+(?:NOT\s+)?EXISTS\s+)?' + _DDL_NAME, re.I)
+_DDL_TABLE_LIST_RE = re.compile(r'^\s*(?:DROP\s+(?:TEMPORARY\s+)?TABLES?\s+(?:IF\s+EXISTS\s+)?|RENAME\s+TABLES?\s+)'
+                                r'(.*?)(?:\s+(?:RESTRICT|CASCADE))?\s*;?\s*$', re.I | re.S)
+_DDL_ALTER_RENAME_RE = re.compile(r'\bRENAME\s+(?:TO\s+|AS\s+)?(?!(?:COLUMN|INDEX|KEY)\b)' + _DDL_NAME, re.I)
+_DDL_INDEX_RE = re.compile(r'^\s*(?:CREATE\s+(?:UNIQUE\s+|FULLTEXT\s+|SPATIAL\s+)?|DROP\s+)INDEX\b.*?\bON\s+' + _DDL_NAME,
+                           re.I | re.S)
+
+
+def _load_metadata(db_name, table_name=None):
+    backend = backend_of(db_name)
+    if backend != BACKEND_MYSQL:
+        tables = _load_embedded_metadata(backend, db_name, table_name)
+    else:
+        tables = _load_mysql_metadata(db_name, table_name)
+    with _counters_lock:
+        _metadata_counters['loads'] += 1
+        _metadata_counters['load_queries'] += 2
+    return tables
+
+
+def _load_mysql_metadata(db_name, table_name=None):
+    sql_columns = ("SELECT table_name, column_name, column_type FROM information_schema.columns "
+                   "WHERE table_schema = %s")
+    sql_indexes = ("SELECT table_name, index_name, column_name FROM information_schema.statistics "
+                   "WHERE table_schema = %s")
+    params = [db_name]
+    if table_name is not None:
+        sql_columns += " AND table_name = %s"
+        sql_indexes += " AND table_name = %s"
+        params.append(table_name)
+    tables = {}
+    # information_schema通过默认库的连接查询，默认库切到嵌入式后端时改用目标库的连接
+    with get_connection(None if backend_of() == BACKEND_MYSQL else db_name) as conn:
+        with conn.cursor() as db:
+            db.execute(sql_columns + " ORDER BY table_name, ordinal_position", params)
+            for t, c, c_type in db.fetchall():
+                tables.setdefault(t, {'columns': {}, 'primary_key': [], 'indexes': {}})['columns'][c] = c_type
+            db.execute(sql_indexes + " ORDER BY table_name, index_name, seq_in_index", params)
+            for t, index_name, c in db.fetchall():
+                if t not in tables:
+                    continue
+                if index_name == 'PRIMARY':
+                    tables[t]['primary_key'].append(c)
+                else:
+                    tables[t]['indexes'].setdefault(index_name, []).append(c)
+    return tables
+
+
+def _load_embedded_metadata(backend, db_name, table_name=None):
+    tables = {}
+    with get_connection(db_name) as conn:
+        with conn.cursor() as db:
+            if backend == BACKEND_SQLITE:
+                db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%%'")
+                names = [r[0] for r in db.fetchall() if table_name is None or r[0] == table_name]
+                for t in names:
+                    meta = tables.setdefault(t, {'columns': {}, 'primary_key': [], 'indexes': {}})
+                    db.execute(f'PRAGMA table_info(`{t}`)')
+                    columns = db.fetchall()
+                    meta['columns'] = {c[1]: c[2] for c in columns}
+                    meta['primary_key'] = [c[1] for c in sorted(columns, key=lambda c: c[5]) if c[5] > 0]
+                    db.execute(f'PRAGMA index_list(`{t}`)')
+                    for index in db.fetchall():
+                        if index[1].startswith('sqlite_autoindex_'):
+                            continue
+                        db.execute(f'PRAGMA index_info(`{index[1]}`)')
+                        cols = [c[2] for c in sorted(db.fetchall())]
+                        # insert_other_db_from_df在嵌入式库中用唯一索引pk_<表名>代替主键
+                        if index[1] == f'pk_{t}' and not meta['primary_key']:
+                            meta['primary_key'] = cols
+                        else:
+                            meta['indexes'][index[1]] = cols
+            else:
+                sql = ("SELECT table_name, column_name, data_type FROM information_schema.columns "
+                       "WHERE table_catalog = %s AND table_schema = 'main'")
+                params = [db_name]
+                if table_name is not None:
+                    sql += " AND table_name = %s"
+                    params.append(table_name)
+                db.execute(sql + " ORDER BY table_name, ordinal_position", params)
+                for t, c, c_type in db.fetchall():
+                    tables.setdefault(t, {'columns': {}, 'primary_key': [], 'indexes': {}})['columns'][c] = c_type
+                db.execute("SELECT table_name, constraint_column_names FROM duckdb_constraints() "
+                           "WHERE database_name = %s AND constraint_type = 'PRIMARY KEY'", [db_name])
+                for t, cols in db.fetchall():
+                    if t in tables:
+                        tables[t]['primary_key'] = list(cols)
+                db.execute("SELECT table_name, index_name, expressions FROM duckdb_indexes() "
+                           "WHERE database_name = %s", [db_name])
+                for t, index_name, expressions in db.fetchall():
+                    if t not in tables:
+                        continue
+                    if isinstance(expressions, str):
+                        expressions = expressions.strip('[]').split(',')
+                    cols = [str(e).strip().strip('"') for e in (expressions or [])]
+                    if index_name == f'pk_{t}' and not tables[t]['primary_key']:
+                        tables[t]['primary_key'] = cols
+                    else:
+                        tables[t]['indexes'][index_name] = cols
+    return tables
+
+
+def _load_lock(db_name):
+    with _metadata_lock:
+        lock = _load_locks.get(db_name)
+        if lock is None:
+            lock = threading.Lock()
+            _load_locks[db_name] = lock
+        return lock
+
+
+def _cached_tables(db_name):
+    tables = _metadata.get(db_name)
+    if tables is not None and time.monotonic() - _metadata_loaded[db_name] < metadata_ttl:
+        return tables
+    return None
+
+
+# 取整个库的缓存，没有或已过期时加载
+def _database_tables(db_name):
+    with _metadata_lock:
+        tables = _cached_tables(db_name)
+    if tables is not None:
+        return tables
+    with _load_lock(db_name):
+        with _metadata_lock:
+            tables = _cached_tables(db_name)
+            if tables is not None:
+                return tables
+            # 加载期间发生的DDL仍记为失效
+            _stale_tables.pop(db_name, None)
+            _missing_tables.pop(db_name, None)
+            generation = _metadata_generation.get(db_name, 0)
+        tables = _load_metadata(db_name)
+        with _metadata_lock:
+            if _metadata_generation.get(db_name, 0) == generation:
+                _metadata[db_name] = tables
+                _metadata_loaded[db_name] = time.monotonic()
+        return tables
+
+
+def _table_metadata(table_name, to_db=None):
+    db_name = to_db or MYSQL_CONN_DBAPI['database']
+    tables = _database_tables(db_name)
+    with _metadata_lock:
+        stale = table_name in _stale_tables.get(db_name, ())
+        if not stale and table_name not in tables:
+            checked = _missing_tables.get(db_name, {}).get(table_name, _metadata_loaded.get(db_name, 0))
+            stale = time.monotonic() - checked >= metadata_miss_ttl
+        if not stale:
+            with _counters_lock:
+                _metadata_counters['avoided_queries'] += 1
+            return tables.get(table_name)
+        _stale_tables.get(db_name, set()).discard(table_name)
+    # 只重新加载发生过DDL或缓存中没有的表
+    try:
+        with _load_lock(db_name):
+            meta = _load_metadata(db_name, table_name).get(table_name)
+    except Exception:
+        with _metadata_lock:
+            if db_name in _metadata:
+                _stale_tables.setdefault(db_name, set()).add(table_name)
+        raise
+    with _metadata_lock:
+        tables = _metadata.get(db_name, tables)
+        if meta is None:
+            tables.pop(table_name, None)
+            _missing_tables.setdefault(db_name, {})[table_name] = time.monotonic()
+        else:
+            tables[table_name] = meta
+            _missing_tables.get(db_name, {}).pop(table_name, None)
+    return meta
+
+
+def get_table_metadata(table_name, to_db=None):
+    """
+    从缓存取表结构。
+    :param table_name: 表名
+    :param to_db: 数据库名，默认当前数据库
+    :return: {'columns': {字段: 类型}, 'primary_key': [主键字段], 'indexes': {索引名: [字段]}}，表不存在时为None
+    """
     try:
-        return pymysql.connect(**MYSQL_CONN_DBAPI)
+        meta = _table_metadata(table_name, to_db)
     except Exception as e:
-        logging.error(f"database.conn_not_cursor处理异常：{MYSQL_CONN_DBAPI}{e}")
+        logging.error(f"database.get_table_metadata处理异常：{table_name}表{e}")
+        return None
+    if meta is None:
+        return None
+    return {'columns': dict(meta['columns']), 'primary_key': list(meta['primary_key']),
+            'indexes': {k: list(v) for k, v in meta['indexes'].items()}}
+
+
+def table_exists(table_name, to_db=None):
+    try:
+        return _table_metadata(table_name, to_db) is not None
+    except Exception as e:
+        logging.error(f"database.table_exists处理异常：{table_name}表{e}")
+        return False
+
+
+def get_primary_key(table_name, to_db=None):
+    try:
+        meta = _table_metadata(table_name, to_db)
+    except Exception as e:
+        logging.error(f"database.get_primary_key处理异常：{table_name}表{e}")
+        return []
+    return list(meta['primary_key']) if meta is not None else []
+
+
+def list_tables(to_db=None):
+    db_name = to_db or MYSQL_CONN_DBAPI['database']
+    try:
+        with _metadata_lock:
+            if _stale_tables.get(db_name):
+                _metadata.pop(db_name, None)
+            elif _cached_tables(db_name) is not None:
+                with _counters_lock:
+                    _metadata_counters['avoided_queries'] += 1
+        return sorted(_database_tables(db_name))
+    except Exception as e:
+        logging.error(f"database.list_tables处理异常：{db_name}库{e}")
+        return []
+
+
+def invalidate_metadata(to_db=None, table_name=None):
+    """
+    使元数据缓存失效，下次用到时重新加载。
+    :param to_db: 数据库名，默认当前数据库
+    :param table_name: 表名；为None时整个数据库的缓存失效
+    """
+    db_name = to_db or MYSQL_CONN_DBAPI['database']
+    with _metadata_lock:
+        if table_name is None:
+            _metadata.pop(db_name, None)
+            _metadata_loaded.pop(db_name, None)
+            _stale_tables.pop(db_name, None)
+            _missing_tables.pop(db_name, None)
+            _metadata_generation[db_name] = _metadata_generation.get(db_name, 0) + 1
+        elif db_name in _metadata:
+            _stale_tables.setdefault(db_name, set()).add(table_name)
+    with _counters_lock:
+        _metadata_counters['invalidations'] += 1
+
+
+def _ddl_tables(sql, db_name):
+    """
+    DDL语句涉及的表
+    :return: [(库名, 表名)]；无法识别的DDL为None
+    """
+    def qualified(groups):
+        first, second = groups
+        return (first, second) if second else (db_name, first)
+
+    match = _DDL_TABLE_LIST_RE.match(sql)
+    if match:
+        # DROP TABLE a, b 和 RENAME TABLE a TO b, c TO d
+        names = [_DDL_NAME_RE.match(part) for part in re.split(r',|\bTO\b', match.group(1), flags=re.I)]
+        if not all(names):
+            return None
+        return [qualified(name.groups()) for name in names]
+    match = _DDL_TABLE_RE.match(sql)
+    if match:
+        tables = [qualified(match.groups()[1:])]
+        if match.group(1).upper() == 'ALTER':
+            tables.extend(qualified(m.groups()) for m in _DDL_ALTER_RENAME_RE.finditer(sql, match.end()))
+        return tables
+    match = _DDL_INDEX_RE.match(sql)
+    if match:
+        return [qualified(match.groups())]
     return None
 
 
+# executeSql执行的是DDL时：CREATE/DROP DATABASE使该库的缓存整体失效；表和索引的DDL只使涉及的表失效
+# （表名可以带库名限定）；其他无法识别的DDL使执行语句的数据库的缓存整体失效。
+def _invalidate_for_ddl(sql, to_db=None):
+    if not isinstance(sql, str) or not _DDL_RE.match(sql):
+        return
+    db_name = to_db or MYSQL_CONN_DBAPI['database']
+    match = _DDL_DATABASE_RE.match(sql)
+    if match:
+        invalidate_metadata(match.group(1))
+        return
+    tables = _ddl_tables(sql, db_name)
+    if tables is None:
+        invalidate_metadata(db_name)
+        return
+    for table_db, table_name in tables:
+        invalidate_metadata(table_db, table_name)
+
+
+def metadata_status():
+    """
+    元数据缓存统计。
+    :return: dict，databases为已缓存的数据库，loads/load_queries为实际访问information_schema的次数和查询数，
+             avoided_queries为直接从缓存回答、省掉的元数据查询数，invalidations为失效次数
+    """
+    with _metadata_lock:
+        databases = sorted(_metadata)
+    with _counters_lock:
+        status = dict(_metadata_counters)
+    status['databases'] = databases
+    return status
+
+
 # 定义通用方法函数，插入数据库表，并创建数据库主键，保证重跑数据的时候索引唯一。
 def insert_db_from_df(data, table_name, cols_type, write_index, primary_keys, indexs=None):
     # 插入默认的数据库。
@@ -59,9 +701,10 @@ def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, pri
         engine_mysql = engine()
     else:
         engine_mysql = engine_to_db(to_db)
-    # 使用 http://docs.sqlalchemy.org/en/latest/core/reflection.html
-    # 使用检查检查数据库表是否有主键。
-    ipt = inspect(engine_mysql)
+    # 写入前从元数据缓存检查表是否已有主键，表不存在时to_sql会新建一张没有主键的表。
+    has_pk = bool(get_primary_key(table_name, to_db))
+    embedded = backend_of(to_db) != BACKEND_MYSQL
+    schema = None if embedded else to_db
     col_name_list = data.columns.tolist()
     # 如果有索引，把索引增加到varchar上面。
     if write_index:
@@ -69,99 +712,331 @@ def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, pri
         col_name_list.insert(0, data.index.name)
     try:
         if cols_type is None:
-            data.to_sql(name=table_name, con=engine_mysql, schema=to_db, if_exists='append',
+            data.to_sql(name=table_name, con=engine_mysql, schema=schema, if_exists='append',
                         index=write_index, )
         elif not cols_type:
-            data.to_sql(name=table_name, con=engine_mysql, schema=to_db, if_exists='append',
+            data.to_sql(name=table_name, con=engine_mysql, schema=schema, if_exists='append',
                         dtype={col_name: NVARCHAR(255) for col_name in col_name_list}, index=write_index, )
         else:
-            data.to_sql(name=table_name, con=engine_mysql, schema=to_db, if_exists='append',
+            data.to_sql(name=table_name, con=engine_mysql, schema=schema, if_exists='append',
                         dtype=cols_type, index=write_index, )
     except Exception as e:
         logging.error(f"database.insert_other_db_from_df处理异常：{table_name}表{e}")
 
     # 判断是否存在主键
-    if not ipt.get_pk_constraint(table_name)['constrained_columns']:
+    if not has_pk:
         try:
             # 执行数据库插入数据。
-            with get_connection() as conn:
+            with get_connection(to_db) as conn:
                 with conn.cursor() as db:
-                    db.execute(f'ALTER TABLE `{table_name}` ADD PRIMARY KEY ({primary_keys});')
-                    if indexs is not None:
-                        for k in indexs:
-                            db.execute(f'ALTER TABLE `{table_name}` ADD INDEX IN{k}({indexs[k]});')
+                    if embedded:
+                        # 嵌入式库不支持给已有表加主键，用唯一索引代替
+                        db.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS `pk_{table_name}` ON `{table_name}` ({primary_keys})')
+                        if indexs is not None:
+                            for k in indexs:
+                                db.execute(f'CREATE INDEX IF NOT EXISTS `IN{k}_{table_name}` ON `{table_name}` ({indexs[k]})')
+                    else:
+                        db.execute(f'ALTER TABLE `{table_name}` ADD PRIMARY KEY ({primary_keys});')
+                        if indexs is not None:
+                            for k in indexs:
+                                db.execute(f'ALTER TABLE `{table_name}` ADD INDEX IN{k}({indexs[k]});')
         except Exception as e:
             logging.error(f"database.insert_other_db_from_df处理异常：{table_name}表{e}")
+        invalidate_metadata(to_db, table_name)
+
+
+# 批量写入方式，按表选择：
+#   BULK_UPSERT    多行 INSERT ... ON DUPLICATE KEY UPDATE，按主键覆盖，适合按日追加/重跑的行情表
+#   BULK_LOAD_DATA LOAD DATA LOCAL INFILE，数据量很大时最快，需要MySQL开启local_infile
+#   BULK_SWAP      写入影子表后RENAME原子替换整张表，适合每次全量重建的快照表（如代码映射表）
+BULK_UPSERT = 'upsert'
+BULK_LOAD_DATA = 'load_data'
+BULK_SWAP = 'swap'
+bulk_batch_size = 5000
+
+_created_tables = set()
+# LOAD DATA LOCAL INFILE 只能从文件读取，优先放在内存文件系统上
+_LOAD_DATA_TMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def _split_keys(keys):
+    if keys is None:
+        return []
+    if isinstance(keys, str):
+        keys = keys.split(',')
+    return [k.strip().strip('`') for k in keys if k.strip()]
+
+
+# 根据 core.tablestructure 中的表结构定义建表，每个进程每张表只检查一次，已存在时不做修改。
+def create_table_from_structure(table, primary_keys, indexs=None, to_db=None):
+    key = (to_db or MYSQL_CONN_DBAPI['database'], table['name'])
+    if key in _created_tables:
+        return
+    pks = _split_keys(primary_keys)
+    backend = backend_of(key[0])
+    metadata = MetaData()
+    columns = [Column(name, _column_type(spec['type'], backend), primary_key=name in pks)
+               for name, spec in table['columns'].items()]
+    sa_table = Table(table['name'], metadata, *columns, mysql_engine='InnoDB',
+                     mysql_charset=db_charset)
+    indexes = []
+    if indexs is not None:
+        for k in indexs:
+            # 嵌入式库的索引名在整个库内唯一，加上表名
+            name = f'IN{k}' if backend == BACKEND_MYSQL else f"IN{k}_{table['name']}"
+            indexes.append(Index(name, *[sa_table.c[c] for c in _split_keys(indexs[k])]))
+    if table_exists(table['name'], key[0]):
+        _created_tables.add(key)
+        return
+    try:
+        if backend == BACKEND_MYSQL:
+            metadata.create_all(engine_to_db(key[0]), checkfirst=True)
+        else:
+            # DuckDB的建表语法与PostgreSQL一致，用SQLAlchemy编译DDL后直接执行，不依赖duckdb_engine
+            dialect = sqlite.dialect() if backend == BACKEND_SQLITE else postgresql.dialect()
+            with get_connection(key[0]) as conn:
+                with conn.cursor() as db:
+                    db.execute(str(CreateTable(sa_table, if_not_exists=True).compile(dialect=dialect)))
+                    for index in indexes:
+                        db.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+        _created_tables.add(key)
+        invalidate_metadata(key[0], table['name'])
+    except Exception as e:
+        logging.error(f"database.create_table_from_structure处理异常：{table['name']}表{e}")
+
+
+# 嵌入式库没有MySQL的字符集排序规则
+def _column_type(type_, backend):
+    if backend != BACKEND_MYSQL and getattr(type_, 'collation', None):
+        return VARCHAR(type_.length)
+    return type_
+
+
+# DataFrame转为可直接绑定参数的行，NaN/NaT转为None，时间转为字符串。
+def _df_rows(data, cols):
+    df = data[cols].copy()
+    for col in cols:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            values = df[col]
+            fmt = '%Y-%m-%d' if (values.dropna() == values.dropna().dt.normalize()).all() else '%Y-%m-%d %H:%M:%S'
+            df[col] = values.dt.strftime(fmt)
+    df = df.astype(object)
+    return df.where(df.notnull(), None).values.tolist()
+
+
+def _insert_sql(table_name, cols, update=True, backend=BACKEND_MYSQL):
+    col_str = ', '.join(f'`{c}`' for c in cols)
+    values = ', '.join(['%s'] * len(cols))
+    if backend != BACKEND_MYSQL:
+        # 嵌入式库按主键冲突时整行覆盖
+        return f"INSERT {'OR REPLACE ' if update else ''}INTO `{table_name}` ({col_str}) VALUES ({values})"
+    sql = f'INSERT INTO `{table_name}` ({col_str}) VALUES ({values})'
+    if update:
+        sql = f"{sql} ON DUPLICATE KEY UPDATE {', '.join(f'`{c}` = VALUES(`{c}`)' for c in cols)}"
+    return sql
+
+
+def _executemany_batches(db, sql, rows, batch_size):
+    # pymysql 会把 INSERT ... VALUES 的 executemany 合并成多行插入语句
+    for i in range(0, len(rows), batch_size):
+        db.executemany(sql, rows[i:i + batch_size])
+
+
+def _load_data_local(db, table_name, data, cols):
+    df = data[cols]
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', dir=_LOAD_DATA_TMP_DIR, encoding='utf-8',
+                                     newline='', delete=False) as f:
+        df.to_csv(f, index=False, header=False, na_rep='NULL', date_format='%Y-%m-%d %H:%M:%S')
+        path = f.name
+    try:
+        db.execute(f"""LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE `{table_name}` CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n' ({', '.join(f'`{c}`' for c in cols)})""", (path,))
+    finally:
+        os.remove(path)
+
+
+def bulk_insert_db_from_df(data, table_name, mode=BULK_UPSERT, to_db=None, batch_size=None):
+    """
+    批量写入DataFrame到已存在的表，不做DELETE、不反射表结构、不补主键。
+    :param data: 要写入的DataFrame，列名即表字段名
+    :param table_name: 表名，表需提前用create_table_from_structure或DDL创建
+    :param mode: BULK_UPSERT / BULK_LOAD_DATA / BULK_SWAP
+    :param to_db: 目标数据库，默认当前数据库
+    :param batch_size: 每批行数，默认bulk_batch_size
+    :return: 写入的行数
+    """
+    if data is None or len(data.index) == 0:
+        return 0
+    batch_size = batch_size or bulk_batch_size
+    cols = data.columns.tolist()
+    backend = backend_of(to_db)
+    if backend != BACKEND_MYSQL:
+        return _bulk_insert_embedded(data, table_name, mode, to_db, backend, cols, batch_size)
+    try:
+        with get_connection(to_db) as conn:
+            with conn.cursor() as db:
+                if mode == BULK_LOAD_DATA:
+                    _load_data_local(db, table_name, data, cols)
+                elif mode == BULK_SWAP:
+                    # 同一张表的写入写到影子表，再一次RENAME原子替换，读方不会看到半张表
+                    new_table, old_table = f'{table_name}__new', f'{table_name}__old'
+                    db.execute(f'DROP TABLE IF EXISTS `{new_table}`, `{old_table}`')
+                    db.execute(f'CREATE TABLE `{new_table}` LIKE `{table_name}`')
+                    _executemany_batches(db, _insert_sql(new_table, cols, update=False), _df_rows(data, cols), batch_size)
+                    db.execute(f'RENAME TABLE `{table_name}` TO `{old_table}`, `{new_table}` TO `{table_name}`')
+                    db.execute(f'DROP TABLE `{old_table}`')
+                    invalidate_metadata(to_db, table_name)
+                else:
+                    _executemany_batches(db, _insert_sql(table_name, cols), _df_rows(data, cols), batch_size)
+    except Exception as e:
+        logging.error(f"database.bulk_insert_db_from_df处理异常：{table_name}表{e}")
+        return 0
+    return len(data.index)
+
+
+# 嵌入式库的三种方式都写在一个事务里：BULK_SWAP先清空原表再写入，提交前读方看到的仍是旧数据。
+def _bulk_insert_embedded(data, table_name, mode, to_db, backend, cols, batch_size):
+    try:
+        with get_connection(to_db) as conn:
+            with conn.cursor() as db:
+                if mode == BULK_SWAP:
+                    db.execute(f'DELETE FROM `{table_name}`')
+                if backend == BACKEND_DUCKDB:
+                    conn.insert_frame(table_name, data, cols)
+                else:
+                    _executemany_batches(db, _insert_sql(table_name, cols, backend=backend),
+                                         _df_rows(data, cols), batch_size)
+    except Exception as e:
+        logging.error(f"database.bulk_insert_db_from_df处理异常：{table_name}表{e}")
+        return 0
+    return len(data.index)
 
 
 # 更新数据
-def update_db_from_df(data, table_name, where):
-    data = data.where(data.notnull(), None)
-    update_string = f'UPDATE `{table_name}` set '
-    where_string = ' where '
-    cols = tuple(data.columns)
-    with get_connection() as conn:
+# 默认把DataFrame一次批量写入临时表，再用一条 UPDATE ... JOIN 按where键列更新；
+# 临时表方式失败时（如没有CREATE TEMPORARY TABLES权限）退回到分批参数化executemany。
+UPDATE_JOIN = 'join'
+UPDATE_EXECUTEMANY = 'executemany'
+update_chunk_size = 1000
+
+
+def update_db_from_df(data, table_name, where, to_db=None, mode=UPDATE_JOIN, chunk_size=None):
+    """
+    按where键列把DataFrame中其余列的值更新到表中。
+    :param data: DataFrame，需包含where中的键列
+    :param table_name: 表名
+    :param where: 键列，列表或逗号分隔的字符串
+    :param to_db: 目标数据库，默认当前数据库
+    :param mode: UPDATE_JOIN 或 UPDATE_EXECUTEMANY
+    :param chunk_size: executemany方式每批行数，默认update_chunk_size
+    :return: {'matched': 匹配到的行数, 'changed': 实际发生变化的行数}
+             两个数都在UPDATE之前用NULL安全的比较查询得到，不取cursor.rowcount：
+             pymysql连接带CLIENT.FOUND_ROWS，UPDATE的rowcount是匹配行数；SQLite的rowcount同样是匹配行数；DuckDB为-1。
+    """
+    result = {'matched': 0, 'changed': 0}
+    if data is None or len(data.index) == 0:
+        return result
+    keys = _split_keys(where)
+    cols = data.columns.tolist()
+    set_cols = [c for c in cols if c not in keys]
+    if not keys or not set_cols:
+        logging.error(f"database.update_db_from_df处理异常：{table_name}表键列{keys}或更新列{set_cols}为空")
+        return result
+    # UPDATE ... JOIN 是MySQL语法，嵌入式库直接按键列executemany
+    if mode == UPDATE_JOIN and backend_of(to_db) == BACKEND_MYSQL:
+        try:
+            return _update_by_join(data, table_name, keys, set_cols, to_db)
+        except Exception as e:
+            logging.warning(f"database.update_db_from_df临时表更新失败，改用executemany：{table_name}表{e}")
+    try:
+        return _update_by_executemany(data, table_name, keys, set_cols, to_db, chunk_size or update_chunk_size)
+    except Exception as e:
+        logging.error(f"database.update_db_from_df处理异常：{table_name}表{e}")
+    return result
+
+
+def _update_by_join(data, table_name, keys, set_cols, to_db):
+    tmp_table = f'_tmp_update_{table_name}'
+    cols = keys + set_cols
+    col_str = ', '.join(f'`{c}`' for c in cols)
+    on_str = ' AND '.join(f't.`{k}` = s.`{k}`' for k in keys)
+    with get_connection(to_db) as conn:
         with conn.cursor() as db:
-            try:
-                for row in data.values:
-                    sql = update_string
-                    sql_where = where_string
-                    for index, col in enumerate(cols):
-                        if col in where:
-                            if len(sql_where) == len(where_string):
-                                if type(row[index]) == str:
-                                    sql_where = f'''{sql_where}`{col}` = '{row[index]}' '''
-                                else:
-                                    sql_where = f'''{sql_where}`{col}` = {row[index]} '''
-                            else:
-                                if type(row[index]) == str:
-                                    sql_where = f'''{sql_where} and `{col}` = '{row[index]}' '''
-                                else:
-                                    sql_where = f'''{sql_where} and `{col}` = {row[index]} '''
-                        else:
-                            if type(row[index]) == str:
-                                if row[index] is None or row[index] != row[index]:
-                                    sql = f'''{sql}`{col}` = NULL, '''
-                                else:
-                                    sql = f'''{sql}`{col}` = '{row[index]}', '''
-                            else:
-                                if row[index] is None or row[index] != row[index]:
-                                    sql = f'''{sql}`{col}` = NULL, '''
-                                else:
-                                    sql = f'''{sql}`{col}` = {row[index]}, '''
-                    sql = f'{sql[:-2]}{sql_where}'
-                    db.execute(sql)
-            except Exception as e:
-                logging.error(f"database.update_db_from_df处理异常：{sql}{e}")
+            # 临时表只在当前连接可见，复制目标表的字段类型
+            db.execute(f'DROP TEMPORARY TABLE IF EXISTS `{tmp_table}`')
+            db.execute(f'CREATE TEMPORARY TABLE `{tmp_table}` SELECT {col_str} FROM `{table_name}` WHERE 1 = 0')
+            db.execute(f"ALTER TABLE `{tmp_table}` ADD INDEX ({', '.join(f'`{k}`' for k in keys)})")
+            _executemany_batches(db, _insert_sql(tmp_table, cols, update=False), _df_rows(data, cols), bulk_batch_size)
+            db.execute(f'SELECT COUNT(*), {_changed_sum(set_cols, BACKEND_MYSQL)} '
+                       f'FROM `{table_name}` t JOIN `{tmp_table}` s ON {on_str}')
+            matched, changed = (int(v or 0) for v in db.fetchone())
+            db.execute(f"UPDATE `{table_name}` t JOIN `{tmp_table}` s ON {on_str} "
+                       f"SET {', '.join(f't.`{c}` = s.`{c}`' for c in set_cols)}")
+            db.execute(f'DROP TEMPORARY TABLE IF EXISTS `{tmp_table}`')
+    return {'matched': matched, 'changed': changed}
 
 
-# 检查表是否存在
-def checkTableIsExist(tableName):
-    with get_connection() as conn:
+# 匹配行中至少有一个更新列与新值不同（NULL安全比较）的行数
+def _changed_sum(set_cols, backend):
+    if backend == BACKEND_MYSQL:
+        diff = ' OR '.join(f'NOT (t.`{c}` <=> s.`{c}`)' for c in set_cols)
+    elif backend == BACKEND_SQLITE:
+        diff = ' OR '.join(f't.`{c}` IS NOT s.`{c}`' for c in set_cols)
+    else:
+        diff = ' OR '.join(f't.`{c}` IS DISTINCT FROM s.`{c}`' for c in set_cols)
+    return f'SUM(CASE WHEN {diff} THEN 1 ELSE 0 END)'
+
+
+def _update_by_executemany(data, table_name, keys, set_cols, to_db, chunk_size):
+    backend = backend_of(to_db)
+    cols = set_cols + keys
+    rows = _df_rows(data, cols)
+    on_str = ' AND '.join(f't.`{k}` = s.`{k}`' for k in keys)
+    first_select = f"SELECT {', '.join(f'%s AS `{c}`' for c in cols)}"
+    next_select = f"SELECT {', '.join(['%s'] * len(cols))}"
+    # 统计查询把一批新值拼成UNION ALL派生表，SQLite单条语句的参数个数有上限
+    count_rows = max(1, (900 if backend == BACKEND_SQLITE else 30000) // len(cols))
+    sql = (f"UPDATE `{table_name}` SET {', '.join(f'`{c}` = %s' for c in set_cols)} "
+           f"WHERE {' AND '.join(f'`{k}` = %s' for k in keys)}")
+    matched = changed = 0
+    with get_connection(to_db) as conn:
         with conn.cursor() as db:
-            db.execute("""
-                SELECT COUNT(*)
-                FROM information_schema.tables
-                WHERE table_name = '{0}'
-                """.format(tableName.replace('\'', '\'\'')))
-            if db.fetchone()[0] == 1:
-                return True
-    return False
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
+                for j in range(0, len(chunk), count_rows):
+                    part = chunk[j:j + count_rows]
+                    derived = ' UNION ALL '.join([first_select] + [next_select] * (len(part) - 1))
+                    db.execute(f"SELECT COUNT(*), {_changed_sum(set_cols, backend)} "
+                               f"FROM `{table_name}` t JOIN ({derived}) s ON {on_str}", [v for r in part for v in r])
+                    part_matched, part_changed = db.fetchone()
+                    matched += int(part_matched or 0)
+                    changed += int(part_changed or 0)
+                db.executemany(sql, chunk)
+                # 每批提交一次，避免一个大事务长时间持有行锁
+                conn.commit()
+    return {'matched': matched, 'changed': changed}
+
+
+# 检查表是否存在，从元数据缓存回答
+def checkTableIsExist(tableName, to_db=None):
+    return table_exists(tableName, to_db)
 
 
 # 增删改数据
-def executeSql(sql, params=()):
-    with get_connection() as conn:
+def executeSql(sql, params=(), to_db=None):
+    with get_connection(to_db) as conn:
         with conn.cursor() as db:
             try:
                 db.execute(sql, params)
             except Exception as e:
                 logging.error(f"database.executeSql处理异常：{sql}{e}")
+    _invalidate_for_ddl(sql, to_db)
 
 
 # 查询数据
-def executeSqlFetch(sql, params=()):
-    with get_connection() as conn:
+def executeSqlFetch(sql, params=(), to_db=None):
+    with get_connection(to_db) as conn:
         with conn.cursor() as db:
             try:
                 db.execute(sql, params)
@@ -172,8 +1047,8 @@ def executeSqlFetch(sql, params=()):
 
 
 # 计算数量
-def executeSqlCount(sql, params=()):
-    with get_connection() as conn:
+def executeSqlCount(sql, params=(), to_db=None):
+    with get_connection(to_db) as conn:
         with conn.cursor() as db:
             try:
                 db.execute(sql, params)
@@ -185,3 +1060,72 @@ def executeSqlCount(sql, params=()):
             except Exception as e:
                 logging.error(f"database.select_count计算数量处理异常：{e}")
     return 0
+
+
+class Database:
+    """
+    固定指向一个数据库的句柄，代替在业务模块中改写本模块的db_database、MYSQL_CONN_URL、MYSQL_CONN_DBAPI。
+    连接池、元数据缓存和存储后端都按库名区分，同一个库的句柄共用一个连接池，
+    不同线程可以同时访问不同的库，不会互相覆盖默认库。
+
+        hist = Database('stock_hist')
+        rows = hist.executeSqlFetch("SELECT code, name FROM `cn_baostock_code_map`")
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Database('{self.name}')"
+
+    @property
+    def backend(self):
+        return backend_of(self.name)
+
+    def engine(self):
+        return engine_to_db(self.name)
+
+    def get_connection(self):
+        return get_connection(self.name)
+
+    def pool_status(self):
+        return pool_status(self.name)
+
+    def checkTableIsExist(self, tableName):
+        return table_exists(tableName, self.name)
+
+    def table_exists(self, table_name):
+        return table_exists(table_name, self.name)
+
+    def get_primary_key(self, table_name):
+        return get_primary_key(table_name, self.name)
+
+    def get_table_metadata(self, table_name):
+        return get_table_metadata(table_name, self.name)
+
+    def list_tables(self):
+        return list_tables(self.name)
+
+    def invalidate_metadata(self, table_name=None):
+        invalidate_metadata(self.name, table_name)
+
+    def executeSql(self, sql, params=()):
+        executeSql(sql, params, to_db=self.name)
+
+    def executeSqlFetch(self, sql, params=()):
+        return executeSqlFetch(sql, params, to_db=self.name)
+
+    def executeSqlCount(self, sql, params=()):
+        return executeSqlCount(sql, params, to_db=self.name)
+
+    def insert_db_from_df(self, data, table_name, cols_type, write_index, primary_keys, indexs=None):
+        insert_other_db_from_df(self.name, data, table_name, cols_type, write_index, primary_keys, indexs)
+
+    def create_table_from_structure(self, table, primary_keys, indexs=None):
+        create_table_from_structure(table, primary_keys, indexs, to_db=self.name)
+
+    def bulk_insert_db_from_df(self, data, table_name, mode=BULK_UPSERT, batch_size=None):
+        return bulk_insert_db_from_df(data, table_name, mode, to_db=self.name, batch_size=batch_size)
+
+    def update_db_from_df(self, data, table_name, where, mode=UPDATE_JOIN, chunk_size=None):
+        return update_db_from_df(data, table_name, where, to_db=self.name, mode=mode, chunk_size=chunk_size)
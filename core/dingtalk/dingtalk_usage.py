@@ -1,4 +1,4 @@
-import requests
+from core import http_client
 import io
 
 # 企业内部应用参数
@@ -8,7 +8,7 @@ CHATID = 'chat9652245847eebc05ee9e1a1fea02ceda'  # 你的目标群chatid
 
 def get_access_token(appkey, appsecret):
     url = f"https://oapi.dingtalk.com/gettoken?appkey={appkey}&appsecret={appsecret}"
-    resp = requests.get(url)
+    resp = http_client.get(url)
     data = resp.json()
     if data.get('errcode', 0) != 0:
         raise Exception(f"获取access_token失败: {data}")
@@ -20,11 +20,11 @@ def upload_image_to_dingtalk(access_token, image, filename='image.png'):
         # 文件路径或字节流
         with open(image, 'rb') as f:
             files = {'media': f}
-            res = requests.post(url, files=files)
+            res = http_client.post(url, files=files)
     elif isinstance(image, io.BytesIO):
         image.seek(0)
         files = {'media': (filename, image, 'image/png')}
-        res = requests.post(url, files=files)
+        res = http_client.post(url, files=files)
     else:
         raise ValueError('image参数必须是文件路径或BytesIO对象')
     data = res.json()
@@ -43,7 +43,7 @@ def send_image_to_group(access_token, chatid, media_id):
             }
         }
     }
-    res = requests.post(url, json=data)
+    res = http_client.post(url, json=data)
     print('发送图片返回:', res.json())
 
 def send_text_to_group(access_token, chatid, message):
@@ -57,7 +57,7 @@ def send_text_to_group(access_token, chatid, message):
             }
         }
     }
-    res = requests.post(url, json=data)
+    res = http_client.post(url, json=data)
     print('发送文本返回:', res.json())
 
 def send_to_dingtalk(img, message=None):
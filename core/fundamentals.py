@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import struct
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 通达信专业财务数据（vipdoc/cw/gpcwYYYYMMDD.dat）解析后的本地列式存储。
+# 每个报告期一个Parquet文件，主键(code, report_date)，字段col001..colNNN对应通达信FINVALUE(1..N)。
+# download_tdx_caiwu解压后调用ingest_financial_files，只解析新增或有变化的报告期文件。
+CW_DIR = r"/mnt/c/new_tdx/vipdoc/cw"
+STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'parquet', 'fundamentals')
+_MANIFEST_FILE = 'manifest.json'
+
+# 文件头：未知, 报告期(YYYYMMDD), 股票数, 未知, 每只股票的报告字节数, 未知
+_HEADER = struct.Struct('<1hI1H3L')
+# 股票索引项：代码, 市场, 报告数据在文件中的偏移
+_ITEM_DTYPE = np.dtype([('code', 'S6'), ('market', 'S1'), ('offset', '<u4')])
+
+# 常用字段的别名
+FIELD_ALIASES = {
+    'eps': 'col001',                      # 基本每股收益
+    'eps_deducted': 'col002',             # 扣除非经常性损益每股收益
+    'undistributed_profit_ps': 'col003',  # 每股未分配利润
+    'bvps': 'col004',                     # 每股净资产
+    'capital_reserve_ps': 'col005',       # 每股资本公积金
+    'roe': 'col006',                      # 净资产收益率
+    'ocf_ps': 'col007',                   # 每股经营现金流量
+    'total_shares': 'col238',             # 总股本
+    'float_a_shares': 'col239',           # 已上市流通A股
+}
+
+
+def _column(i):
+    return f'col{i:03d}'
+
+
+# 按信息披露的法定截止日确定报告最晚可用的日期，时点查询只使用此日期之前已经披露的报告，避免用到未来数据：
+# 一季报4月30日，中报8月31日，三季报10月31日，年报次年4月30日。
+def available_date(report_date):
+    report_date = pd.Timestamp(report_date).date()
+    if report_date.month == 3:
+        return datetime.date(report_date.year, 4, 30)
+    if report_date.month == 6:
+        return datetime.date(report_date.year, 8, 31)
+    if report_date.month == 9:
+        return datetime.date(report_date.year, 10, 31)
+    return datetime.date(report_date.year + 1, 4, 30)
+
+
+def parse_gpcw(path):
+    """
+    解析一个gpcw*.dat文件。
+    :return: pyarrow.Table，列为code、report_date、available_date、col001..colNNN（float32）
+    """
+    raw = np.fromfile(path, dtype=np.uint8)
+    _, report_date, count, _, report_size, _ = _HEADER.unpack_from(raw)
+    n_fields = report_size // 4
+    items = raw[_HEADER.size:_HEADER.size + count * _ITEM_DTYPE.itemsize].view(_ITEM_DTYPE)
+    offsets = items['offset'].astype(np.int64)
+    valid = offsets + n_fields * 4 <= len(raw)
+    if not valid.all():
+        logging.error(f"fundamentals.parse_gpcw处理异常：{path}有{int((~valid).sum())}条记录越界，已跳过")
+        items, offsets = items[valid], offsets[valid]
+    # 按偏移一次性取出所有股票的报告字节，再整体按float32解释
+    values = raw[offsets[:, None] + np.arange(n_fields * 4)].view('<f4').reshape(len(offsets), n_fields)
+    report = datetime.date(report_date // 10000, report_date // 100 % 100, report_date % 100)
+    columns = {
+        'code': pa.array(np.char.decode(items['code'], 'ascii')),
+        'report_date': pa.array([report] * len(offsets), pa.date32()),
+        'available_date': pa.array([available_date(report)] * len(offsets), pa.date32()),
+    }
+    for i in range(n_fields):
+        columns[_column(i + 1)] = pa.array(values[:, i])
+    return pa.table(columns)
+
+
+def _load_manifest():
+    try:
+        with open(os.path.join(STORE_DIR, _MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest):
+    path = os.path.join(STORE_DIR, _MANIFEST_FILE)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def ingest_financial_files(cw_dir=CW_DIR):
+    """
+    增量解析cw目录：按文件大小和修改时间判断，只解析新增或被更新的报告期文件（通达信会随着披露进度反复更新最近几期）。
+    :return: 本次解析的文件名列表
+    """
+    if not os.path.isdir(cw_dir):
+        print(f"财务数据目录不存在：{cw_dir}")
+        return []
+    os.makedirs(STORE_DIR, exist_ok=True)
+    manifest = _load_manifest()
+    ingested = []
+    for name in sorted(os.listdir(cw_dir)):
+        if not (name.startswith('gpcw') and name.endswith('.dat')):
+            continue
+        path = os.path.join(cw_dir, name)
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        if manifest.get(name) == signature:
+            continue
+        try:
+            table = parse_gpcw(path)
+            out_path = os.path.join(STORE_DIR, name.replace('.dat', '.parquet'))
+            tmp_path = os.path.join(STORE_DIR, '.' + os.path.basename(out_path) + '.tmp')
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, out_path)
+            manifest[name] = signature
+            ingested.append(name)
+        except Exception as e:
+            logging.error(f"fundamentals.ingest_financial_files处理异常：{name}{e}")
+    if ingested:
+        _save_manifest(manifest)
+    print(f"财务数据解析完成：更新{len(ingested)}个报告期文件")
+    return ingested
+
+
+def _resolve_fields(fields):
+    if fields is None:
+        return None, {}
+    columns, rename = [], {}
+    for field in fields:
+        column = FIELD_ALIASES.get(field, field)
+        columns.append(column)
+        if column != field:
+            rename[column] = field
+    return columns, rename
+
+
+def read_fundamentals(codes=None, fields=None, start_report=None, end_report=None):
+    """
+    读取多个报告期的财务数据。
+    :param codes: 股票代码列表，None表示全部
+    :param fields: 字段列表，可以用FIELD_ALIASES中的别名或colNNN，None表示全部字段
+    :param start_report: 起始报告期，包含
+    :param end_report: 截止报告期，包含
+    :return: 按code、report_date升序的DataFrame
+    """
+    if not os.path.isdir(STORE_DIR):
+        return pd.DataFrame()
+    columns, rename = _resolve_fields(fields)
+    start = pd.Timestamp(start_report).date() if start_report is not None else None
+    end = pd.Timestamp(end_report).date() if end_report is not None else None
+    filters = [('code', 'in', [str(c).zfill(6) for c in codes])] if codes is not None else None
+    tables = []
+    for name in sorted(os.listdir(STORE_DIR)):
+        if not name.endswith('.parquet') or name.startswith('.'):
+            continue
+        report = datetime.datetime.strptime(name[4:12], '%Y%m%d').date()
+        if (start and report < start) or (end and report > end):
+            continue
+        path = os.path.join(STORE_DIR, name)
+        if columns is not None:
+            # 早期的报告期文件字段较少，缺少的字段读出来为空
+            available = set(pq.read_schema(path).names)
+            read_columns = ['code', 'report_date', 'available_date'] + [c for c in columns if c in available]
+        else:
+            read_columns = None
+        tables.append(pq.read_table(path, columns=read_columns, filters=filters))
+    if not tables:
+        return pd.DataFrame()
+    df = pa.concat_tables(tables, promote_options='default').to_pandas()
+    if columns is not None:
+        df = df.reindex(columns=['code', 'report_date', 'available_date'] + columns)
+    df = df.rename(columns=rename)
+    return df.sort_values(['code', 'report_date']).reset_index(drop=True)
+
+
+def point_in_time(date, fields=None, codes=None):
+    """
+    时点查询：每只股票在date当天已经披露的最近一期报告。
+    :param date: 查询日期
+    :return: 以code为索引的DataFrame，含report_date和所需字段
+    """
+    date = pd.Timestamp(date).date()
+    df = read_fundamentals(codes=codes, fields=fields, end_report=date)
+    if df.empty:
+        return df
+    df = df[pd.to_datetime(df['available_date']).dt.date <= date]
+    return df.groupby('code').tail(1).set_index('code')
+
+
+if __name__ == "__main__":
+    ingest_financial_files()
+    print(point_in_time(datetime.date.today(), fields=['eps', 'bvps', 'roe']).head())
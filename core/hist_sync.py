@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+import logging
+import datetime
+import pandas as pd
+import core.tablestructure as tbs
+import core.database as mdb
+import core.trade_time as tt
+from core.stockfetch import is_a_stock
+from core.daily_bar import DAILY_BAR_DB, DAILY_BAR_TABLE
+from core.crawling.stock_hist_baostock import fetch_hist_k_data_and_save, to_baostock_code
+
+# 日线历史数据的增量同步：水位表记录每个代码在每个数据源上已成功入库的最后一个交易日，
+# 每次只抓取水位之后到最近交易日之间缺失的交易日。停机几天后补跑，抓取的正好是缺失的那几天。
+# 代码映射表、日线长表和水位表都在stock_hist库
+hist_db = mdb.Database(DAILY_BAR_DB)
+WATERMARK_TABLE = tbs.TABLE_CN_SYNC_WATERMARK['name']
+CODE_MAP_TABLE = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
+SOURCE_BAOSTOCK = 'baostock'
+# 没有任何历史数据的新代码，首次同步最近多少个交易日
+INITIAL_TRADE_DAYS = 30
+
+_table_ready = False
+
+
+def _ensure_table():
+    global _table_ready
+    if not _table_ready:
+        hist_db.create_table_from_structure(tbs.TABLE_CN_SYNC_WATERMARK, "`code`,`source`")
+        _table_ready = True
+
+
+def _trade_dates():
+    return list(tt.get_calendar().dates.astype(object))
+
+
+def load_watermarks(source=SOURCE_BAOSTOCK):
+    """
+    :return: {code: last_date}
+    """
+    _ensure_table()
+    rows = hist_db.executeSqlFetch(f"SELECT `code`, `last_date` FROM `{WATERMARK_TABLE}` WHERE `source` = %s",
+                                   (source,))
+    return {code: pd.Timestamp(last_date).date() for code, last_date in rows or () if last_date is not None}
+
+
+# 水位表上线之前日线长表里已有的数据，用每个代码的最大日期作为初始水位
+def _bootstrap_watermarks(codes, source):
+    # 走(code, date)索引，每个代码只读索引的最后一项
+    sql = f"SELECT `code`, MAX(`date`) FROM `{DAILY_BAR_TABLE}` WHERE `code` IN ({', '.join(['%s'] * len(codes))}) " \
+          f"GROUP BY `code`"
+    rows = hist_db.executeSqlFetch(sql, list(codes))
+    if not rows:
+        return {}
+    marks = {code: pd.Timestamp(last_date).date() for code, last_date in rows if last_date is not None}
+    if marks:
+        save_watermarks(marks, source)
+        print(f"从{DAILY_BAR_TABLE}表初始化了{len(marks)}个代码的同步水位")
+    return marks
+
+
+def save_watermarks(marks, source=SOURCE_BAOSTOCK):
+    """
+    写入水位，只会前移不会后退。
+    :param marks: {code: last_date}
+    """
+    if not marks:
+        return 0
+    _ensure_table()
+    current = load_watermarks(source)
+    now = datetime.datetime.now()
+    rows = [{'code': code, 'source': source, 'last_date': last_date, 'updated_at': now}
+            for code, last_date in marks.items() if current.get(code) is None or last_date > current[code]]
+    if not rows:
+        return 0
+    return hist_db.bulk_insert_db_from_df(pd.DataFrame(rows), WATERMARK_TABLE, mdb.BULK_UPSERT)
+
+
+def add_new_listings():
+    """
+    把最近一次实时行情快照中出现、但代码映射表中还没有的A股加入代码映射表，新股首次同步时会自动补齐历史数据。
+    :return: 新增的代码列表
+    """
+    spot_table = tbs.TABLE_CN_STOCK_SPOT['name']
+    if not hist_db.checkTableIsExist(spot_table):
+        return []
+    rows = hist_db.executeSqlFetch(f"SELECT `code`, `name` FROM `{spot_table}` "
+                                   f"WHERE `date` = (SELECT MAX(`date`) FROM `{spot_table}`)")
+    if not rows:
+        return []
+    known = {code for (code,) in hist_db.executeSqlFetch(f"SELECT `code` FROM `{CODE_MAP_TABLE}`") or ()}
+    new = [(code, name) for code, name in rows if is_a_stock(code) and code not in known]
+    if not new:
+        return []
+    df = pd.DataFrame(new, columns=['code', 'name'])
+    df['baostock_mapped_code'] = df['code'].apply(to_baostock_code)
+    hist_db.bulk_insert_db_from_df(df[['name', 'code', 'baostock_mapped_code']], CODE_MAP_TABLE, mdb.BULK_UPSERT)
+    print(f"代码映射表新增{len(df)}只股票：{df['code'].tolist()}")
+    return df['code'].tolist()
+
+
+def plan_gaps(codes, watermarks, end_date, trade_dates, initial_days=INITIAL_TRADE_DAYS):
+    """
+    按交易日历计算每个代码缺失的区间，起止日期相同的代码合并为一组。
+    :param codes: 代码列表
+    :param watermarks: {code: last_date}
+    :param end_date: 同步截止的交易日
+    :param trade_dates: 升序的交易日列表
+    :return: {(start_date, end_date): [code, ...]}，已经同步到end_date的代码不出现
+    """
+    end_idx = bisect.bisect_right(trade_dates, end_date) - 1
+    initial_start = trade_dates[max(0, end_idx - initial_days + 1)]
+    gaps = {}
+    for code in codes:
+        last_date = watermarks.get(code)
+        if last_date is None:
+            start = initial_start
+        else:
+            start_idx = bisect.bisect_right(trade_dates, last_date)
+            if start_idx > end_idx:
+                continue
+            start = trade_dates[start_idx]
+        gaps.setdefault((start, trade_dates[end_idx]), []).append(code)
+    return gaps
+
+
+# 一批数据写库成功后推进水位：有数据的代码推进到返回的最大日期；
+# 查询成功但没有数据的（停牌）代码推进到本批其他股票已有数据的最大日期，说明数据源已经发布了这一天。
+def _advance_watermarks(frames, queried, source):
+    marks = {}
+    published = None
+    for df in frames:
+        dates = pd.to_datetime(df['date'], errors='coerce').dropna()
+        if dates.empty:
+            continue
+        code = str(df['code'].iloc[0]).split('.')[-1].zfill(6)
+        marks[code] = dates.max().date()
+        published = marks[code] if published is None else max(published, marks[code])
+    if published is not None:
+        for baostock_code in queried:
+            marks.setdefault(baostock_code.split('.')[-1].zfill(6), published)
+    save_watermarks(marks, source)
+
+
+def sync_daily_history(end_date=None, workers=None, initial_days=INITIAL_TRADE_DAYS):
+    """
+    增量同步baostock日线：自动加入新上市股票，按水位只抓取缺失的交易日。
+    :param end_date: 同步截止日期，默认今天；非交易日取之前最近的交易日
+    :return: 实际抓取的(start_date_str, end_date_str)并集区间，没有需要同步的数据时为None
+    """
+    source = SOURCE_BAOSTOCK
+    try:
+        add_new_listings()
+        rows = hist_db.executeSqlFetch(f"SELECT `code`, `baostock_mapped_code` FROM `{CODE_MAP_TABLE}`")
+        if not rows:
+            print(f"{CODE_MAP_TABLE}表无数据。")
+            return None
+        baostock_codes = dict(rows)
+        trade_dates = _trade_dates()
+        end_date = end_date or datetime.date.today()
+        if not tt.is_trade_date(end_date):
+            end_date = tt.get_previous_trade_date(end_date)
+
+        watermarks = load_watermarks(source)
+        missing = [code for code in baostock_codes if code not in watermarks]
+        if missing:
+            watermarks.update(_bootstrap_watermarks(missing, source))
+        gaps = plan_gaps(list(baostock_codes), watermarks, end_date, trade_dates, initial_days)
+        if not gaps:
+            print(f"所有股票已同步到{end_date}")
+            return None
+        for (start, end), codes in sorted(gaps.items()):
+            print(f"{start}到{end}缺失{len(codes)}只股票的数据")
+        for (start, end), codes in sorted(gaps.items()):
+            fetch_hist_k_data_and_save([baostock_codes[code] for code in codes],
+                                       start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), workers=workers,
+                                       on_saved=lambda frames, queried: _advance_watermarks(frames, queried, source))
+        start = min(start for start, _ in gaps)
+        return start.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    except Exception as e:
+        logging.error(f"hist_sync.sync_daily_history处理异常：{e}")
+    return None
+
+
+if __name__ == "__main__":
+    print(sync_daily_history())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from urllib.parse import urlsplit, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+
+# 所有爬虫和钉钉推送共用的HTTP客户端：
+# 每个host一个长连接Session（连接池），按host（或host加路径）一个令牌桶限速，
+# 连接错误/超时/429/5xx按指数退避加随机抖动重试，
+# 相同的GET请求（url、参数、请求头都相同）同时在途时只发一次，其余调用方共享同一个响应，
+# 按host统计请求数、错误数、重试数和耗时，见http_stats()。
+http_timeout = 10
+http_retries = 2
+http_backoff_base = 0.5
+http_backoff_max = 8.0
+http_pool_maxsize = 10
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# 每个host的限速：(rate, per)，即每per秒最多发出rate个请求；未配置的host不限速。
+# 键也可以是host加路径前缀，只限制该路径下的请求，优先于host的限速。
+# 钉钉机器人每分钟最多20条消息，超出后会被限流10分钟；同一host上的gettoken、媒体上传等接口不受此限制。
+host_rate_limits = {
+    'oapi.dingtalk.com/robot/send': (20, 60),
+    'push2his.eastmoney.com': (20, 1),
+    'apphq.longhuvip.com': (10, 1),
+    'apphis.longhuvip.com': (10, 1),
+}
+
+# 按url中的某个查询参数分别限速：钉钉的限制是每个机器人（access_token）各自每分钟20条
+rate_limit_split_params = {
+    'oapi.dingtalk.com/robot/send': 'access_token',
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_buckets = {}
+_buckets_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+_LATENCY_SAMPLES = 1000
+
+
+class _TokenBucket:
+
+    def __init__(self, rate, per):
+        # 桶容量等于rate，允许短时突发，长期速率为rate/per
+        self.capacity = float(rate)
+        self.fill_rate = rate / float(per)
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        取一个令牌，没有令牌时等待。
+        :return: 等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+
+def get_session(url_or_host):
+    """
+    取某个host的长连接Session，同一host的所有请求复用TCP/TLS连接。
+    :param url_or_host: url或host
+    """
+    host = _host(url_or_host) if '://' in url_or_host else url_or_host.lower()
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=http_pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _sessions[host] = session
+    return session
+
+
+def set_rate_limit(host, rate, per=1.0):
+    """
+    设置某个host（或host加路径前缀）的限速：每per秒最多rate个请求。rate为None时取消限速。
+    """
+    host = host.lower()
+    with _buckets_lock:
+        if rate is None:
+            host_rate_limits.pop(host, None)
+        else:
+            host_rate_limits[host] = (rate, per)
+        for key in [k for k in _buckets if k == host or k.startswith(f'{host}?')]:
+            del _buckets[key]
+
+
+def _rate_limit_key(url):
+    """
+    :return: (host_rate_limits中的键, 令牌桶的键)；不限速时为(None, None)
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    target = host + parts.path
+    for key in host_rate_limits:
+        if '/' in key and target.startswith(key):
+            param = rate_limit_split_params.get(key)
+            values = parse_qs(parts.query).get(param) if param else None
+            if values:
+                return key, f'{key}?{param}={values[0]}'
+            return key, key
+    if host in host_rate_limits:
+        return host, host
+    return None, None
+
+
+def _bucket(url):
+    limit_key, bucket_key = _rate_limit_key(url)
+    if limit_key is None:
+        return None
+    bucket = _buckets.get(bucket_key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(bucket_key)
+            if bucket is None and limit_key in host_rate_limits:
+                bucket = _TokenBucket(*host_rate_limits[limit_key])
+                _buckets[bucket_key] = bucket
+    return bucket
+
+
+def _host_stats(host):
+    stats = _stats.get(host)
+    if stats is None:
+        stats = {'requests': 0, 'errors': 0, 'retries': 0, 'coalesced': 0, 'throttled_seconds': 0.0,
+                 'status': {}, 'latency': deque(maxlen=_LATENCY_SAMPLES), 'total_seconds': 0.0}
+        _stats[host] = stats
+    return stats
+
+
+def _record(host, **kwargs):
+    with _stats_lock:
+        stats = _host_stats(host)
+        for key, value in kwargs.items():
+            if key == 'status':
+                stats['status'][value] = stats['status'].get(value, 0) + 1
+            elif key == 'latency':
+                stats['latency'].append(value)
+                stats['total_seconds'] += value
+            else:
+                stats[key] += value
+
+
+def _backoff(attempt, response=None):
+    if response is not None and response.status_code == 429:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), http_backoff_max)
+    delay = min(http_backoff_base * (2 ** attempt), http_backoff_max)
+    return delay + random.uniform(0, delay / 2)
+
+
+def _send(method, url, host, retries, timeout, kwargs):
+    session = get_session(host)
+    bucket = _bucket(url)
+    attempt = 0
+    while True:
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited:
+                _record(host, throttled_seconds=waited)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _record(host, requests=1, errors=1, latency=time.perf_counter() - start)
+            if attempt >= retries:
+                logging.error(f"http_client.request处理异常：{method} {url}{e}")
+                raise
+            attempt += 1
+            _record(host, retries=1)
+            time.sleep(_backoff(attempt - 1))
+            continue
+        _record(host, requests=1, status=response.status_code, latency=time.perf_counter() - start)
+        if response.status_code in RETRY_STATUS:
+            _record(host, errors=1)
+            if attempt < retries:
+                attempt += 1
+                _record(host, retries=1)
+                response.close()
+                time.sleep(_backoff(attempt - 1, response))
+                continue
+        return response
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def request(method, url, params=None, headers=None, timeout=None, retries=None, coalesce=None, **kwargs):
+    """
+    发送HTTP请求，参数与requests.request相同。
+    :param timeout: 超时秒数，默认http_timeout，也可以是(连接超时, 读取超时)
+    :param retries: 连接错误、超时、429和5xx时的重试次数；GET默认http_retries，
+                    其他方法默认不重试（服务端可能已经处理了请求，例如已经发出了钉钉消息）
+    :param coalesce: 是否合并相同的在途请求，默认非stream的GET合并
+    :return: requests.Response；重试用完后仍为429/5xx时返回最后一次的响应，由调用方判断状态码
+    """
+    method = method.upper()
+    host = _host(url)
+    timeout = http_timeout if timeout is None else timeout
+    if retries is None:
+        retries = http_retries if method == 'GET' else 0
+    if params is not None:
+        kwargs['params'] = params
+    if headers is not None:
+        kwargs['headers'] = headers
+    if coalesce is None:
+        coalesce = method == 'GET' and not kwargs.get('stream')
+    if not coalesce:
+        return _send(method, url, host, retries, timeout, kwargs)
+
+    key = (method, url, _freeze(params), _freeze(headers), _freeze(kwargs.get('data')))
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+    if not leader:
+        _record(host, coalesced=1)
+        return future.result()
+    try:
+        response = _send(method, url, host, retries, timeout, kwargs)
+        # 先读完响应体，其他调用方共享的响应可以重复调用.json()/.text
+        response.content
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def get(url, params=None, **kwargs):
+    return request('GET', url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return request('POST', url, data=data, json=json, **kwargs)
+
+
+def http_stats():
+    """
+    各host的请求统计
+    :return: {host: {requests, errors, retries, coalesced, throttled_seconds, status, avg_seconds, p50_seconds,
+             p95_seconds, max_seconds}}，耗时按最近_LATENCY_SAMPLES次请求计算
+    """
+    result = {}
+    with _stats_lock:
+        for host, stats in _stats.items():
+            latency = sorted(stats['latency'])
+            item = {k: stats[k] for k in ('requests', 'errors', 'retries', 'coalesced')}
+            item['throttled_seconds'] = round(stats['throttled_seconds'], 3)
+            item['status'] = dict(stats['status'])
+            if latency:
+                item['avg_seconds'] = round(sum(latency) / len(latency), 3)
+                item['p50_seconds'] = round(latency[len(latency) // 2], 3)
+                item['p95_seconds'] = round(latency[min(len(latency) - 1, int(len(latency) * 0.95))], 3)
+                item['max_seconds'] = round(latency[-1], 3)
+            result[host] = item
+    return result
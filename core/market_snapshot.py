@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import datetime
+import threading
+from collections import deque
+from concurrent.futures import Future
+import pandas as pd
+from core.crawling.stock_hist_em import stock_zh_a_spot_em
+
+# 进程内共享的全市场A股实时行情快照。
+# 同一时间触发的多个任务（红盘家数、市场概览、钉钉复盘等）在snapshot_ttl秒内共用同一次抓取，
+# 同时在途的请求只抓一次，其余调用方等待同一个结果。
+# 快照的列数组设为只读，每个调用方拿到的是浅拷贝：增删列、排序等操作互不影响，也不需要复制整张表。
+# 最近SNAPSHOT_HISTORY个快照保留在内存中，见snapshot_history()。
+# 抓取失败时只退回不超过STALE_FACTOR * snapshot_ttl秒的旧快照，更旧的不返回，写入方跳过这一次，
+# 避免把10:00的数据记到11:00名下。
+snapshot_ttl = 30
+SNAPSHOT_HISTORY = 10
+STALE_FACTOR = 2
+
+_history = deque(maxlen=SNAPSHOT_HISTORY)
+_inflight = None
+_lock = threading.Lock()
+
+
+def _freeze(df):
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy().copy()
+        values.flags.writeable = False
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index.copy(), copy=False)
+
+
+def _fetch():
+    start = time.perf_counter()
+    df = stock_zh_a_spot_em()
+    if df is None or df.empty:
+        raise ValueError("全市场行情为空")
+    snapshot = (datetime.datetime.now(), _freeze(df))
+    logging.info(f"market_snapshot._fetch：{len(df)}只股票，耗时{round(time.perf_counter() - start, 3)}秒")
+    return snapshot
+
+
+def _latest(max_age):
+    if _history:
+        fetched_at, df = _history[-1]
+        if (datetime.datetime.now() - fetched_at).total_seconds() < max_age:
+            return fetched_at, df
+    return None
+
+
+def get_snapshot(max_age=None):
+    """
+    全市场A股实时行情（列同core.crawling.stock_hist_em.stock_zh_a_spot_em）。
+    :param max_age: 可接受的快照最长存在秒数，默认snapshot_ttl；0表示强制重新抓取
+    :return: (抓取时间, DataFrame)；抓取失败时返回不超过STALE_FACTOR * snapshot_ttl秒的旧快照，
+             没有这样的快照时为(None, 空DataFrame)，调用方应检查抓取时间
+    """
+    global _inflight
+    max_age = snapshot_ttl if max_age is None else max_age
+    with _lock:
+        snapshot = _latest(max_age)
+        if snapshot is None:
+            future = _inflight
+            leader = future is None
+            if leader:
+                future = Future()
+                _inflight = future
+    if snapshot is None:
+        if leader:
+            try:
+                snapshot = _fetch()
+                with _lock:
+                    _history.append(snapshot)
+            except Exception as e:
+                logging.error(f"market_snapshot.get_snapshot处理异常：{e}")
+                with _lock:
+                    snapshot = _latest(STALE_FACTOR * snapshot_ttl) or (None, pd.DataFrame())
+            finally:
+                with _lock:
+                    _inflight = None
+                future.set_result(snapshot)
+        else:
+            snapshot = future.result()
+    fetched_at, df = snapshot
+    return fetched_at, df.copy(deep=False)
+
+
+def snapshot_history():
+    """
+    :return: 内存中最近的快照列表[(抓取时间, DataFrame)]，按时间升序
+    """
+    with _lock:
+        return [(fetched_at, df.copy(deep=False)) for fetched_at, df in _history]
+
+
+if __name__ == "__main__":
+    fetched_at, df = get_snapshot()
+    print(fetched_at, len(df))
+    print(get_snapshot()[0] == fetched_at)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import core.crawling.stock_hist_em as she
+
+# 全市场1分钟线的本地Parquet存储，每个交易日一个分区 date=YYYY-MM-DD/part-0.parquet，分区内按(code, time)排序。
+# 东财分时接口只返回最近5个交易日，收盘后每天抓一次全市场，重叠的日期按(code, time)去重，新数据覆盖旧数据。
+MINUTE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'parquet', 'minute_bar')
+FIELDS = ('open', 'close', 'high', 'low', 'volume', 'amount', 'avg_price')
+
+SCHEMA = pa.schema([
+    ('code', pa.string()),
+    ('time', pa.timestamp('s')),
+    ('open', pa.float32()),
+    ('close', pa.float32()),
+    ('high', pa.float32()),
+    ('low', pa.float32()),
+    ('volume', pa.int64()),
+    ('amount', pa.float64()),
+    # 接口中的“最新价”字段，实际是分时均价线
+    ('avg_price', pa.float32()),
+])
+
+minute_max_workers = 8
+# 抓取结果按交易日分组缓冲，缓冲的行数超过minute_flush_rows时合并写入各天的分区并清空，
+# 全市场5个交易日的分钟线不会同时留在内存中
+minute_flush_rows = 1_000_000
+
+_COLUMN_MAP = {'时间': 'time', '开盘': 'open', '收盘': 'close', '最高': 'high', '最低': 'low',
+               '成交量': 'volume', '成交额': 'amount', '最新价': 'avg_price'}
+
+
+def _day_file(date):
+    return os.path.join(MINUTE_DIR, f'date={pd.Timestamp(date).date()}', 'part-0.parquet')
+
+
+def _to_frame(code, data):
+    df = data.rename(columns=_COLUMN_MAP)[['time'] + list(FIELDS)]
+    df.insert(0, 'code', code)
+    df['time'] = pd.to_datetime(df['time'])
+    return df
+
+
+def _fetch_symbol(code):
+    data = she.stock_zh_a_hist_min_em(symbol=code, period='1')
+    if data is None or data.empty:
+        return None
+    return _to_frame(code, data)
+
+
+def _to_table(df):
+    df = df.sort_values(['code', 'time']).reset_index(drop=True)
+    for col in ('open', 'close', 'high', 'low', 'avg_price'):
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype('float64')
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce').round().astype('Int64')
+    return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+# 合并写入一天的分区：与已有文件按(code, time)去重，新数据覆盖旧数据，写临时文件后原子替换。
+def _write_day(date, df):
+    path = _day_file(date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        old = pq.read_table(path, schema=SCHEMA).to_pandas()
+        df = pd.concat([old, df], ignore_index=True)
+        df = df.drop_duplicates(subset=['code', 'time'], keep='last')
+    tmp_path = os.path.join(os.path.dirname(path), '.part-0.parquet.tmp')
+    pq.write_table(_to_table(df), tmp_path, compression='zstd', row_group_size=256 * 1024)
+    os.replace(tmp_path, path)
+    return len(df)
+
+
+def _flush_days(buffers, written, failed_days):
+    for day in sorted(buffers):
+        try:
+            written[day] = _write_day(day, pd.concat(buffers[day], ignore_index=True))
+        except Exception as e:
+            failed_days.add(day)
+            logging.error(f"minute_bar._write_day处理异常：{day}{e}")
+    buffers.clear()
+
+
+def collect_minute_bars(codes=None, max_workers=None):
+    """
+    收盘后抓取全市场最近5个交易日的1分钟线并合并写入本地存储。
+    请求经由core.http_client，受push2his的限速约束；max_workers只控制同时在途的请求数。
+    抓取结果按交易日分组，缓冲超过minute_flush_rows行就写入对应的分区，内存占用与股票数无关。
+    :param codes: 股票代码列表，默认code_id_map_em中的全部沪深京A股
+    :return: 写入的交易日列表
+    """
+    if codes is None:
+        codes = sorted(she.code_id_map_em())
+    max_workers = max_workers or minute_max_workers
+    start = time.perf_counter()
+    buffers = {}  # 交易日 -> 待写入的DataFrame列表
+    buffered = 0
+    written = {}  # 交易日 -> 分区最新的行数
+    failed_days = set()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_fetch_symbol, code): code for code in codes}
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                df = future.result()
+                if df is not None:
+                    for day, part in df.groupby(df['time'].dt.date):
+                        buffers.setdefault(day, []).append(part)
+                    buffered += len(df)
+            except Exception as e:
+                failed += 1
+                logging.error(f"minute_bar.collect_minute_bars处理异常：{futures[future]}{e}")
+            if i % 500 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"已抓取{i}/{len(codes)}只股票的分钟线，{round(i / elapsed, 1)}只/秒")
+            if buffered >= minute_flush_rows:
+                _flush_days(buffers, written, failed_days)
+                buffered = 0
+    _flush_days(buffers, written, failed_days)
+    if not written and not failed_days:
+        print("未抓取到分钟线数据")
+        return []
+    days = [day for day in sorted(written) if day not in failed_days]
+    for day in days:
+        print(f"{day} 分钟线已写入，共{written[day]}行")
+    print(f"分钟线抓取完成：{len(codes)}只股票，失败{failed}只，耗时{round(time.perf_counter() - start, 1)}秒")
+    return days
+
+
+def list_days():
+    """
+    :return: 本地已有分钟线的交易日，升序
+    """
+    if not os.path.isdir(MINUTE_DIR):
+        return []
+    return sorted(datetime.date.fromisoformat(name[5:]) for name in os.listdir(MINUTE_DIR)
+                  if name.startswith('date=') and os.path.exists(os.path.join(MINUTE_DIR, name, 'part-0.parquet')))
+
+
+def _to_arrays(table, fields):
+    arrays = {'time': np.ascontiguousarray(table.column('time').to_numpy())}
+    for field in fields:
+        column = table.column(field)
+        if field == 'volume':
+            column = pc.fill_null(column, 0)
+        arrays[field] = np.ascontiguousarray(column.to_numpy())
+    return arrays
+
+
+def read_day(date, fields=FIELDS):
+    """
+    读取一个交易日全市场的分钟线，每个字段一个连续的numpy数组。
+    行按(code, time)排序，第i只股票的行是 [offsets[i], offsets[i+1])。
+    :return: dict，codes为股票代码数组，offsets为长度len(codes)+1的int64数组，time为datetime64[s]，其余为字段数组；
+             当天没有数据时返回None
+    """
+    path = _day_file(date)
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path, columns=['code', 'time'] + list(fields), schema=SCHEMA)
+    codes = table.column('code').to_numpy(zero_copy_only=False)
+    # 分区内已按code排序，找出每只股票的起始行
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    arrays = _to_arrays(table, fields)
+    arrays['codes'] = codes[starts]
+    arrays['offsets'] = np.r_[starts, len(codes)].astype(np.int64)
+    return arrays
+
+
+def read_symbol(code, start_date=None, end_date=None, fields=FIELDS):
+    """
+    读取一只股票在[start_date, end_date]之间的分钟线，按时间升序拼接为连续的numpy数组。
+    :return: dict，time为datetime64[s]，其余为字段数组；没有数据时数组长度为0
+    """
+    days = list_days()
+    if start_date is not None:
+        days = [d for d in days if d >= pd.Timestamp(start_date).date()]
+    if end_date is not None:
+        days = [d for d in days if d <= pd.Timestamp(end_date).date()]
+    code = str(code).zfill(6)
+    tables = []
+    for day in days:
+        # 按code过滤，只解码命中的行组
+        table = pq.read_table(_day_file(day), columns=['time'] + list(fields), schema=SCHEMA,
+                              filters=[('code', '=', code)])
+        if table.num_rows:
+            tables.append(table)
+    if not tables:
+        return _to_arrays(SCHEMA.empty_table(), fields)
+    return _to_arrays(pa.concat_tables(tables).combine_chunks(), fields)
+
+
+if __name__ == "__main__":
+    collect_minute_bars()
+    days = list_days()
+    if days:
+        day = read_day(days[-1])
+        print(len(day['codes']), day['close'][:5])
+        print(read_symbol('000001', days[0], days[-1])['close'][:5])
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import shutil
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+from core.trade_calendar import get_calendar, refresh_calendar
+
+# 股票 × 交易日 的稠密价格矩阵，每个字段一个float32的.npy文件，以memmap方式打开。
+# 日线任务、Streamlit和AI脚本等多个进程共享同一份操作系统页缓存，读取时没有反序列化开销。
+PANEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'panel', 'daily_bar')
+FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+# 预留的空行数，新上市股票直接写入空行，不需要重建矩阵
+SPARE_ROWS = 512
+
+_META_FILE = 'meta.json'
+_DATES_FILE = 'dates.npy'
+
+
+def _trade_dates(start_date, bar_dates=None):
+    # 列对齐到交易日历；日历中已发布的未来交易日也预先分配好列，之后按日原地写入。
+    # 日线数据中晚于日历最后一天的日期（日历尚未更新到新一年）也分配列。
+    calendar = get_calendar()
+    if calendar is None:
+        raise ValueError("交易日历不可用：没有本地缓存且抓取失败，无法生成价格矩阵")
+    start = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+    dates = calendar.between(start, calendar.dates[-1])
+    if bar_dates is not None and len(bar_dates):
+        days = pd.to_datetime(pd.Series(bar_dates)).values.astype('datetime64[D]')
+        dates = np.union1d(dates, days[days > calendar.dates[-1]])
+    if len(dates) == 0:
+        raise ValueError(f"{start}之后没有交易日，无法生成价格矩阵")
+    return dates.copy()
+
+
+def _write_meta(path, codes):
+    tmp_path = os.path.join(path, f'.{_META_FILE}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'codes': codes, 'fields': list(FIELDS)}, f)
+    os.replace(tmp_path, os.path.join(path, _META_FILE))
+
+
+def _fill(panels, df, code_index, dates):
+    if len(dates) == 0:
+        raise ValueError("价格矩阵没有交易日列")
+    rows = df['code'].map(code_index).fillna(-1).astype(int).to_numpy()
+    days = pd.to_datetime(df['date']).values.astype('datetime64[D]')
+    cols = np.minimum(np.searchsorted(dates, days), len(dates) - 1)
+    # 只写入代码已分配行、日期在交易日历内的数据
+    valid = (rows >= 0) & (dates[cols] == days)
+    for field in FIELDS:
+        values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float32)
+        panels[field][rows[valid], cols[valid]] = values[valid]
+
+
+def build_price_panel(start_date, end_date=None, bars=None):
+    """
+    从日线数据生成价格矩阵，停牌或未上市的日期为NaN。
+    :param start_date: 矩阵第一列对应的日期
+    :param end_date: 读取日线数据的截止日期，矩阵列会一直分配到交易日历的最后一天
+    :param bars: 已读好的日线DataFrame；为None时从本地Parquet镜像读取
+    :return: PricePanel
+    """
+    if bars is None:
+        from core.daily_bar_parquet import read_bars
+        bars = read_bars(start_date=start_date, end_date=end_date, columns=list(FIELDS))
+    dates = _trade_dates(start_date, bars['date'].unique())
+    codes = sorted(bars['code'].astype(str).str.zfill(6).unique().tolist())
+    code_index = {code: i for i, code in enumerate(codes)}
+    bars = bars.assign(code=bars['code'].astype(str).str.zfill(6))
+
+    # 先写到临时目录，完成后整体替换，读方不会看到写了一半的矩阵
+    tmp_dir = f'{PANEL_DIR}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    shape = (len(codes) + SPARE_ROWS, len(dates))
+    panels = {field: np.lib.format.open_memmap(os.path.join(tmp_dir, f'{field}.npy'), mode='w+',
+                                               dtype=np.float32, shape=shape) for field in FIELDS}
+    for field in FIELDS:
+        panels[field][:] = np.nan
+    _fill(panels, bars, code_index, dates)
+    for field in FIELDS:
+        panels[field].flush()
+    del panels
+    np.save(os.path.join(tmp_dir, _DATES_FILE), dates)
+    _write_meta(tmp_dir, codes)
+
+    old_dir = f'{PANEL_DIR}.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(PANEL_DIR):
+        os.replace(PANEL_DIR, old_dir)
+    os.replace(tmp_dir, PANEL_DIR)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"价格矩阵已生成：{len(codes)}只股票 × {len(dates)}个交易日 → {PANEL_DIR}")
+    return PricePanel()
+
+
+def append_day(date, bars):
+    """
+    把某个交易日的日线原地写入矩阵对应的列，新股票写入预留的空行。
+    :param date: 交易日
+    :param bars: 当天的日线DataFrame，包含code和FIELDS中的列
+    :return: 写入的股票数
+    """
+    panel = PricePanel(mode='r+')
+    col = panel.date_loc(date)
+    if col is None:
+        logging.error(f"price_panel.append_day处理异常：{date}不在矩阵的交易日历范围内，需要重新build_price_panel")
+        return 0
+    codes = bars['code'].astype(str).str.zfill(6)
+    new_codes = sorted(set(codes) - set(panel.code_index))
+    if new_codes:
+        if len(panel.codes) + len(new_codes) > panel.capacity:
+            logging.error("price_panel.append_day处理异常：预留行不足，需要重新build_price_panel")
+            return 0
+        panel.codes.extend(new_codes)
+        panel.code_index.update({code: len(panel.code_index) + i for i, code in enumerate(new_codes)})
+    df = bars.assign(code=codes, date=date)
+    _fill({field: panel.field(field) for field in FIELDS}, df, panel.code_index, panel.dates)
+    panel.flush()
+    if new_codes:
+        _write_meta(PANEL_DIR, panel.codes)
+    return len(df)
+
+
+# 日线任务调用：把本地Parquet镜像中[start_date, end_date]的数据逐日写入矩阵。
+# 数据日期超出矩阵最后一列时（建矩阵时的交易日历只到当年年底），用刷新后的日历重建矩阵。
+def sync_price_panel(start_date, end_date):
+    if not os.path.isdir(PANEL_DIR):
+        print("价格矩阵不存在，跳过同步，请先执行build_price_panel")
+        return 0
+    from core.daily_bar_parquet import read_bars
+    bars = read_bars(start_date=start_date, end_date=end_date, columns=list(FIELDS))
+    if bars.empty:
+        return 0
+    panel = PricePanel()
+    first_date, last_date = panel.dates[0], panel.dates[-1]
+    del panel
+    latest = np.datetime64(pd.Timestamp(bars['date'].max()).date(), 'D')
+    if latest > last_date:
+        print(f"{latest}超出价格矩阵的最后一个交易日{last_date}，按新的交易日历重建价格矩阵")
+        calendar = get_calendar()
+        if calendar is None or calendar.dates[-1] < latest:
+            refresh_calendar()
+        build_price_panel(first_date)
+        return len(bars)
+    count = 0
+    for date, df in bars.groupby('date'):
+        count += append_day(date, df)
+    return count
+
+
+class PricePanel:
+    """
+    只读（或r+）打开的价格矩阵。
+    field(name) 返回 (股票数, 交易日数) 的np.memmap视图，行号见code_index，列号见dates。
+    """
+
+    def __init__(self, path=PANEL_DIR, mode='r'):
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, _META_FILE), encoding='utf-8') as f:
+            self.codes = json.load(f)['codes']
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        self.dates = np.load(os.path.join(path, _DATES_FILE))
+        self._panels = {}
+
+    def field(self, name):
+        panel = self._panels.get(name)
+        if panel is None:
+            panel = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode=self.mode)
+            self._panels[name] = panel
+        return panel
+
+    @property
+    def capacity(self):
+        return self.field(FIELDS[0]).shape[0]
+
+    def date_loc(self, date):
+        d = np.datetime64(pd.Timestamp(date).date(), 'D')
+        i = int(np.searchsorted(self.dates, d))
+        if i < len(self.dates) and self.dates[i] == d:
+            return i
+        return None
+
+    def window(self, name, start_date, end_date):
+        """
+        取[start_date, end_date]之间的列，返回(只含已有股票行的矩阵视图, 对应的日期)，不复制数据。
+        """
+        lo = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date).date(), 'D'), 'left'))
+        hi = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_date).date(), 'D'), 'right'))
+        return self.field(name)[:len(self.codes), lo:hi], self.dates[lo:hi]
+
+    def flush(self):
+        for panel in self._panels.values():
+            if isinstance(panel, np.memmap):
+                panel.flush()
+
+
+def load_price_panel():
+    return PricePanel()
+
+
+if __name__ == "__main__":
+    build_price_panel(datetime.date(2024, 1, 1))
+    panel = load_price_panel()
+    close, dates = panel.window('close', '2025-06-01', '2025-06-30')
+    print(close.shape, dates[:5])
@@ -2,17 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import logging
-import core.stockfetch as stf
 from core.singleton_type import singleton_type
+from core.trade_calendar import get_calendar
 
 
-# 读取股票交易日历数据
+# 读取股票交易日历数据，由core.trade_calendar从本地缓存加载并在后台刷新
 class stock_trade_date(metaclass=singleton_type):
     def __init__(self):
+        self.data = None
+
+    def get_data(self):
         try:
-            self.data = stf.fetch_stocks_trade_date()
+            calendar = get_calendar()
+            return calendar.date_set if calendar is not None else None
         except Exception as e:
             logging.error(f"singleton.stock_trade_date处理异常：{e}")
-
-    def get_data(self):
-        return self.data
+            return None
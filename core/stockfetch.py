@@ -12,6 +12,9 @@ import core.tablestructure as tbs
 import core.database as mdb
 import core.trade_date_hist as tdh
 
+# cn_stock_spot、cn_etf_spot表在stock_hist库（原先由导入时改写core.database默认库决定）
+hist_db = mdb.Database("stock_hist")
+
 # 600 601 603 605开头的股票是上证A股
 # 600开头的股票是上证A股，属于大盘股，其中6006开头的股票是最早上市的股票，
 # 6016开头的股票为大盘蓝筹股；900开头的股票是上证B股；
@@ -97,16 +100,9 @@ def save_nph_stock_spot_data(date):
         if data is None or len(data.index) == 0:
             return
 
-        table_name = tbs.TABLE_CN_STOCK_SPOT['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_SPOT['columns'])
-
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        # 表结构按定义建一次，之后按主键(date, code)批量覆盖写入，重跑当天数据不需要先删除。
+        hist_db.create_table_from_structure(tbs.TABLE_CN_STOCK_SPOT, "`date`,`code`")
+        hist_db.bulk_insert_db_from_df(data, tbs.TABLE_CN_STOCK_SPOT['name'], mdb.BULK_UPSERT)
 
     except Exception as e:
         logging.error(f"basic_data_daily_job.save_stock_spot_data处理异常：{e}")
@@ -120,16 +116,8 @@ def save_nph_etf_spot_data(date):
         if data is None or len(data.index) == 0:
             return
 
-        table_name = tbs.TABLE_CN_ETF_SPOT['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_ETF_SPOT['columns'])
-
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        hist_db.create_table_from_structure(tbs.TABLE_CN_ETF_SPOT, "`date`,`code`")
+        hist_db.bulk_insert_db_from_df(data, tbs.TABLE_CN_ETF_SPOT['name'], mdb.BULK_UPSERT)
     except Exception as e:
         logging.error(f"basic_data_daily_job.save_nph_etf_spot_data处理异常：{e}")
 
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from sqlalchemy import DATE, VARCHAR, FLOAT, BIGINT, SmallInteger, DATETIME
+from sqlalchemy import DATE, VARCHAR, FLOAT, BIGINT, SmallInteger, DATETIME, DOUBLE
 _COLLATE = "utf8mb4_general_ci"
 
 
@@ -94,6 +94,38 @@ TABLE_CN_BAOSTOCK_CODE_MAP = {
 }
 
 
+# 全市场日线行情长表（替代 stock_hist 库中按股票代码一张表的方式）
+# 主键 (date, code) 即 InnoDB 聚簇索引，按日期区间扫描全市场时为一次索引范围扫描。
+TABLE_CN_DAILY_BAR = {
+    'name': 'daily_bar',
+    'cn': '日线行情',
+    'columns': {
+        'code': {'type': VARCHAR(6, _COLLATE), 'cn': '代码', 'size': 60},
+        'date': {'type': DATE, 'cn': '日期', 'size': 0},
+        'open': {'type': FLOAT, 'cn': '开盘价', 'size': 70},
+        'high': {'type': FLOAT, 'cn': '最高价', 'size': 70},
+        'low': {'type': FLOAT, 'cn': '最低价', 'size': 70},
+        'close': {'type': FLOAT, 'cn': '收盘价', 'size': 70},
+        'volume': {'type': BIGINT, 'cn': '成交量', 'size': 90},
+        'amount': {'type': DOUBLE, 'cn': '成交额', 'size': 100},
+        'adjustflag': {'type': SmallInteger, 'cn': '复权类型', 'size': 0}
+    }
+}
+
+
+# 历史数据同步水位表，主键 (code, source)：记录每个代码在每个数据源上已成功入库的最后日期
+TABLE_CN_SYNC_WATERMARK = {
+    'name': 'cn_sync_watermark',
+    'cn': '历史数据同步水位',
+    'columns': {
+        'code': {'type': VARCHAR(6, _COLLATE), 'cn': '代码', 'size': 60},
+        'source': {'type': VARCHAR(20, _COLLATE), 'cn': '数据源', 'size': 80},
+        'last_date': {'type': DATE, 'cn': '最后入库日期', 'size': 0},
+        'updated_at': {'type': DATETIME, 'cn': '更新时间', 'size': 0}
+    }
+}
+
+
 def get_field_types(cols):
     data = {}
     for k in cols:
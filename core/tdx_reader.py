@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+# 通达信本地数据文件的向量化读取：.day（日线）和.lc1/.lc5（1分钟/5分钟线）都是32字节定长记录，
+# 直接以numpy结构化dtype做memmap，读取最近N条只访问文件末尾的几页，不需要解析全部历史。
+# 价格和成交量的换算系数与mootdx（pytdx）的日线读取一致，返回的DataFrame可以直接替换reader.daily()的结果。
+DAY_DTYPE = np.dtype([('date', '<u4'), ('open', '<u4'), ('high', '<u4'), ('low', '<u4'), ('close', '<u4'),
+                      ('amount', '<f4'), ('volume', '<u4'), ('reserved', '<u4')])
+LC_DTYPE = np.dtype([('date', '<u2'), ('minutes', '<u2'), ('open', '<f4'), ('high', '<f4'), ('low', '<f4'),
+                     ('close', '<f4'), ('amount', '<f4'), ('volume', '<u4'), ('reserved', '<u4')])
+FIELDS = ('open', 'high', 'low', 'close', 'amount', 'volume')
+
+# (价格系数, 成交量系数)，按 市场+代码前两位 区分证券类别
+_COEFFICIENTS = {
+    'index': (0.01, 1.0),
+    'fund': (0.001, 1.0),
+    'bond': (0.001, 1.0),
+    'stock': (0.01, 0.01),
+    'sh_b_stock': (0.001, 0.01),
+    'sz_fund': (0.001, 0.01),
+    'sz_bond': (0.001, 0.01),
+}
+
+
+def _security_type(symbol):
+    market, head = symbol[:2], symbol[2:4]
+    if market == 'sh':
+        if head in ('00', '88', '99'):
+            return 'index'
+        if head in ('50', '51'):
+            return 'fund'
+        if head == '90':
+            return 'sh_b_stock'
+        if head in ('10', '11', '12', '13', '14'):
+            return 'bond'
+    elif market == 'sz':
+        if head == '39':
+            return 'index'
+        if head in ('15', '16'):
+            return 'sz_fund'
+        if head in ('10', '11', '12', '13', '14'):
+            return 'sz_bond'
+    return 'stock'
+
+
+def normalize_symbol(symbol):
+    """
+    600000 / sh600000 / 600000.SH 统一为 sh600000
+    """
+    symbol = str(symbol).strip().lower()
+    if symbol[:2] in ('sh', 'sz', 'bj') and symbol[2:].isdigit():
+        return symbol
+    if '.' in symbol:
+        code, market = symbol.split('.', 1)
+        return market + code
+    if symbol.startswith(('5', '6', '9', '88', '99')):
+        return 'sh' + symbol
+    if symbol.startswith(('4', '8', '92')):
+        return 'bj' + symbol
+    return 'sz' + symbol
+
+
+def _path(tdx_dir, symbol, folder, ext):
+    return os.path.join(tdx_dir, 'vipdoc', symbol[:2], folder, f'{symbol}.{ext}')
+
+
+def _records(path, dtype, tail=None):
+    size = os.path.getsize(path)
+    count = size // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    records = np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+    if tail is not None:
+        records = records[-tail:] if tail > 0 else records[:0]
+    # 复制出来，不持有文件映射，通达信盘后更新文件时不受影响
+    return np.array(records)
+
+
+def _day_dates(raw):
+    raw = raw.astype(np.int64)
+    years, months, days = raw // 10000, raw // 100 % 100, raw % 100
+    return (years - 1970).astype('datetime64[Y]') + (months - 1).astype('timedelta64[M]') + \
+        (days - 1).astype('timedelta64[D]')
+
+
+def read_day_records(symbol, tdx_dir, tail=None):
+    """
+    读取日线，返回按日期升序的连续numpy数组。
+    :param symbol: 股票或指数代码，如 600000、sh600000
+    :param tdx_dir: 通达信安装目录
+    :param tail: 只读最近tail条，None为全部
+    :return: dict，date为datetime64[D]，open/high/low/close/amount/volume为float64；文件不存在时返回None
+    """
+    symbol = normalize_symbol(symbol)
+    path = _path(tdx_dir, symbol, 'lday', 'day')
+    if not os.path.exists(path):
+        return None
+    records = _records(path, DAY_DTYPE, tail)
+    price, volume = _COEFFICIENTS[_security_type(symbol)]
+    arrays = {'date': _day_dates(records['date']).astype('datetime64[D]')}
+    for field in ('open', 'high', 'low', 'close'):
+        arrays[field] = records[field] * price
+    arrays['amount'] = records['amount'].astype(np.float64)
+    arrays['volume'] = records['volume'] * volume
+    return arrays
+
+
+def read_day(symbol, tdx_dir, tail=None):
+    """
+    与mootdx的reader.daily(symbol)结果相同的DataFrame：以date为索引，列为open/high/low/close/amount/volume。
+    :param tail: 只读最近tail条，None为全部
+    :return: DataFrame；文件不存在时返回None
+    """
+    arrays = read_day_records(symbol, tdx_dir, tail)
+    if arrays is None:
+        return None
+    df = pd.DataFrame({field: arrays[field] for field in FIELDS},
+                      index=pd.DatetimeIndex(arrays['date'].astype('datetime64[ns]'), name='date'))
+    return df
+
+
+def read_lc(symbol, tdx_dir, freq=1, tail=None):
+    """
+    读取1分钟（.lc1，minline目录）或5分钟（.lc5，fzline目录）线。
+    :param freq: 1或5
+    :return: 以datetime为索引的DataFrame，列为open/high/low/close/amount/volume；文件不存在时返回None
+    """
+    symbol = normalize_symbol(symbol)
+    folder = 'minline' if freq == 1 else 'fzline'
+    path = _path(tdx_dir, symbol, folder, f'lc{freq}')
+    if not os.path.exists(path):
+        return None
+    records = _records(path, LC_DTYPE, tail)
+    raw = records['date'].astype(np.int64)
+    years, months, days = raw // 2048 + 2004, raw % 2048 // 100, raw % 2048 % 100
+    dates = (years - 1970).astype('datetime64[Y]') + (months - 1).astype('timedelta64[M]') + \
+        (days - 1).astype('timedelta64[D]')
+    times = dates.astype('datetime64[m]') + records['minutes'].astype('timedelta64[m]')
+    df = pd.DataFrame({field: records[field].astype(np.float64) for field in FIELDS},
+                      index=pd.DatetimeIndex(times.astype('datetime64[ns]'), name='datetime'))
+    return df
+
+
+def list_symbols(tdx_dir, markets=('sh', 'sz'), prefixes=None):
+    """
+    列出lday目录下的全部代码，如 sh600000。
+    :param prefixes: 只保留去掉市场前缀后以这些前缀开头的代码
+    """
+    symbols = []
+    for market in markets:
+        lday_dir = os.path.join(tdx_dir, 'vipdoc', market, 'lday')
+        if not os.path.isdir(lday_dir):
+            continue
+        for name in os.listdir(lday_dir):
+            symbol, ext = os.path.splitext(name)
+            if ext != '.day' or not symbol.startswith(market) or not symbol[2:].isdigit():
+                continue
+            if prefixes is None or symbol[2:].startswith(tuple(prefixes)):
+                symbols.append(symbol)
+    return sorted(symbols)
+
+
+def load_lday_panel(tdx_dir, markets=('sh', 'sz'), prefixes=None, tail=None, fields=FIELDS):
+    """
+    把整个 vipdoc/{sh,sz}/lday 目录读成一个 代码 × 交易日 的面板，缺失值为NaN。
+    :param prefixes: 只读这些前缀的代码，如('300', '301')
+    :param tail: 每个文件只读最近tail条，None为全部历史
+    :return: dict，symbols为代码数组，dates为datetime64[D]数组，每个字段为(len(symbols), len(dates))的float64矩阵
+    """
+    symbols = list_symbols(tdx_dir, markets, prefixes)
+    loaded = []
+    for symbol in symbols:
+        try:
+            arrays = read_day_records(symbol, tdx_dir, tail)
+        except Exception as e:
+            logging.error(f"tdx_reader.load_lday_panel处理异常：{symbol}{e}")
+            continue
+        if arrays is not None and len(arrays['date']):
+            loaded.append((symbol, arrays))
+    if not loaded:
+        return {'symbols': np.array([], dtype=str), 'dates': np.array([], dtype='datetime64[D]'),
+                **{field: np.empty((0, 0)) for field in fields}}
+    dates = np.unique(np.concatenate([arrays['date'] for _, arrays in loaded]))
+    panel = {'symbols': np.array([symbol for symbol, _ in loaded]), 'dates': dates}
+    for field in fields:
+        panel[field] = np.full((len(loaded), len(dates)), np.nan)
+    for row, (_, arrays) in enumerate(loaded):
+        cols = np.searchsorted(dates, arrays['date'])
+        for field in fields:
+            panel[field][row, cols] = arrays[field]
+    return panel
+
+
+if __name__ == "__main__":
+    print(read_day('600036', '/mnt/c/new_tdx', tail=5))
+    panel = load_lday_panel('/mnt/c/new_tdx', tail=60)
+    print(len(panel['symbols']), panel['dates'][-5:])
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import datetime
+import threading
+import numpy as np
+
+# 交易日历：升序的datetime64[D]数组，另外按“距第一个交易日的天数”建一张序号表，
+# 是否交易日、前后第n个交易日、最近n个交易日区间都是O(1)查表，并提供对日期数组的向量化版本。
+# 日历持久化在 data/cache/trade_calendar.npy，进程启动时直接读文件，不再每个进程都执行一次新浪日历的JS解码；
+# 后台线程定期检查：文件被其他进程更新时重新加载，文件超过REFRESH_INTERVAL未更新时重新抓取，
+# 常驻的调度进程不用重启就能用上新发布的日历。
+CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'cache',
+                          'trade_calendar.npy')
+REFRESH_INTERVAL = 24 * 3600
+CHECK_INTERVAL = 3600
+
+_calendar = None
+_calendar_mtime = None
+_lock = threading.Lock()
+_refresher = None
+
+
+def _to_day(date):
+    if isinstance(date, np.datetime64):
+        return date.astype('datetime64[D]')
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return np.datetime64(date, 'D')
+
+
+class TradeCalendar:
+
+    def __init__(self, dates):
+        self.dates = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+        self._first = self.dates[0]
+        span = int((self.dates[-1] - self._first).astype(int)) + 1
+        self._is_trade = np.zeros(span, dtype=bool)
+        self._is_trade[(self.dates - self._first).astype(int)] = True
+        # _floor[k]：第一个交易日之后第k天（含）之前最近一个交易日在dates中的下标
+        self._floor = np.cumsum(self._is_trade) - 1
+        self._date_set = None
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def date_set(self):
+        # 兼容stock_trade_date().get_data()返回的datetime.date集合
+        if self._date_set is None:
+            self._date_set = set(self.dates.astype(object))
+        return self._date_set
+
+    def _days(self, dates):
+        return (np.asarray(dates, dtype='datetime64[D]') - self._first).astype(np.int64)
+
+    def _floor_index(self, days):
+        # 早于日历起点为-1，晚于日历终点为最后一个交易日
+        return np.where(days < 0, -1, self._floor[np.clip(days, 0, len(self._floor) - 1)])
+
+    def _is_trade_days(self, days):
+        inside = (days >= 0) & (days < len(self._is_trade))
+        return inside & self._is_trade[np.clip(days, 0, len(self._is_trade) - 1)]
+
+    def _offset_index(self, days, n):
+        idx = self._floor_index(days)
+        if n < 0:
+            # 非交易日的floor已经是“前一个交易日”
+            idx = idx + n + (~self._is_trade_days(days))
+        else:
+            idx = idx + n
+        return idx
+
+    def is_trade_day(self, date):
+        days = int((_to_day(date) - self._first).astype(int))
+        return 0 <= days < len(self._is_trade) and bool(self._is_trade[days])
+
+    def is_trade_days(self, dates):
+        """
+        向量化的is_trade_day
+        :return: bool数组
+        """
+        return self._is_trade_days(self._days(dates))
+
+    def offset(self, date, n):
+        """
+        从date起第n个交易日：n>0向后，n<0向前（不含date本身），n=0时date是交易日返回date，否则返回之前最近的交易日。
+        :return: datetime.date；超出日历范围时为None
+        """
+        idx = int(self._offset_index(self._days([_to_day(date)]), n)[0])
+        if idx < 0 or idx >= len(self.dates):
+            return None
+        return self.dates[idx].astype(object)
+
+    def offsets(self, dates, n):
+        """
+        向量化的offset
+        :return: datetime64[D]数组，超出日历范围的为NaT
+        """
+        idx = self._offset_index(self._days(dates), n)
+        valid = (idx >= 0) & (idx < len(self.dates))
+        result = np.full(len(idx), np.datetime64('NaT'), dtype='datetime64[D]')
+        result[valid] = self.dates[idx[valid]]
+        return result
+
+    def previous(self, date):
+        return self.offset(date, -1)
+
+    def next(self, date):
+        return self.offset(date, 1)
+
+    def range(self, date, n):
+        """
+        截止到date（非交易日取之前最近的交易日）的最近n个交易日
+        :return: (start_date, end_date)，datetime.date；日历不足n天时start_date为日历第一天
+        """
+        end = int(self._floor_index(self._days([_to_day(date)]))[0])
+        if end < 0:
+            return None
+        start = max(0, end - n + 1)
+        return self.dates[start].astype(object), self.dates[end].astype(object)
+
+    def between(self, start_date, end_date):
+        """
+        [start_date, end_date]之间的全部交易日，返回datetime64[D]数组视图
+        """
+        lo = np.searchsorted(self.dates, _to_day(start_date), 'left')
+        hi = np.searchsorted(self.dates, _to_day(end_date), 'right')
+        return self.dates[lo:hi]
+
+
+def _fetch_dates():
+    # 新浪日历需要执行JS解码，只在刷新时才导入
+    import core.stockfetch as stf
+    dates = stf.fetch_stocks_trade_date()
+    if not dates:
+        return None
+    return np.array(sorted(dates), dtype='datetime64[D]')
+
+
+def _save(dates):
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp_path = f'{CACHE_FILE}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, dates)
+    os.replace(tmp_path, CACHE_FILE)
+
+
+def _load_file():
+    global _calendar, _calendar_mtime
+    mtime = os.path.getmtime(CACHE_FILE)
+    _calendar = TradeCalendar(np.load(CACHE_FILE))
+    _calendar_mtime = mtime
+
+
+def refresh_calendar():
+    """
+    重新抓取交易日历并替换缓存文件和当前进程的日历
+    :return: 新的TradeCalendar；抓取失败时返回原有日历
+    """
+    global _calendar, _calendar_mtime
+    try:
+        dates = _fetch_dates()
+    except Exception as e:
+        logging.error(f"trade_calendar.refresh_calendar处理异常：{e}")
+        dates = None
+    if dates is None or len(dates) == 0:
+        return _calendar
+    calendar = TradeCalendar(dates)
+    try:
+        _save(calendar.dates)
+        _calendar_mtime = os.path.getmtime(CACHE_FILE)
+    except Exception as e:
+        logging.error(f"trade_calendar._save处理异常：{e}")
+    _calendar = calendar
+    return calendar
+
+
+def _check():
+    global _calendar_mtime
+    try:
+        mtime = os.path.getmtime(CACHE_FILE) if os.path.exists(CACHE_FILE) else None
+        if mtime is None or time.time() - mtime >= REFRESH_INTERVAL:
+            with _lock:
+                refresh_calendar()
+            # 抓取失败时也等下一个检查周期再试
+            if mtime is not None and _calendar_mtime == mtime:
+                return
+        elif mtime != _calendar_mtime:
+            with _lock:
+                _load_file()
+    except Exception as e:
+        logging.error(f"trade_calendar._check处理异常：{e}")
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(CHECK_INTERVAL)
+        _check()
+
+
+def _start_refresher():
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name='trade_calendar_refresh', daemon=True)
+        _refresher.start()
+
+
+def get_calendar():
+    """
+    当前进程的交易日历。首次调用时读缓存文件（没有则抓取），并启动后台刷新线程。
+    :return: TradeCalendar；没有缓存且抓取失败时为None
+    """
+    if _calendar is not None:
+        return _calendar
+    with _lock:
+        if _calendar is None:
+            try:
+                if os.path.exists(CACHE_FILE):
+                    _load_file()
+                    if time.time() - _calendar_mtime >= REFRESH_INTERVAL:
+                        # 先用旧日历，后台线程马上刷新
+                        threading.Thread(target=_check, daemon=True).start()
+                else:
+                    refresh_calendar()
+            except Exception as e:
+                logging.error(f"trade_calendar.get_calendar处理异常：{e}")
+            _start_refresher()
+    return _calendar
+
+
+if __name__ == "__main__":
+    calendar = get_calendar()
+    today = datetime.date.today()
+    print(len(calendar), calendar.is_trade_day(today), calendar.previous(today), calendar.next(today))
+    print(calendar.range(today, 5))
@@ -3,40 +3,38 @@
 
 import datetime
 from core.singleton_trade_date import stock_trade_date
+from core.trade_calendar import get_calendar
 
 
 def is_trade_date(date=None):
-    trade_date = stock_trade_date().get_data()
-    if trade_date is None:
-        return False
-    if date in trade_date:
-        return True
-    else:
+    calendar = get_calendar()
+    if calendar is None or date is None:
         return False
+    return calendar.is_trade_day(date)
 
 
 def get_previous_trade_date(date):
-    trade_date = stock_trade_date().get_data()
-    if trade_date is None:
+    calendar = get_calendar()
+    if calendar is None:
         return date
-    tmp_date = date
-    while True:
-        tmp_date += datetime.timedelta(days=-1)
-        if tmp_date in trade_date:
-            break
-    return tmp_date
+    return calendar.previous(date) or date
 
 
 def get_next_trade_date(date):
-    trade_date = stock_trade_date().get_data()
-    if trade_date is None:
+    calendar = get_calendar()
+    if calendar is None:
         return date
-    tmp_date = date
-    while True:
-        tmp_date += datetime.timedelta(days=1)
-        if tmp_date in trade_date:
-            break
-    return tmp_date
+    return calendar.next(date) or date
+
+
+def get_trade_date_offset(date, n):
+    """
+    date之后（n>0）或之前（n<0）的第n个交易日，超出日历范围时返回None
+    """
+    calendar = get_calendar()
+    if calendar is None:
+        return None
+    return calendar.offset(date, n)
 
 
 OPEN_TIME = (
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import logging
 from datetime import datetime
 from apscheduler.schedulers.blocking import BlockingScheduler
 import core.trade_time as tt
@@ -44,17 +45,17 @@ def get_recent_trade_range(date, n=30):
     """
     获取最近n个交易日区间，返回(start_date_str, end_date_str)
     start_date为今天（如非交易日则为最近一个交易日），end_date为start_date往前推n个交易日。
+    交易日历不可用（没有缓存且抓取失败）或date早于日历起点时抛出ValueError。
     """
-    if not tt.is_trade_date(date):
-        end_date = tt.get_previous_trade_date(date)
-    else:
-        end_date = date
-    trade_dates = list(sorted(tt.stock_trade_date().get_data())) 
-    idx = trade_dates.index(end_date)
-    if idx < n:
-        start_date = trade_dates[0]
-    else:
-        start_date = trade_dates[idx - n + 1]
+    calendar = tt.get_calendar()
+    if calendar is None:
+        logging.error(f"utils.get_recent_trade_range处理异常：交易日历不可用，无法计算{date}之前{n}个交易日")
+        raise ValueError("交易日历不可用：没有本地缓存且抓取失败")
+    trade_range = calendar.range(date, n)
+    if trade_range is None:
+        logging.error(f"utils.get_recent_trade_range处理异常：{date}早于交易日历起点{calendar.dates[0]}")
+        raise ValueError(f"{date}早于交易日历起点{calendar.dates[0]}")
+    start_date, end_date = trade_range
     start_date_str = start_date.strftime('%Y-%m-%d')
     end_date_str = end_date.strftime('%Y-%m-%d')
     return start_date_str, end_date_str
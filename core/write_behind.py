@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import logging
+import threading
+import time
+import pandas as pd
+import core.database as mdb
+
+# 盘中时间序列数据的后写缓冲：任意线程put()只把行放进内存，按主键合并（同一主键只保留最后一次的值），
+# 后台线程在攒够max_rows行或距上次写入超过flush_interval秒时批量upsert，进程退出时写完剩余数据。
+# 缓冲区满（max_pending）时put()最多等待put_timeout秒，超时则丢弃该行，等待和丢弃都计入统计。
+
+
+class WriteBehindBuffer:
+
+    def __init__(self, table_name, primary_keys, to_db=None, max_rows=500, flush_interval=5.0,
+                 max_pending=10000, put_timeout=1.0):
+        self.table_name = table_name
+        self.primary_keys = mdb._split_keys(primary_keys)
+        self.to_db = to_db
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._last_flush = time.monotonic()
+        self._stats = {'puts': 0, 'coalesced': 0, 'flushes': 0, 'flushed_rows': 0, 'failed_flushes': 0,
+                       'blocked_puts': 0, 'blocked_seconds': 0.0, 'dropped': 0, 'max_pending': 0,
+                       'last_flush_seconds': 0.0}
+        self._thread = threading.Thread(target=self._run, name=f'write_behind_{table_name}', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, row):
+        """
+        放入一行。
+        :param row: dict，需包含主键列
+        :return: 是否放入成功；缓冲区满且等待超时、或已关闭时为False
+        """
+        key = tuple(row[k] for k in self.primary_keys)
+        with self._cond:
+            if self._closed:
+                self._stats['dropped'] += 1
+                return False
+            if key not in self._pending and len(self._pending) >= self.max_pending:
+                # 背压：等待后台线程写出数据腾出空间
+                self._stats['blocked_puts'] += 1
+                start = time.monotonic()
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: len(self._pending) < self.max_pending or self._closed,
+                                    self.put_timeout)
+                self._stats['blocked_seconds'] += time.monotonic() - start
+                if len(self._pending) >= self.max_pending or self._closed:
+                    self._stats['dropped'] += 1
+                    logging.error(f"write_behind.put处理异常：{self.table_name}表缓冲区已满，丢弃{key}")
+                    return False
+            if key in self._pending:
+                self._stats['coalesced'] += 1
+            self._pending[key] = row
+            self._stats['puts'] += 1
+            self._stats['max_pending'] = max(self._stats['max_pending'], len(self._pending))
+            if len(self._pending) >= self.max_rows:
+                self._cond.notify_all()
+        return True
+
+    def flush(self):
+        """
+        立即写出当前缓冲的全部行，读表前调用可保证读到刚放入的数据。
+        :return: 写入的行数
+        """
+        # 同一时刻只有一个线程在写，保证同一主键先后两批的写入顺序
+        with self._flush_lock:
+            with self._cond:
+                rows = self._pending
+                self._pending = {}
+                self._last_flush = time.monotonic()
+                self._cond.notify_all()
+            if not rows:
+                return 0
+            start = time.monotonic()
+            count = mdb.bulk_insert_db_from_df(pd.DataFrame(list(rows.values())), self.table_name,
+                                               mdb.BULK_UPSERT, to_db=self.to_db)
+            with self._cond:
+                self._stats['last_flush_seconds'] = round(time.monotonic() - start, 3)
+                if count == 0:
+                    # 写入失败的行放回缓冲区，下次再写；期间又放入的同主键新值优先
+                    self._stats['failed_flushes'] += 1
+                    rows.update(self._pending)
+                    self._pending = rows
+                    return 0
+                self._stats['flushes'] += 1
+                self._stats['flushed_rows'] += count
+            return count
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.max_rows or
+                                    (self._pending and time.monotonic() - self._last_flush >= self.flush_interval),
+                                    self.flush_interval)
+                if self._closed:
+                    return
+                due = len(self._pending) >= self.max_rows or \
+                    (self._pending and time.monotonic() - self._last_flush >= self.flush_interval)
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logging.error(f"write_behind._run处理异常：{self.table_name}表{e}")
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def stats(self):
+        """
+        :return: dict，pending为当前缓冲行数，coalesced为被同主键新值覆盖的行数，
+                 blocked_puts/blocked_seconds为缓冲区满时put等待的次数和累计秒数，dropped为丢弃的行数
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['blocked_seconds'] = round(stats['blocked_seconds'], 3)
+        return stats
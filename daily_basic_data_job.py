@@ -5,8 +5,10 @@ from datetime import datetime
 from core.stockfetch import save_nph_etf_spot_data
 from core.stockfetch import save_nph_stock_spot_data
 from core.utils import schedule_trade_day_jobs
-from core.utils import get_recent_trade_range
-from core.crawling.stock_hist_baostock import get_all_hist_k_data_and_save
+from core.hist_sync import sync_daily_history
+from core.daily_bar_parquet import sync_daily_bar_parquet
+from core.price_panel import sync_price_panel
+from core.minute_bar import collect_minute_bars
 from dingtalk_subjob.calc_abnormal import send_abnormal_to_dingtalk
 from core.rps import RPS
 from dingtalk_subjob.rps_5_top50 import send_rps_5_top50_to_dingtalk
@@ -17,11 +19,18 @@ def job():
     #从东财抓取股票和基金的实时行情数据
     save_nph_stock_spot_data(today)
     save_nph_etf_spot_data(today)
+
+    #收盘后抓取全市场1分钟线，接口只保留最近5个交易日，需要每天落盘
+    collect_minute_bars()
     
-    #从baostock抓取股票今天的历史数据
-    start_date_str, end_date_str = get_recent_trade_range(today, 1)
-    print(start_date_str, end_date_str)
-    get_all_hist_k_data_and_save(start_date_str, end_date_str)
+    #从baostock增量抓取各股票缺失的历史数据，新上市的股票自动加入
+    synced = sync_daily_history(today)
+    if synced:
+        start_date_str, end_date_str = synced
+        print(start_date_str, end_date_str)
+        #把新增的日线同步到本地Parquet镜像，供分析任务离线读取
+        sync_daily_bar_parquet(start_date_str, end_date_str)
+        sync_price_panel(start_date_str, end_date_str)
 
     #计算异动情况
     #send_abnormal_to_dingtalk()
@@ -1,14 +1,17 @@
-import akshare as ak
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import io
 from core.dingtalk.dingtalk_usage import send_to_dingtalk
+from core.market_snapshot import get_snapshot
 
 def fetch_market_data():
     try:
-        # 使用AKShare获取A股市场现货数据
-        stock_zh_a_spot_df = ak.stock_zh_a_spot_em()
+        # 与同时触发的其他任务共用同一个全市场行情快照
+        fetched_at, stock_zh_a_spot_df = get_snapshot()
+        if fetched_at is None:
+            print("获取数据失败: 未获取到最新的全市场行情")
+            return None
         return stock_zh_a_spot_df
     except Exception as e:
         print(f"获取数据失败: {e}")
@@ -11,90 +11,85 @@ from core.dingtalk.dingtalk_usage import send_to_dingtalk
 import matplotlib.pyplot as plt
 from matplotlib.table import Table
 from core.utils import get_recent_trade_range
+from core.daily_bar import read_daily_bar
 import matplotlib
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# 代码映射表和max_rise_Nd结果表都在stock_hist库
+hist_db = mdb.Database("stock_hist")
+
+def _max_rise(closes):
+    """
+    计算序列中最大涨幅（最高价日>最低价日），返回(最大涨幅, 最低价下标, 最高价下标)。
+    遍历时记录此前的最低收盘价，一次遍历代替两两比较。
+    """
+    max_rise = None
+    min_idx = max_i = max_j = None
+    for j, close in enumerate(closes):
+        if not close > 0:
+            continue
+        if min_idx is not None:
+            rise = close / closes[min_idx] - 1
+            if max_rise is None or rise > max_rise:
+                max_rise, max_i, max_j = float(rise), min_idx, j
+        if min_idx is None or close < closes[min_idx]:
+            min_idx = j
+    return max_rise, max_i, max_j
+
 
 def calc_max_rise_from_date_to_N_day_before(date, N=30):
     """
-    读取所有表名，读取每个表内从start_date_str到end_date_str区间内的数据，
+    从日线长表一次读取区间内全市场的数据，按股票分组
     计算最大涨幅（最高价日>最低价日），保存到新生成的表max_rise_custom。
     同时保存最高价日和最低价日对应的收盘价。
     """
     start_date_str, end_date_str = get_recent_trade_range(date, N)
     print(f"计算{N}日最大涨幅，区间为（{start_date_str}, {end_date_str}]")
 
-    # 获取所有表名
-    sql = f"SELECT table_name FROM information_schema.tables WHERE table_schema='{mdb.db_database}'"
-    tables = mdb.executeSqlFetch(sql)
-    if not tables:
-        print("未获取到表名")
+    # 一次范围扫描取出区间内全市场的收盘价
+    bars = read_daily_bar(start_date_str, end_date_str, columns=["close"], left_open=True)
+    if bars.empty:
+        print("未获取到日线数据")
         return
     # 获取股票代码和名称的映射
     code_map = {}
     map_table = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-    map_rows = mdb.executeSqlFetch(f"SELECT code, name FROM `{map_table}`")
+    map_rows = hist_db.executeSqlFetch(f"SELECT code, name FROM `{map_table}`")
     if map_rows:
         code_map = {str(code): name for code, name in map_rows}
+    bars["close"] = pd.to_numeric(bars["close"], errors="coerce")
+    bars = bars.dropna(subset=["close"])
     results = []
-    for (table_name,) in tables:
-        # 只处理6位数字的表名
-        if not (isinstance(table_name, str) and len(table_name) == 6 and table_name.isdigit()):
-            continue
-        # 读取表数据，取区间（start_date_str, end_date_str]，按日期升序排列
-        sql = f"SELECT date, close FROM `{table_name}` WHERE close IS NOT NULL AND date > '{start_date_str}' AND date <= '{end_date_str}' ORDER BY date ASC"
-        rows = mdb.executeSqlFetch(sql)
-        if not rows or len(rows) < 2:
-            continue
-        df = pd.DataFrame(rows, columns=["date", "close"])
-        df["close"] = pd.to_numeric(df["close"], errors="coerce")
-        df = df.dropna(subset=["close"]).reset_index(drop=True)
+    for code, df in bars.groupby("code", sort=True):
         if len(df) < 2:
             continue
-        # 计算最大涨幅（最高价日>最低价日）
-        max_rise = -float('inf')
-        min_date = max_date = None
-        min_close = max_close = None
-        for i in range(len(df)):
-            for j in range(i+1, len(df)):
-                if df.iloc[j]['close'] > 0 and df.iloc[i]['close'] > 0:
-                    rise = df.iloc[j]['close'] / df.iloc[i]['close'] - 1
-                    if rise > max_rise:
-                        max_rise = rise
-                        min_date = df.iloc[i]['date']
-                        max_date = df.iloc[j]['date']
-                        min_close = df.iloc[i]['close']
-                        max_close = df.iloc[j]['close']
-        max_rise = max_rise if max_rise != -float('inf') else None
-        stock_name = code_map.get(table_name, "")
-        # 查询date当天的收盘价
+        max_rise, i, j = _max_rise(df["close"].to_numpy(dtype=float))
+        dates = df["date"].to_numpy()
+        closes = df["close"].to_numpy(dtype=float)
+        if max_rise is None:
+            min_date = max_date = min_close = max_close = None
+        else:
+            min_date, max_date = dates[i], dates[j]
+            min_close, max_close = closes[i], closes[j]
+        stock_name = code_map.get(code, "")
+        # date当天的收盘价（date非交易日时为None）
         date_close = None
         date_rise_from_min = None
-        try:
-            sql = f"SELECT close FROM `{table_name}` WHERE date = '{date}' AND close IS NOT NULL LIMIT 1"
-            date_row = mdb.executeSqlFetch(sql)
-            if date_row and date_row[0][0] is not None:
-                date_close = float(date_row[0][0])
-                if min_close and min_close > 0:
-                    date_rise_from_min = date_close / min_close - 1
-        except Exception as e:
-            date_close = None
-            date_rise_from_min = None
-        results.append((table_name, stock_name, max_rise, min_date, min_close, max_date, max_close, date_close, date_rise_from_min))
+        on_date = closes[dates == date]
+        if len(on_date):
+            date_close = float(on_date[-1])
+            if min_close and min_close > 0:
+                date_rise_from_min = date_close / min_close - 1
+        results.append((code, stock_name, max_rise, min_date, min_close, max_date, max_close, date_close, date_rise_from_min))
     # 保存到新表
     print("[DEBUG] 写入前有效股票数量:", len(results))
     print("[DEBUG] 有效最大涨幅样例:", [r[2] for r in results if r[2] is not None][:10])
     df_out = pd.DataFrame(results, columns=[f"code", "name", f"max_rise_{N}d", f"min_{N}d_date", f"min_{N}d_close", f"max_{N}d_date", f"max_{N}d_close", "date_close", "date_rise_from_min"])
     df_out["code"] = df_out["code"].astype(str).str.zfill(6)
-    mdb.executeSql(f"DROP TABLE IF EXISTS max_rise_{N}d")
-    df_out.to_sql(f"max_rise_{N}d", mdb.engine(), if_exists="replace", index=False)
+    hist_db.executeSql(f"DROP TABLE IF EXISTS max_rise_{N}d")
+    df_out.to_sql(f"max_rise_{N}d", hist_db.engine(), if_exists="replace", index=False)
     print(f"已保存到数据库表 max_rise_{N}d")
 
 
@@ -124,7 +119,7 @@ def detect_abnormal(period=10, board_type='main', return_df=False):
         extra_ratio = 1.2
         board_name = '创业/科创板'
     try:
-        df = pd.read_sql(f"SELECT * FROM {table}", mdb.engine())
+        df = pd.read_sql(f"SELECT * FROM {table}", hist_db.engine())
     except Exception as e:
         print(f"读取{table}表失败: {e}")
         return None if return_df else None
@@ -151,23 +146,34 @@ def detect_abnormal(period=10, board_type='main', return_df=False):
     abnormal["备注"] = "已严重异动"
     # 2. 进一步筛选"今日收盘价*extra_ratio/最低价 > extra_threshold"
     abnormal_codes = set(abnormal["code"].astype(str).str.zfill(6))
+    # 一次读取自最早的最低价日以来全市场的收盘价，代替逐只股票查询最新收盘价和最低价日收盘价
+    latest_closes = pd.Series(dtype=float)
+    bar_closes = pd.Series(dtype=float)
+    min_dates = pd.to_datetime(df[min_col], errors="coerce").dropna()
+    if not min_dates.empty:
+        bars = read_daily_bar(min_dates.min().date(), datetime.now().date(), columns=["close"])
+        bars["close"] = pd.to_numeric(bars["close"], errors="coerce")
+        bars = bars.dropna(subset=["close"])
+        if not bars.empty:
+            latest_closes = bars.groupby("code")["close"].last()
+            bar_closes = bars.set_index(["code", "date"])["close"]
     zf2_rows = []
     for _, row in df.iterrows():
         code = str(row['code']).zfill(6)
         if code in abnormal_codes:
             continue
         min_date = row[min_col]
+        if pd.isnull(min_date):
+            continue
         try:
-            sql = f"SELECT close FROM `{code}` WHERE close IS NOT NULL ORDER BY date DESC LIMIT 1"
-            latest = mdb.executeSqlFetch(sql)
-            if not latest or latest[0][0] is None:
+            latest_close = latest_closes.get(code)
+            if latest_close is None:
                 continue
-            latest_close = float(latest[0][0])
-            sql = f"SELECT close FROM `{code}` WHERE date = '{min_date}' AND close IS NOT NULL LIMIT 1"
-            min_close = mdb.executeSqlFetch(sql)
-            if not min_close or min_close[0][0] is None:
+            latest_close = float(latest_close)
+            min_close = bar_closes.get((code, pd.to_datetime(min_date).date()))
+            if min_close is None:
                 continue
-            min_close = float(min_close[0][0])
+            min_close = float(min_close)
             if min_close > 0 and (latest_close * extra_ratio / min_close) > extra_threshold:
                 zf2 = (extra_threshold * min_close) / latest_close - 1
                 zf2_rows.append({
@@ -295,7 +301,7 @@ def send_abnormal_to_dingtalk():
 
 if __name__ == "__main__":
     # table_name = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-    # if not mdb.checkTableIsExist(table_name):
+    # if not hist_db.checkTableIsExist(table_name):
     #     create_baostock_code_map_table()
     # read_baostock_code_map_table()
     # date = datetime(2025, 6, 10).date()
@@ -1,4 +1,3 @@
-import pywencai
 import pandas as pd
 from datetime import datetime, timedelta
 import matplotlib
@@ -7,6 +6,7 @@ import matplotlib.pyplot as plt
 import io
 from PIL import Image
 import akshare as ak
+from core.crawling import wencai_gateway
 from core.dingtalk.dingtalk_usage import send_to_dingtalk
 
 # 自动检测并设置可用的中文字体，防止中文缺字
@@ -44,9 +44,12 @@ def get_trade_dates(n=30):
 def get_highest_boards(trade_dates):
     highest_boards = []
     highest_names = []
-    for d in trade_dates:
+    # 历史交易日的结果已缓存，通常只有当天的查询需要请求问财
+    frames = wencai_gateway.get_many([
+        {'query': f"{d}涨停，非ST", 'date': d, 'sort_key': '成交金额', 'sort_order': 'desc'} for d in trade_dates
+    ])
+    for d, df in zip(trade_dates, frames):
         try:
-            df = pywencai.get(query=f"{d}涨停，非ST", sort_key='成交金额', sort_order='desc')
             if df is not None and not df.empty:
                 col = f'连续涨停天数[{d}]'
                 if col in df.columns:
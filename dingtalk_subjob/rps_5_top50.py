@@ -13,16 +13,13 @@ from core.utils import get_recent_trade_range
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# rps_5和代码映射表在stock_hist库
+hist_db = mdb.Database("stock_hist")
 
 def get_rps_5_top50():
     """读取rps_5表，取前50名，返回DataFrame"""
     sql = "SELECT code, name, rps_5, rps_5_rank, today_date FROM rps_5 ORDER BY rps_5_rank DESC LIMIT 50"
-    rows = mdb.executeSqlFetch(sql)
+    rows = hist_db.executeSqlFetch(sql)
     if not rows:
         return None
     df = pd.DataFrame(rows, columns=["代码", "名称", "RPS5", "RPS5归一化排名", "日期"])
@@ -35,7 +32,7 @@ def get_rps_5_top50():
 def get_baostock_code(stock_code):
     """根据股票代码查找baostock映射码"""
     sql = "SELECT baostock_mapped_code FROM cn_baostock_code_map WHERE code = '%s'" % stock_code
-    rows = mdb.executeSqlFetch(sql)
+    rows = hist_db.executeSqlFetch(sql)
     if rows and rows[0][0]:
         return rows[0][0]
     return None
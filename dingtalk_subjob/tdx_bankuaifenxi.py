@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from mootdx.reader import Reader
+from core import tdx_reader
 from datetime import datetime, timedelta
 import os
 import glob
@@ -76,7 +76,7 @@ def get_plate_indices():
     print(f"找到{len(plate_indices)}个符合条件的板块指数")
     return plate_indices
 
-def calculate_both_changes(reader, plate_indices):
+def calculate_both_changes(plate_indices, tdx_path=CONFIG['tdx_path']):
     """
     计算板块指数的两种日涨幅：
     - change: (close-open)/open*100
@@ -85,13 +85,15 @@ def calculate_both_changes(reader, plate_indices):
     """
     end_date = datetime.now()
     start_date = end_date - timedelta(days=CONFIG['days'])
+    # 每天最多一条记录，读最近days+1条即可覆盖整个区间
+    tail = CONFIG['days'] + 1
     results = []
     debug_rows = []
     for _, row in plate_indices.iterrows():
         symbol = row['code']
         name = row['name']
         try:
-            daily_data = reader.daily(symbol=symbol)
+            daily_data = tdx_reader.read_day(symbol, tdx_path, tail=tail)
             if daily_data is None or daily_data.empty:
                 continue
             daily_data = daily_data[
@@ -164,10 +166,6 @@ def save_to_csv(results_df):
 def main():
     """主程序"""
     try:
-        # 初始化通达信读取器
-        reader = Reader.factory(market='std', tdxdir=CONFIG['tdx_path'])
-        print("通达信读取器初始化成功")
-        
         # 获取板块指数列表
         plate_indices = get_plate_indices()
         if plate_indices.empty:
@@ -175,7 +173,7 @@ def main():
             return
         
         # 计算每日涨幅
-        all_changes = calculate_both_changes(reader, plate_indices)
+        all_changes = calculate_both_changes(plate_indices)
         if all_changes.empty:
             print("未获取到有效的涨幅数据")
             return
@@ -1,8 +1,8 @@
-import pywencai
 import pandas as pd
 from datetime import datetime
 import streamlit as st
-import requests
+from core import http_client
+from core.crawling import wencai_gateway
 import base64
 import urllib.parse
 import time
@@ -27,7 +27,7 @@ CHATID = 'chat9652245847eebc05ee9e1a1fea02ceda'  # 你的目标群chatid
 
 def get_access_token(appkey, appsecret):
     url = f"https://oapi.dingtalk.com/gettoken?appkey={appkey}&appsecret={appsecret}"
-    resp = requests.get(url)
+    resp = http_client.get(url)
     data = resp.json()
     if data.get('errcode', 0) != 0:
         raise Exception(f"获取access_token失败: {data}")
@@ -37,7 +37,7 @@ def upload_image_to_dingtalk(access_token, image_path):
     url = f"https://oapi.dingtalk.com/media/upload?access_token={access_token}&type=image"
     with open(image_path, 'rb') as f:
         files = {'media': f}
-        res = requests.post(url, files=files)
+        res = http_client.post(url, files=files)
     data = res.json()
     if data.get('errcode', 0) != 0:
         raise Exception(f"上传图片失败: {data}")
@@ -54,7 +54,7 @@ def send_image_to_group(access_token, chatid, media_id):
             }
         }
     }
-    res = requests.post(url, json=data)
+    res = http_client.post(url, json=data)
     print('发送图片返回:', res.json())
 
 def save_df_as_img_matplotlib(df, filename, title=None, row_height=0.7, adaptive_row_height_col=None, fontsize=None, col_width_boost=None):
@@ -142,7 +142,7 @@ def process_data(date_str):
     """获取并处理涨停数据，返回主表和分组表"""
     try:
         param = f"{date_str}涨停，非ST"
-        df = pywencai.get(query=param, sort_key='成交金额', sort_order='desc')
+        df = wencai_gateway.get(query=param, date=date_str, sort_key='成交金额', sort_order='desc')
         if df is None or df.empty:
             return None, None
         selected_columns = [
@@ -12,13 +12,12 @@ from core.dingtalk.dingtalk_usage import send_to_dingtalk
 import matplotlib.pyplot as plt
 from matplotlib.table import Table
 from core.utils import get_recent_trade_range
+from core.daily_bar import save_daily_bar, DAILY_BAR_TABLE
+from core.crawling.stock_hist_baostock import to_baostock_code
 
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# 代码映射表建在stock_hist库
+hist_db = mdb.Database("stock_hist")
 
 
 def get_history_k_data(baostock_code, start_date, end_date):
@@ -46,15 +45,6 @@ def get_history_k_data(baostock_code, start_date, end_date):
     bs.logout()
     return result
 
-def add_prefix(code):
-    code = str(code)
-    if code.startswith(('6', '9')):
-        return 'sh.' + code
-    elif code.startswith(('0', '3', '2')):
-        return 'sz.' + code
-    else:
-        return code  # 若无法识别则原样返回
-
 def create_baostock_code_map_table():
     try:
         #获取所有A股股票数据
@@ -69,16 +59,13 @@ def create_baostock_code_map_table():
         print(df.columns)
         df.rename(columns={'代码': 'code', '名称': 'name'}, inplace=True)
         df['code'] = df['code'].astype(str).str.zfill(6)
-        df['baostock_mapped_code'] = df['code'].apply(add_prefix)
+        df['baostock_mapped_code'] = df['code'].apply(to_baostock_code)
         # 只保留name, code, baostock_mapped_code三列
         df = df[['name', 'code', 'baostock_mapped_code']]
         table_name = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-        cols_type = tbs.get_field_types(tbs.TABLE_CN_BAOSTOCK_CODE_MAP['columns'])
-        # 先清空表
-        if mdb.checkTableIsExist(table_name):
-            mdb.executeSql(f"DELETE FROM `{table_name}`")
-        # 插入数据
-        mdb.insert_db_from_df(df, table_name, cols_type, False, "`code`")
+        # 全量重建：写入影子表后原子替换，读方不会看到清空后的空表
+        hist_db.create_table_from_structure(tbs.TABLE_CN_BAOSTOCK_CODE_MAP, "`code`")
+        hist_db.bulk_insert_db_from_df(df, table_name, mdb.BULK_SWAP)
         print(f"{table_name}表已创建并写入{len(df)}条数据")
     except Exception as e:
         logging.error(f"create_baostock_code_map_table处理异常：{e}")
@@ -88,7 +75,7 @@ def create_baostock_code_hist_table():
     try:
         table_name = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
         sql = f"SELECT name, code, baostock_mapped_code FROM `{table_name}`"
-        rows = mdb.executeSqlFetch(sql)
+        rows = hist_db.executeSqlFetch(sql)
         if rows:
             print(f"{table_name}表内容：")
             date = datetime.now().date()
@@ -99,14 +86,12 @@ def create_baostock_code_hist_table():
                 # 获取30日历史数据
                 hist_df = get_history_k_data(baostock_mapped_code, start_date_str, end_date_str)
                 if hist_df is not None and not hist_df.empty:
-                    # 以股票代码为表名保存
-                    hist_table_name = code  # 直接用原始code作为表名
-                    # 字段类型自动推断
+                    # 保存到日线长表daily_bar，主键(date, code)
                     try:
-                        mdb.insert_db_from_df(hist_df, hist_table_name, None, False, "`date`")
-                        print(f"历史数据已保存到表 {hist_table_name}")
+                        save_daily_bar(hist_df)
+                        print(f"历史数据已保存到表 {DAILY_BAR_TABLE}")
                     except Exception as e:
-                        logging.error(f"保存历史数据到表 {hist_table_name} 失败: {e}")
+                        logging.error(f"保存历史数据到表 {DAILY_BAR_TABLE} 失败: {e}")
         else:
             print(f"{table_name}表无数据。")
     except Exception as e:
@@ -116,6 +101,6 @@ def create_baostock_code_hist_table():
 
 if __name__ == "__main__":
     table_name = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-    if not mdb.checkTableIsExist(table_name):
+    if not hist_db.checkTableIsExist(table_name):
         create_baostock_code_map_table()
     create_baostock_code_hist_table()
@@ -5,11 +5,8 @@ from datetime import datetime
 import core.trade_time as trade_time
 from core.utils import get_recent_trade_range
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# 按股票分表的历史数据在stock_hist库
+hist_db = mdb.Database("stock_hist")
 
 
 def RPS(date,N=10):
@@ -20,15 +17,15 @@ def RPS(date,N=10):
     start_date_str, end_date_str = get_recent_trade_range(date, N)
     print(f"计算{N}日RPS，区间为（{start_date_str}, {end_date_str}]")
     # 获取所有表名
-    sql = f"SELECT table_name FROM information_schema.tables WHERE table_schema='{mdb.db_database}'"
-    tables = mdb.executeSqlFetch(sql)
+    sql = f"SELECT table_name FROM information_schema.tables WHERE table_schema='{hist_db.name}'"
+    tables = hist_db.executeSqlFetch(sql)
     if not tables:
         print("未获取到表名")
         return
     # 获取股票代码和名称的映射
     code_map = {}
     map_table = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-    map_rows = mdb.executeSqlFetch(f"SELECT code, name FROM `{map_table}`")
+    map_rows = hist_db.executeSqlFetch(f"SELECT code, name FROM `{map_table}`")
     if map_rows:
         code_map = {str(code): name for code, name in map_rows}
     results = []
@@ -40,7 +37,7 @@ def RPS(date,N=10):
         # 1. 构造SQL语句，从当前股票表（table_name）中选取close不为NULL且日期在(start_date_str, end_date_str]区间内的数据，按日期升序排列。
         sql = f"SELECT date, close FROM `{table_name}` WHERE close IS NOT NULL AND date > '{start_date_str}' AND date <= '{end_date_str}' ORDER BY date ASC"
         # 2. 执行SQL查询，获取结果rows。
-        rows = mdb.executeSqlFetch(sql)
+        rows = hist_db.executeSqlFetch(sql)
         # 3. 如果没有数据或数据量小于2，跳过该股票。
         if not rows or len(rows) < 2:
             continue
@@ -77,8 +74,8 @@ def RPS(date,N=10):
             df_n[f"rps_{N}_rank"] = ((df_n[rps_col] - minv) / (maxv - minv) * 100).round(2)
         else:
             df_n[f"rps_{N}_rank"] = 100.0
-    mdb.executeSql(f"DROP TABLE IF EXISTS rps_{N}")
-    df_n.to_sql(f"rps_{N}", mdb.engine(), if_exists="replace", index=False)
+    hist_db.executeSql(f"DROP TABLE IF EXISTS rps_{N}")
+    df_n.to_sql(f"rps_{N}", hist_db.engine(), if_exists="replace", index=False)
     print(f"已保存到数据库表 rps_{N}")
 
 
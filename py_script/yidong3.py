@@ -14,11 +14,8 @@ matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Un
 matplotlib.rcParams['axes.unicode_minus'] = False
 
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# 按股票分表的历史数据在stock_hist库
+hist_db = mdb.Database("stock_hist")
 
 def calc_max_rise_from_date_to_N_day_before(date, N=30):
     """
@@ -30,15 +27,15 @@ def calc_max_rise_from_date_to_N_day_before(date, N=30):
     print(f"计算{N}日最大涨幅，区间为（{start_date_str}, {end_date_str}]")
 
     # 获取所有表名
-    sql = f"SELECT table_name FROM information_schema.tables WHERE table_schema='{mdb.db_database}'"
-    tables = mdb.executeSqlFetch(sql)
+    sql = f"SELECT table_name FROM information_schema.tables WHERE table_schema='{hist_db.name}'"
+    tables = hist_db.executeSqlFetch(sql)
     if not tables:
         print("未获取到表名")
         return
     # 获取股票代码和名称的映射
     code_map = {}
     map_table = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-    map_rows = mdb.executeSqlFetch(f"SELECT code, name FROM `{map_table}`")
+    map_rows = hist_db.executeSqlFetch(f"SELECT code, name FROM `{map_table}`")
     if map_rows:
         code_map = {str(code): name for code, name in map_rows}
     results = []
@@ -48,7 +45,7 @@ def calc_max_rise_from_date_to_N_day_before(date, N=30):
             continue
         # 读取表数据，取区间（start_date_str, end_date_str]，按日期升序排列
         sql = f"SELECT date, close FROM `{table_name}` WHERE close IS NOT NULL AND date > '{start_date_str}' AND date <= '{end_date_str}' ORDER BY date ASC"
-        rows = mdb.executeSqlFetch(sql)
+        rows = hist_db.executeSqlFetch(sql)
         if not rows or len(rows) < 2:
             continue
         df = pd.DataFrame(rows, columns=["date", "close"])
@@ -77,7 +74,7 @@ def calc_max_rise_from_date_to_N_day_before(date, N=30):
         date_rise_from_min = None
         try:
             sql = f"SELECT close FROM `{table_name}` WHERE date = '{date}' AND close IS NOT NULL LIMIT 1"
-            date_row = mdb.executeSqlFetch(sql)
+            date_row = hist_db.executeSqlFetch(sql)
             if date_row and date_row[0][0] is not None:
                 date_close = float(date_row[0][0])
                 if min_close and min_close > 0:
@@ -91,8 +88,8 @@ def calc_max_rise_from_date_to_N_day_before(date, N=30):
     print("[DEBUG] 有效最大涨幅样例:", [r[2] for r in results if r[2] is not None][:10])
     df_out = pd.DataFrame(results, columns=[f"code", "name", f"max_rise_{N}d", f"min_{N}d_date", f"min_{N}d_close", f"max_{N}d_date", f"max_{N}d_close", "date_close", "date_rise_from_min"])
     df_out["code"] = df_out["code"].astype(str).str.zfill(6)
-    mdb.executeSql(f"DROP TABLE IF EXISTS max_rise_{N}d")
-    df_out.to_sql(f"max_rise_{N}d", mdb.engine(), if_exists="replace", index=False)
+    hist_db.executeSql(f"DROP TABLE IF EXISTS max_rise_{N}d")
+    df_out.to_sql(f"max_rise_{N}d", hist_db.engine(), if_exists="replace", index=False)
     print(f"已保存到数据库表 max_rise_{N}d")
 
 
@@ -122,7 +119,7 @@ def detect_abnormal(period=10, board_type='main', return_df=False):
         extra_ratio = 1.2
         board_name = '创业/科创板'
     try:
-        df = pd.read_sql(f"SELECT * FROM {table}", mdb.engine())
+        df = pd.read_sql(f"SELECT * FROM {table}", hist_db.engine())
     except Exception as e:
         print(f"读取{table}表失败: {e}")
         return None if return_df else None
@@ -157,12 +154,12 @@ def detect_abnormal(period=10, board_type='main', return_df=False):
         min_date = row[min_col]
         try:
             sql = f"SELECT close FROM `{code}` WHERE close IS NOT NULL ORDER BY date DESC LIMIT 1"
-            latest = mdb.executeSqlFetch(sql)
+            latest = hist_db.executeSqlFetch(sql)
             if not latest or latest[0][0] is None:
                 continue
             latest_close = float(latest[0][0])
             sql = f"SELECT close FROM `{code}` WHERE date = '{min_date}' AND close IS NOT NULL LIMIT 1"
-            min_close = mdb.executeSqlFetch(sql)
+            min_close = hist_db.executeSqlFetch(sql)
             if not min_close or min_close[0][0] is None:
                 continue
             min_close = float(min_close[0][0])
@@ -257,7 +254,7 @@ def export_abnormal_tables():
 
 if __name__ == "__main__":
     # table_name = tbs.TABLE_CN_BAOSTOCK_CODE_MAP['name']
-    # if not mdb.checkTableIsExist(table_name):
+    # if not hist_db.checkTableIsExist(table_name):
     #     create_baostock_code_map_table()
     # read_baostock_code_map_table()
     date = datetime(2025, 6, 10).date()
@@ -3,18 +3,15 @@
 import os
 import pandas as pd
 from datetime import datetime
-from core.crawling.stock_hist_em import stock_zh_a_spot_em
-import requests
+from core.market_snapshot import get_snapshot
+from core import http_client
 import core.database as mdb
 from apscheduler.schedulers.blocking import BlockingScheduler
 from core.utils import schedule_trade_day_jobs
-from core.database import executeSql, executeSqlFetch, checkTableIsExist
+from core.write_behind import WriteBehindBuffer
 
-# 覆写数据库名和相关连接参数
-mdb.db_database = "stock_hist"  # 替换为你想用的数据库名
-mdb.MYSQL_CONN_URL = "mysql+pymysql://%s:%s@%s:%s/%s?charset=%s" % (
-    mdb.db_user, mdb.db_password, mdb.db_host, mdb.db_port, mdb.db_database, mdb.db_charset)
-mdb.MYSQL_CONN_DBAPI['database'] = mdb.db_database
+# up_stocks_count表在stock_hist库
+hist_db = mdb.Database("stock_hist")
 
 # 钉钉机器人配置
 DINGTALK_WEBHOOK = "https://oapi.dingtalk.com/robot/send?access_token=294d72c5b9bffddcad4e0220070a9df8104e5e8a3f161461bf2839cfd163b471"
@@ -28,7 +25,7 @@ def dingtalk_text(content):
             "content": content + f"\n\n关键词：{KEYWORD}"
         }
     }
-    response = requests.post(DINGTALK_WEBHOOK, json=data, headers=headers)
+    response = http_client.post(DINGTALK_WEBHOOK, json=data, headers=headers)
     print(f"钉钉消息发送状态: {response.status_code}, 响应: {response.json()}")
 
 # @st.cache_data(ttl=3600, show_spinner=False)
@@ -51,8 +48,10 @@ def calculate_market_overview(df):
     }
     return overview
 
-def ensure_up_stocks_table():
-    sql = '''
+_table_ready = False
+_buffer = None
+
+_CREATE_TABLE_SQL = '''
     CREATE TABLE IF NOT EXISTS up_stocks_count (
         date VARCHAR(10) NOT NULL,
         time_str VARCHAR(10) NOT NULL,
@@ -60,7 +59,20 @@ def ensure_up_stocks_table():
         PRIMARY KEY(date, time_str)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     '''
-    executeSql(sql)
+
+# 建表语句每个进程只执行一次，不再在每次保存、查询前重复执行
+def ensure_up_stocks_table():
+    global _table_ready
+    if _table_ready:
+        return
+    hist_db.executeSql(_CREATE_TABLE_SQL)
+    _table_ready = True
+
+def _get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = WriteBehindBuffer('up_stocks_count', 'date,time_str', to_db=hist_db.name)
+    return _buffer
 
 def save_up_stocks_count(time_str, up_count):
     """
@@ -68,26 +80,28 @@ def save_up_stocks_count(time_str, up_count):
     """
     ensure_up_stocks_table()
     today = datetime.now().strftime('%Y-%m-%d')
-    # 插入或更新
-    sql = '''REPLACE INTO up_stocks_count (date, time_str, up_count) VALUES (%s, %s, %s)'''
-    executeSql(sql, (today, time_str, int(up_count) if pd.notnull(up_count) else None))
+    # 放入后写缓冲，按主键合并后批量写入，不等待数据库
+    _get_buffer().put({'date': today, 'time_str': time_str,
+                       'up_count': int(up_count) if pd.notnull(up_count) else None})
 
 def send_up_stocks_table_to_dingtalk():
     """
     读取up_stocks_count表最近5天的数据，每天按时间点升序排列，格式化后推送
     """
     ensure_up_stocks_table()
+    # 读表前先写出缓冲中的数据
+    _get_buffer().flush()
     columns = ['9:25', '10:00', '11:00', '13:00', '14:00', '15:00']
     # 查询最近5天日期
     sql_dates = "SELECT DISTINCT date FROM up_stocks_count ORDER BY date DESC LIMIT 5"
-    rows = executeSqlFetch(sql_dates)
+    rows = hist_db.executeSqlFetch(sql_dates)
     if not rows:
         dingtalk_text('无红盘家数数据')
         return
     dates = [r[0] for r in rows]
     # 查询这些日期的所有数据
     sql_data = f"SELECT date, time_str, up_count FROM up_stocks_count WHERE date IN ({','.join(['%s']*len(dates))})"
-    data_rows = executeSqlFetch(sql_data, dates)
+    data_rows = hist_db.executeSqlFetch(sql_data, dates)
     # 组织为 {date: {time_str: up_count}}
     from collections import defaultdict
     table = defaultdict(dict)
@@ -111,7 +125,11 @@ def hongpanjiashu():
     获取实时数据并推送红盘家数，并将表前5天以自定义文本格式通过钉钉发送（每行一行，字段用 | 分隔，避免钉钉竖表渲染问题）
     """
     now_str = datetime.now().strftime('%H:%M').lstrip('0')
-    stock_zh_a_spot_em_df = stock_zh_a_spot_em()
+    fetched_at, stock_zh_a_spot_em_df = get_snapshot()
+    if fetched_at is None:
+        # 没有拿到新鲜的行情，不把旧数据记到当前时间点
+        print(f"{now_str} 未获取到全市场行情，跳过本次。")
+        return
     overview = calculate_market_overview(stock_zh_a_spot_em_df)
     up_count = overview['上涨家数']
     save_up_stocks_count(now_str, up_count)
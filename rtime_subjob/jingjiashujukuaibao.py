@@ -1,7 +1,7 @@
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 import pywencai
-import requests
+from core import http_client
 from datetime import datetime
 from chinese_calendar import is_workday
 from core.utils import schedule_trade_day_jobs
@@ -31,7 +31,7 @@ def dingtalk_markdown(content):
             "text": content + "\n\n**关键词：9.25竞价选股**"  # 必须包含自定义关键词
         }
     }
-    response = requests.post(DINGTALK_WEBHOOK, json=data, headers=headers)
+    response = http_client.post(DINGTALK_WEBHOOK, json=data, headers=headers)
     print(f"消息发送状态: {response.status_code}")
 
 
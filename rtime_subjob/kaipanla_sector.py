@@ -1,8 +1,11 @@
-import requests
+from core import http_client
 import datetime
 import json
 import os
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from apscheduler.schedulers.blocking import BlockingScheduler
 from core.trade_time import is_trade_date
 
@@ -10,6 +13,17 @@ from core.trade_time import is_trade_date
 HISTORY_FILE = 'sector_ranking.json'  # 板块排名历史记录文件
 DINGTALK_WEBHOOK = "https://oapi.dingtalk.com/robot/send?access_token=40b6a6a19c21011d660f9b253995ef6288b60a15d91be256b23fc94c6d7431cf"
 KEYWORD = "盘中板块强度"  # 钉钉机器人自定义关键字（必须与设置完全匹配）
+REQUEST_TIMEOUT = (2, 4)  # (连接超时, 读取超时)秒，单个慢请求不拖住整分钟的提醒
+REQUEST_RETRIES = 1
+# 板块成分股缓存秒数。成分股接口同时返回个股的实时涨幅，缓存必须短于每分钟一次的提醒间隔，
+# 只合并同一轮内（或手动重跑时）对同一板块的重复请求，每一轮的个股涨幅都是新抓取的
+STOCK_CACHE_TTL = 30
+TOP_N = 3
+
+_stock_cache = {}  # 板块代码 -> (抓取时间, 个股列表)
+_stock_cache_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=TOP_N, thread_name_prefix='kaipanla')
+_tick_latency = deque(maxlen=500)  # 每轮抓取耗时（秒）
 
 
 # ================= 股票数据获取函数 =================
@@ -37,7 +51,8 @@ def get_sector_data(date, k):
     }
 
     try:
-        response = requests.post(url, headers=headers, data=params)
+        response = http_client.post(url, headers=headers, data=params, timeout=REQUEST_TIMEOUT,
+                                    retries=REQUEST_RETRIES)
         if response.status_code == 200:
             data = response.json()
             if "list" in data and data["list"]:
@@ -74,7 +89,8 @@ def get_stock_data(sector_code, date, k):
     }
 
     try:
-        response = requests.post(url, headers=headers, data=params)
+        response = http_client.post(url, headers=headers, data=params, timeout=REQUEST_TIMEOUT,
+                                    retries=REQUEST_RETRIES)
         if response.status_code == 200:
             data = response.json()
             if "list" in data and data["list"]:
@@ -87,6 +103,42 @@ def get_stock_data(sector_code, date, k):
     return []
 
 
+def get_sector_stocks(sector_codes, date, k=0):
+    """
+    并发获取多个板块的成分股（含实时涨幅），STOCK_CACHE_TTL秒内抓过的板块直接用缓存。
+    :return: {板块代码: 个股列表}
+    """
+    now = time.monotonic()
+    result = {}
+    with _stock_cache_lock:
+        for code in sector_codes:
+            cached = _stock_cache.get(code)
+            if cached and now - cached[0] < STOCK_CACHE_TTL:
+                result[code] = cached[1]
+    missing = [code for code in sector_codes if code not in result]
+    if missing:
+        futures = {code: _executor.submit(get_stock_data, code, date, k) for code in missing}
+        for code, future in futures.items():
+            stocks = future.result()
+            result[code] = stocks
+            if stocks:
+                with _stock_cache_lock:
+                    _stock_cache[code] = (time.monotonic(), stocks)
+    return result
+
+
+def tick_stats():
+    """
+    最近各轮的抓取耗时统计（秒）
+    """
+    latency = sorted(_tick_latency)
+    if not latency:
+        return {}
+    return {'ticks': len(latency), 'p50_seconds': round(latency[len(latency) // 2], 3),
+            'p95_seconds': round(latency[min(len(latency) - 1, int(len(latency) * 0.95))], 3),
+            'max_seconds': round(latency[-1], 3)}
+
+
 # ================= 板块排名历史管理 =================
 def load_sector_history():
     """加载历史板块排名数据"""
@@ -142,7 +194,7 @@ def send_dingtalk_message(content):
         }
     }
     try:
-        response = requests.post(DINGTALK_WEBHOOK, headers=headers, json=payload)
+        response = http_client.post(DINGTALK_WEBHOOK, headers=headers, json=payload)
         if response.json().get("errcode") == 0:
             print("钉钉消息发送成功")
         else:
@@ -165,11 +217,13 @@ def fetch_and_send():
     try:
         date_str = datetime.date.today().strftime("%Y-%m-%d")
         print(f"{datetime.datetime.now().strftime('%H:%M:%S')} 开始获取板块数据...")
+        start = time.perf_counter()
 
         # 获取所有板块数据
         sectors = get_sector_data(date_str, k=0)
 
         if not sectors:
+            _tick_latency.append(time.perf_counter() - start)
             print("未获取到板块数据")
             return
 
@@ -178,21 +232,27 @@ def fetch_and_send():
             [s for s in sectors if s["强度"] != "-"],
             key=lambda x: float(x["强度"]),
             reverse=True
-        )[:3]
+        )[:TOP_N]
 
         #检查排名变化
         if not check_ranking_changes(top_sectors):
-            print("板块排名未变化，无需发送通知")
+            _tick_latency.append(time.perf_counter() - start)
+            print(f"板块排名未变化，无需发送通知，耗时{round(time.perf_counter() - start, 2)}秒")
             return
 
         print("板块排名变化，准备发送通知...")
+        # 前三板块的成分股并发获取
+        sector_stocks = get_sector_stocks([s["代码"] for s in top_sectors], date_str, k=0)
+        elapsed = time.perf_counter() - start
+        _tick_latency.append(elapsed)
+        print(f"板块及成分股获取耗时{round(elapsed, 2)}秒，{tick_stats()}")
 
         # 构建Markdown消息
         content = f"#### 📊 板块排名变化 {datetime.datetime.now().strftime('%m-%d %H:%M')}\n\n"
 
         for i, sector in enumerate(top_sectors):
             # 获取该板块涨幅前三的个股
-            stocks = get_stock_data(sector["代码"], date_str, k=0)
+            stocks = sector_stocks.get(sector["代码"], [])
             top_stocks = sorted(
                 stocks,
                 key=lambda x: float(x["涨幅%"]),
@@ -3,12 +3,13 @@
 import os
 import pandas as pd
 from datetime import datetime
-from core.crawling.stock_hist_em import stock_zh_a_spot_em
-import requests
+from core.market_snapshot import get_snapshot
+from core import http_client
 from apscheduler.schedulers.blocking import BlockingScheduler
 from chinese_calendar import is_workday
 from core.utils import schedule_trade_day_jobs
-from core.database import executeSql, executeSqlFetch
+from core.write_behind import WriteBehindBuffer
+import core.database as mdb
 
 # 钉钉机器人配置
 DINGTALK_WEBHOOK = "https://oapi.dingtalk.com/robot/send?access_token=5d1d031097f230cd5d9af236258278e9cc24c5a26826f4eedd8057873c747ba0"
@@ -36,7 +37,7 @@ def dingtalk_markdown(content, title="A股市场监控提醒", at_mobiles=None,
         }
     }
     try:
-        response = requests.post(DINGTALK_WEBHOOK, json=data, headers=headers, timeout=10)
+        response = http_client.post(DINGTALK_WEBHOOK, json=data, headers=headers, timeout=10)
         response.raise_for_status()
         resp_json = response.json()
         print(f"钉钉消息发送状态: {response.status_code}, 响应: {resp_json}")
@@ -66,8 +67,14 @@ def calculate_market_overview(df):
     return overview
 
 
-def ensure_market_overview_table():
-    sql = '''
+# market_overview表在stock_hist库，与红盘家数的up_stocks_count表相同
+hist_db = mdb.Database("stock_hist")
+
+_table_ready = False
+_buffer = None
+
+
+_CREATE_TABLE_SQL = '''
     CREATE TABLE IF NOT EXISTS market_overview (
         date VARCHAR(10) NOT NULL,
         time_str VARCHAR(10) NOT NULL,
@@ -75,29 +82,46 @@ def ensure_market_overview_table():
         PRIMARY KEY(date, time_str)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     '''
-    executeSql(sql)
+
+
+# 建表语句每个进程只执行一次，不再在每次保存、查询前重复执行
+def ensure_market_overview_table():
+    global _table_ready
+    if _table_ready:
+        return
+    hist_db.executeSql(_CREATE_TABLE_SQL)
+    _table_ready = True
+
+
+def _get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = WriteBehindBuffer('market_overview', 'date,time_str', to_db=hist_db.name)
+    return _buffer
 
 
 def save_market_overview(time_str, total_amount):
     ensure_market_overview_table()
     today = datetime.now().strftime('%Y-%m-%d')
-    sql = '''REPLACE INTO market_overview (date, time_str, total_amount) VALUES (%s, %s, %s)'''
-    executeSql(sql, (today, time_str, total_amount))
+    # 放入后写缓冲，按主键合并后批量写入，不等待数据库
+    _get_buffer().put({'date': today, 'time_str': time_str, 'total_amount': total_amount})
 
 
 def send_market_overview_table_to_dingtalk():
     ensure_market_overview_table()
+    # 读表前先写出缓冲中的数据
+    _get_buffer().flush()
     columns = ['10:00', '11:00', '13:00', '14:00', '15:00']
     # 查询最近5天日期
     sql_dates = "SELECT DISTINCT date FROM market_overview ORDER BY date DESC LIMIT 5"
-    rows = executeSqlFetch(sql_dates)
+    rows = hist_db.executeSqlFetch(sql_dates)
     if not rows:
         dingtalk_markdown('无市场总成交额数据')
         return
     dates = [r[0] for r in rows]
     # 查询这些日期的所有数据
     sql_data = f"SELECT date, time_str, total_amount FROM market_overview WHERE date IN ({','.join(['%s']*len(dates))})"
-    data_rows = executeSqlFetch(sql_data, dates)
+    data_rows = hist_db.executeSqlFetch(sql_data, dates)
     # 组织为 {date: {time_str: total_amount}}
     from collections import defaultdict
     table = defaultdict(dict)
@@ -128,7 +152,11 @@ def shichanggailan():
         print("非交易日，不执行推送。")
         return
     now_str = datetime.now().strftime('%H:%M').lstrip('0')
-    stock_zh_a_spot_em_df = stock_zh_a_spot_em()
+    fetched_at, stock_zh_a_spot_em_df = get_snapshot()
+    if fetched_at is None:
+        # 没有拿到新鲜的行情，不把旧数据记到当前时间点
+        print(f"{now_str} 未获取到全市场行情，跳过本次。")
+        return
     overview = calculate_market_overview(stock_zh_a_spot_em_df)
     total_amount = overview.get('总成交额(亿)', 0)
     save_market_overview(now_str, total_amount)
@@ -1,12 +1,12 @@
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 import pywencai
-import requests
+from core import http_client
 from datetime import datetime, timedelta
 from chinese_calendar import is_workday
 from core.utils import schedule_trade_day_jobs
 import pandas as pd
-from core.singleton_trade_date import stock_trade_date
+from core.trade_calendar import get_calendar
 
 # 钉钉机器人配置
 DINGTALK_WEBHOOK = "https://oapi.dingtalk.com/robot/send?access_token=0658b0d8ab22e663316d48031e4049fdc20db6d4a15fe4bd23c106ff69ca0103"
@@ -86,7 +86,7 @@ def send_to_dingtalk(content):
     }
     
     # 发送请求
-    response = requests.post(DINGTALK_WEBHOOK, json=data, headers=headers)
+    response = http_client.post(DINGTALK_WEBHOOK, json=data, headers=headers)
     
     # 检查响应
     if response.status_code == 200:
@@ -129,16 +129,10 @@ def send_new_stocks_to_dingtalk(df, title, show_date_col=False):
     send_to_dingtalk(content)
 
 def get_last_n_trade_dates(n=5):
-    trade_dates = sorted(stock_trade_date().get_data())
-    today = datetime.now().date()
-    # 找到今天在交易日历中的索引
-    if today in trade_dates:
-        idx = trade_dates.index(today)
-    else:
-        # 如果今天不是交易日，找最近的前一个交易日
-        idx = max(i for i, d in enumerate(trade_dates) if d < today)
-    # 取前n个交易日（含今天/最近交易日）
-    return [trade_dates[idx - i].strftime("%Y-%m-%d") for i in range(n) if idx - i >= 0]
+    # 取前n个交易日（含今天/最近交易日，今天不是交易日时取之前最近的交易日）
+    start_date, end_date = get_calendar().range(datetime.now().date(), n)
+    trade_dates = get_calendar().between(start_date, end_date)
+    return [str(d) for d in trade_dates[::-1]]
 
 def get_new_stocks_last_n_days(n=5):
     """获取近n个交易日（含今天或最近交易日）新股，返回合并后的DataFrame"""
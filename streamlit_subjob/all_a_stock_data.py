@@ -1,16 +1,17 @@
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import io
+from core.market_snapshot import get_snapshot
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def fetch_market_data():
     try:
-        # 使用AKShare获取A股市场现货数据
-        stock_zh_a_spot_df = ak.stock_zh_a_spot_em()
-
+        # 全市场行情快照由core.market_snapshot按snapshot_ttl缓存，各页面会话共用
+        fetched_at, stock_zh_a_spot_df = get_snapshot()
+        if fetched_at is None:
+            st.error("获取数据失败: 未获取到最新的全市场行情")
+            return None
         return stock_zh_a_spot_df
     except Exception as e:
         st.error(f"获取数据失败: {e}")
@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from mootdx.reader import Reader
+from core import tdx_reader
 import os
 import talib
 import streamlit as st
@@ -50,12 +50,11 @@ def detect_wash_and_distribute(stock_code, tdx_dir='C:/new_tdx', days=10):
     # 确保股票代码是6位数字格式
     stock_code = stock_code.zfill(6)
     
-    # 初始化通达信数据读取器[1,2,4](@ref)
-    reader = Reader.factory(market='std', tdxdir=tdx_dir)
-    
     try:
-        # 读取日线数据[1,2](@ref)
-        df = reader.daily(symbol=stock_code)
+        # 读取日线数据：指标只用到最近20日均线和days日均量，读.day文件末尾的记录即可
+        df = tdx_reader.read_day(stock_code, tdx_dir, tail=days + 120)
+        if df is None:
+            df = pd.DataFrame()
         # 补齐date字段
         if 'date' not in df.columns:
             if isinstance(df.index, pd.DatetimeIndex):
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
-import requests
+from core import http_client
 import datetime
 import pandas as pd
 import json
@@ -43,10 +43,11 @@ def get_sector_data(date, k):
 
     try:
         # 发送POST请求（参数放在请求体中）
-        response = requests.post(
+        response = http_client.post(
             url,
             headers=headers,
-            data=params
+            data=params,
+            retries=2
         )
 
         if response.status_code == 200:
@@ -107,10 +108,11 @@ def get_stock_data(sector_code, date, k):
 
     try:
         # 发送POST请求（参数放在请求体中）
-        response = requests.post(
+        response = http_client.post(
             url,
             headers=headers,
-            data=params  # 关键修改：使用data参数
+            data=params,  # 关键修改：使用data参数
+            retries=2
         )
 
         if response.status_code == 200:
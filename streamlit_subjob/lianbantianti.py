@@ -1,5 +1,4 @@
 import streamlit as st
-import pywencai
 import pandas as pd
 from datetime import datetime, timedelta
 import matplotlib
@@ -8,6 +7,7 @@ import matplotlib.pyplot as plt
 import io
 from PIL import Image
 import akshare as ak
+from core.crawling import wencai_gateway
 
 st.set_page_config(
         page_title="连板天梯",
@@ -52,9 +52,12 @@ def get_trade_dates(n=30):
 def get_highest_boards(trade_dates):
     highest_boards = []
     highest_names = []
-    for d in trade_dates:
+    # 历史交易日的结果已缓存，通常只有当天的查询需要请求问财
+    frames = wencai_gateway.get_many([
+        {'query': f"{d}涨停，非ST", 'date': d, 'sort_key': '成交金额', 'sort_order': 'desc'} for d in trade_dates
+    ])
+    for d, df in zip(trade_dates, frames):
         try:
-            df = pywencai.get(query=f"{d}涨停，非ST", sort_key='成交金额', sort_order='desc')
             if df is not None and not df.empty:
                 col = f'连续涨停天数[{d}]'
                 if col in df.columns:
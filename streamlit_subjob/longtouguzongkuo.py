@@ -1,9 +1,9 @@
 import streamlit as st
-import pywencai
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import akshare as ak
+from core.crawling import wencai_gateway
 
 # Setting up pandas display options
 pd.set_option('display.unicode.ambiguous_as_wide', True)
@@ -16,7 +16,7 @@ pd.set_option('display.max_colwidth', 100)
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_limit_up_data(date):
     param = f"非ST,{date.strftime('%Y%m%d')}涨停"
-    df = pywencai.get(query=param, sort_key='成交金额', sort_order='desc', loop=True)
+    df = wencai_gateway.get(query=param, date=date, sort_key='成交金额', sort_order='desc', loop=True)
     if df is None:
         st.error(f"未能获取到 {date.strftime('%Y-%m-%d')} 的涨停数据，请检查网络或稍后重试。")
         return pd.DataFrame()
@@ -25,7 +25,7 @@ def get_limit_up_data(date):
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_yesterday_zhangting_data(previous_date , date):
     param = f"非ST,{previous_date.strftime('%Y%m%d')}涨停"
-    df = pywencai.get(query=param, sort_key='成交金额', sort_order='desc', loop=True)
+    df = wencai_gateway.get(query=param, date=previous_date, sort_key='成交金额', sort_order='desc', loop=True)
     if df is None:
         st.error(f"未能获取到 {previous_date.strftime('%Y-%m-%d')} 的涨停数据，请检查网络或稍后重试。")
         return pd.DataFrame()
@@ -34,7 +34,7 @@ def get_yesterday_zhangting_data(previous_date , date):
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_poban(date):
     param = f"非ST,{date.strftime('%Y%m%d')}曾涨停"
-    df = pywencai.get(query=param, sort_key='成交金额', sort_order='desc', loop=True)
+    df = wencai_gateway.get(query=param, date=date, sort_key='成交金额', sort_order='desc', loop=True)
     if df is None:
         st.error(f"未能获取到 {date.strftime('%Y-%m-%d')} 的曾涨停数据，请检查网络或稍后重试。")
         return pd.DataFrame()
@@ -43,7 +43,7 @@ def get_poban(date):
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_limit_down_data(date):
     param = f"非ST,{date.strftime('%Y%m%d')}跌停"
-    df = pywencai.get(query=param, sort_key='成交金额', sort_order='desc', loop=True)
+    df = wencai_gateway.get(query=param, date=date, sort_key='成交金额', sort_order='desc', loop=True)
     if df is None:
         st.error(f"未能获取到 {date.strftime('%Y-%m-%d')} 的跌停数据，请检查网络或稍后重试。")
         return pd.DataFrame()
@@ -1,10 +1,10 @@
 import streamlit as st
-import pywencai
 import pandas as pd
 from datetime import datetime
 import io
 import matplotlib
 import matplotlib.pyplot as plt
+from core.crawling import wencai_gateway
 
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS', 'sans-serif']
 matplotlib.rcParams['axes.unicode_minus'] = False
@@ -36,7 +36,7 @@ def save_heatmap_from_grouped(grouped, date_str):
 def process_data(date_str):
     try:
         param = f"{date_str}涨停，非ST"
-        df = pywencai.get(query=param, sort_key='成交金额', sort_order='desc')
+        df = wencai_gateway.get(query=param, date=date_str, sort_key='成交金额', sort_order='desc')
         if df is None or df.empty:
             return None, None
         selected_columns = [